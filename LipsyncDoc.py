@@ -20,6 +20,7 @@ import math
 
 import json
 import fnmatch
+from collections import ChainMap
 from pathlib import Path
 import path_utils
 from scipy.signal import find_peaks
@@ -32,6 +33,11 @@ from Rhubarb import Rhubarb, RhubarbTimeoutException
 from ai_output_process import get_best_fitting_output_from_list
 
 from LipsyncObject import LipSyncObject, strip_symbols
+from json_stream import JsonStreamReader
+from autosave_journal import AutosaveJournal
+from undo_journal import UndoJournal
+import project_binary
+from timeline_store import TimelineStore
 
 try:
     import configparser
@@ -41,6 +47,7 @@ except ImportError:
 import PySide6.QtCore as QtCore
 
 import utilities
+import dictionary_cache
 
 
 logger = logging.getLogger('LipsyncDoc')
@@ -69,52 +76,73 @@ class LanguageManager:
 
     def __init__(self):
         self.__dict__ = self.__shared_state
+        if self.__dict__:
+            # Already set up in this process, all instances share the loaded dictionaries.
+            return
         self.language_table = {}
         self.phoneme_dictionary = {}
-        self.raw_dictionary = {}
+        # Words added at runtime (e.g. from the pronunciation dialog) go into the first map,
+        # the loaded dictionaries are appended behind it.
+        self.raw_dictionary = ChainMap()
+        self.dictionary_layers = {}
+        self.shared_dictionaries = {}
         self.current_language = ""
 
         self.export_conversion = {}
         self.init_languages()
 
+    def _rebuild_raw_dictionary(self):
+        # Later dictionaries take precedence over earlier ones.
+        self.raw_dictionary.maps[1:] = reversed(list(self.dictionary_layers.values()))
+
     def load_dictionary(self, path):
         print("Loading dictionary: {}".format(path))
-        try:
-            in_file = open(path, 'r')
-        except FileNotFoundError:
+        if not os.path.exists(path):
             logging.info("Unable to open phoneme dictionary!:{}".format(path))
             return
-        new_cmu_version = False
-        if in_file.readline().startswith(";;; # CMUdict"):
-            new_cmu_version = True
-        # process dictionary entries
-        for line in in_file.readlines():
-            if not new_cmu_version:
-                if line[0] == '#':
-                    continue  # skip comments in the dictionary
-            else:
-                if line.startswith(";;;"):
-                    continue
-            # strip out leading/trailing whitespace
-            line.strip()
-            line = line.rstrip('\r\n')
-
-            # split into components
-            entry = line.split()
-            if len(entry) == 0:
-                continue
-            # check if this is a duplicate word (alternate transcriptions end with a number in parentheses) - if so, throw it out
-            if entry[0].endswith(')'):
-                continue
-            # add this entry to the in-memory dictionary
-            for i in range(len(entry)):
-                if i == 0:
-                    self.raw_dictionary[entry[0]] = []
-                else:
-                    rawentry = entry[i]
-                    self.raw_dictionary[entry[0]].append(rawentry)
-        in_file.close()
-        in_file = None
+        # Dictionaries are compiled once into the app data dir and memory-mapped afterwards.
+        cache_dir = utilities.get_app_data_path() / "dictionary_cache"
+        self.dictionary_layers.pop(path, None)
+        self.dictionary_layers[path] = dictionary_cache.load_dictionary(path, cache_dir)
+        self._rebuild_raw_dictionary()
+
+    def get_shared_state(self, use_shared_memory=False):
+        """
+        Return a picklable snapshot of the loaded dictionaries for worker processes.
+
+        Compiled dictionaries are passed by path, so every worker maps the same
+        read-only pages. With use_shared_memory, or for dictionaries that could
+        not be compiled to disk, they are copied once into shared memory owned
+        by this process; call release_shared_state() when the workers are done.
+
+        Usage:
+            Pool(initializer=LanguageManager.attach_shared_state, initargs=(langman.get_shared_state(),))
+        """
+        layers = {}
+        for path, table in self.dictionary_layers.items():
+            if use_shared_memory or not isinstance(table, dictionary_cache.CompiledDictionary):
+                if path not in self.shared_dictionaries:
+                    self.shared_dictionaries[path] = dictionary_cache.SharedMemoryDictionary.create(path)
+                table = self.shared_dictionaries[path]
+            layers[path] = table
+        return {"language_table": self.language_table, "current_language": self.current_language,
+                "dictionary_layers": layers, "runtime_words": dict(self.raw_dictionary.maps[0])}
+
+    def release_shared_state(self):
+        for table in self.shared_dictionaries.values():
+            table.close()
+        self.shared_dictionaries = {}
+
+    @classmethod
+    def attach_shared_state(cls, shared_state):
+        """Make this process use the dictionaries from get_shared_state(), meant as a pool initializer."""
+        language_manager = cls()
+        language_manager.language_table = shared_state["language_table"]
+        language_manager.current_language = shared_state["current_language"]
+        language_manager.dictionary_layers = dict(shared_state["dictionary_layers"])
+        language_manager.raw_dictionary = ChainMap(dict(shared_state["runtime_words"]))
+        language_manager._rebuild_raw_dictionary()
+        return language_manager
 
     def load_language(self, language_config, force=False):
         if self.current_language == language_config["label"] and not force:
@@ -171,39 +199,165 @@ class LipsyncDoc:
         self.soundPath = ""
         self.sound = None
         self.voices = []
-        self.current_voice = None
         self.language_manager = langman
         self.parent = parent
         self.project_node = LipSyncObject(name=self.name, object_type="project")
+        # Voices whose phrases open_json(lazy_voices=True) hasn't read yet, mapped to their file offset.
+        self._pending_voices = {}
+        self._pending_source = None
+        self._current_voice = None
+        self.journal = None
+        self.recovered_autosave = False
+        self.undo_journal = UndoJournal()
+
+    @property
+    def current_voice(self):
+        return self._current_voice
+
+    @current_voice.setter
+    def current_voice(self, voice):
+        # A voice is read before it becomes current, so a pending voice is never shown
+        # (and edited, exported or saved) without its phrases.
+        if voice is not None:
+            self.load_voice(voice)
+        self._current_voice = voice
 
     @property
     def dirty(self):
-        return self._dirty
+        return self._dirty or self.project_node.changed or any(
+            voice.changed for voice in self.project_node.children)
 
     @dirty.setter
     def dirty(self, value):
         self._dirty = value
+        if not value:
+            self._clear_changed()
+
+    def _clear_changed(self):
+        self.project_node.clear_changed()
+        for voice in self.project_node.children:
+            voice.clear_changed()
 
     def __del__(self):
         # Properly close down the sound object
         if self.sound is not None:
             del self.sound
 
-    def open_json(self, path):
+    def open_json(self, path, lazy_voices=False):
+        """
+        Open a .pg2 project, building the nodes while the file is read.
+
+        With lazy_voices only the first voice gets its phrases right away, the
+        others are read from the file by load_voice() when they are needed.
+        """
         self._dirty = False
         self.path = os.path.normpath(path)
         self.name = os.path.basename(path)
         self.project_node.name = self.name
+        self.project_node.children = []
         self.sound = None
         self.voices = []
         self.current_voice = None
+        self._pending_voices = {}
+        self._pending_source = None
         try:
             with Path(path).open() as f:
-                json_data = json.load(f)
-            self.open_from_dict(json_data)
+                self._read_json_stream(JsonStreamReader(f), lazy_voices)
         except Exception as e:
             logging.error(f"Error opening JSON file {path}: {str(e)}")
             raise
+        if self._pending_voices:
+            self._pending_source = (self.path, os.stat(self.path).st_mtime_ns)
+        self.open_audio(self.soundPath)
+        if len(self.voices) > 0:
+            self.current_voice = self.voices[0]
+        self.dirty = False
+
+    def _read_json_stream(self, reader, lazy_voices):
+        self.parent.phonemeset.selected_set = "preston_blair"
+        # The voices take fps and sound_duration when they are built; if the file
+        # lists them after the voices, they are passed down once it is read.
+        late_settings = False
+        for key in reader.iter_object():
+            late_settings = late_settings or (key in ("fps", "sound_duration") and bool(self.voices))
+            if key == "voices":
+                for _ in reader.iter_array():
+                    self._read_json_voice(reader, defer_phrases=lazy_voices and len(self.voices) > 0)
+            elif key == "sound_path":
+                self.soundPath = reader.read_value()
+                if not os.path.isabs(self.soundPath):
+                    self.soundPath = os.path.normpath("{}/{}".format(os.path.dirname(self.path), self.soundPath))
+            elif key == "fps":
+                self.fps = reader.read_value()
+            elif key == "sound_duration":
+                self.soundDuration = reader.read_value()
+                self.project_node.sound_duration = self.soundDuration
+            elif key == "phoneme_set":
+                self.parent.phonemeset.selected_set = reader.read_value()
+            else:
+                reader.skip_value()
+        if late_settings:
+            for node in self.project_node.descendants:
+                node.fps = self.fps
+                node.sound_duration = self.soundDuration
+
+    def _read_json_voice(self, reader, defer_phrases=False):
+        voice = LipSyncObject(fps=self.fps, parent=self.project_node, object_type="voice",
+                              sound_duration=self.soundDuration)
+        for key in reader.iter_object():
+            if key == "phrases":
+                if defer_phrases:
+                    self._pending_voices[voice] = reader.tell()
+                    reader.skip_value()
+                else:
+                    for _ in reader.iter_array():
+                        self._add_phrase_from_dict(voice, reader.read_value())
+            elif key in ("name", "text", "num_children"):
+                setattr(voice, key, reader.read_value())
+            else:
+                reader.skip_value()
+        self.voices.append(voice)
+
+    def _add_phrase_from_dict(self, voice, phrase):
+        temp_phrase = LipSyncObject(text=phrase["text"], start_frame=phrase["start_frame"],
+                                    end_frame=phrase["end_frame"], tags=phrase["tags"], fps=self.fps,
+                                    object_type="phrase", parent=voice, sound_duration=self.soundDuration)
+        for word in phrase["words"]:
+            temp_word = LipSyncObject(text=word["text"], start_frame=word["start_frame"], fps=self.fps,
+                                      end_frame=word["end_frame"], tags=word["tags"], object_type="word",
+                                      parent=temp_phrase, sound_duration=self.soundDuration)
+            for phoneme in word["phonemes"]:
+                LipSyncObject(text=phoneme["text"], start_frame=phoneme["frame"],
+                              end_frame=phoneme["frame"], tags=phoneme["tags"], fps=self.fps,
+                              object_type="phoneme", parent=temp_word, sound_duration=self.soundDuration)
+
+    def load_voice(self, voice):
+        """Read the phrases of a voice that open_json(lazy_voices=True) skipped, if it hasn't been yet."""
+        if voice not in self._pending_voices:
+            return
+        # The voice stays pending until its phrases are read, so a failure here
+        # can't leave it empty (and saved empty later).
+        phrases = self._read_pending_phrases(voice)
+        with self.undo_journal.paused():
+            for phrase in phrases:
+                self._add_phrase_from_dict(voice, phrase)
+        del self._pending_voices[voice]
+        # Reading the phrases isn't an edit.
+        voice.clear_changed()
+
+    def _read_pending_phrases(self, voice):
+        """The phrases of a pending voice as dicts in the .pg2 layout, read from the source file."""
+        source_path, source_mtime = self._pending_source
+        with Path(source_path).open() as f:
+            if os.fstat(f.fileno()).st_mtime_ns != source_mtime:
+                raise RuntimeError("{} changed on disk, can't load voice {}".format(source_path, voice.name))
+            reader = JsonStreamReader(f)
+            reader.skip_to(self._pending_voices[voice])
+            return [reader.read_value() for _ in reader.iter_array()]
+
+    def load_all_voices(self):
+        for voice in list(self._pending_voices):
+            self.load_voice(voice)
 
     def open(self, path):
         self._dirty = False
@@ -232,6 +386,34 @@ class LipsyncDoc:
         self.open_audio(self.soundPath)
         if len(self.voices) > 0:
             self.current_voice = self.voices[0]
+        self.dirty = False
+
+    def open_binary(self, path):
+        """Open a .pgb project, see project_binary for the file layout."""
+        self._dirty = False
+        self.path = os.path.normpath(path)
+        self.name = os.path.basename(path)
+        self.project_node.name = self.name
+        self.project_node.children = []
+        self.sound = None
+        self.voices = []
+        self.current_voice = None
+        self._pending_voices = {}
+        self._pending_source = None
+        metadata, stores = project_binary.read_project(self.path)
+        self.soundPath = metadata["sound_path"]
+        if not os.path.isabs(self.soundPath):
+            self.soundPath = os.path.normpath("{}/{}".format(os.path.dirname(self.path), self.soundPath))
+        self.fps = metadata["fps"]
+        self.soundDuration = metadata["sound_duration"]
+        self.project_node.sound_duration = self.soundDuration
+        self.parent.phonemeset.selected_set = metadata.get("phoneme_set", "preston_blair")
+        for store in stores:
+            self.voices.append(store.to_voice(parent=self.project_node))
+        self.open_audio(self.soundPath)
+        if len(self.voices) > 0:
+            self.current_voice = self.voices[0]
+        self.dirty = False
 
     def get_audio_chunk(self, start_frame, end_frame):
         """Instead of loading the whole file we can just load a chunk of it."""
@@ -273,6 +455,7 @@ class LipsyncDoc:
         self.sound = None
         self.voices = []
         self.current_voice = None
+        self._pending_voices = {}
         self.soundPath = json_data.get("sound_path", "")
         if not os.path.isabs(self.soundPath):
             self.soundPath = os.path.normpath("{}/{}".format(os.path.dirname(self.path), self.soundPath))
@@ -280,71 +463,158 @@ class LipsyncDoc:
         self.soundDuration = json_data["sound_duration"]
         self.project_node.sound_duration = self.soundDuration
         self.parent.phonemeset.selected_set = json_data.get("phoneme_set", "preston_blair")
-        num_voices = json_data["num_voices"]
         for voice in json_data["voices"]:
             temp_voice = LipSyncObject(name=voice["name"], text=voice["text"], num_children=voice["num_children"],
                                        fps=self.fps, parent=self.project_node, object_type="voice",
                                        sound_duration=self.soundDuration)
             for phrase in voice["phrases"]:
-                temp_phrase = LipSyncObject(text=phrase["text"], start_frame=phrase["start_frame"],
-                                            end_frame=phrase["end_frame"], tags=phrase["tags"], fps=self.fps,
-                                            object_type="phrase", parent=temp_voice, sound_duration=self.soundDuration)
-                for word in phrase["words"]:
-                    temp_word = LipSyncObject(text=word["text"], start_frame=word["start_frame"], fps=self.fps,
-                                              end_frame=word["end_frame"], tags=word["tags"], object_type="word",
-                                              parent=temp_phrase, sound_duration=self.soundDuration)
-                    for phoneme in word["phonemes"]:
-                        temp_phoneme = LipSyncObject(text=phoneme["text"], start_frame=phoneme["frame"],
-                                                     end_frame=phoneme["frame"], tags=phoneme["tags"], fps=self.fps,
-                                                     object_type="phoneme", parent=temp_word,
-                                                     sound_duration=self.soundDuration)
+                self._add_phrase_from_dict(temp_voice, phrase)
             self.voices.append(temp_voice)
         self.open_audio(self.soundPath)
         if len(self.voices) > 0:
             self.current_voice = self.voices[0]
 
-    def copy_to_dict(self, saved_sound_path=""):
+    def copy_to_dict(self, saved_sound_path="", load_voices=True):
+        """
+        The project in the .pg2 layout.
+
+        With load_voices False pending voices aren't built, their phrases are
+        copied from the source file as they are.
+        """
+        if load_voices:
+            self.load_all_voices()
         if not saved_sound_path:
             saved_sound_path = self.soundPath
         out_dict = {"version": 2, "sound_path": saved_sound_path, "fps": self.fps,
                     "sound_duration": self.soundDuration,
                     "num_voices": len(self.project_node.children),
                     "phoneme_set": self.parent.phonemeset.selected_set}
-        list_of_voices = []
-        for voi_id, voice in enumerate(self.project_node.children):
-            start_frame = 0
-            end_frame = 1
-            if len(voice.children) > 0:
-                start_frame = voice.children[0].start_frame
-                end_frame = voice.children[-1].end_frame
-            json_data = {"name": voice.name, "start_frame": start_frame, "end_frame": end_frame,
-                         "text": voice.text, "num_children": len(voice.descendants)}
-            list_of_phrases = []
-            list_of_used_phonemes = []
-            for phr_id, phrase in enumerate(voice.children):
-                dict_phrase = {"id": phr_id, "text": phrase.text, "start_frame": phrase.start_frame,
-                               "end_frame": phrase.end_frame, "tags": phrase.tags}
-                list_of_words = []
-                for wor_id, word in enumerate(phrase.children):
-                    dict_word = {"id": wor_id, "text": word.text, "start_frame": word.start_frame,
-                                 "end_frame": word.end_frame, "tags": word.tags}
-                    list_of_phonemes = []
-                    for pho_id, phoneme in enumerate(word.children):
-                        dict_phoneme = {"id": pho_id, "text": phoneme.text,
-                                        "frame": phoneme.start_frame, "tags": phoneme.tags}
-                        list_of_phonemes.append(dict_phoneme)
-                        if phoneme.text not in list_of_used_phonemes:
-                            list_of_used_phonemes.append(phoneme.text)
-                    dict_word["phonemes"] = list_of_phonemes
-                    list_of_words.append(dict_word)
-                dict_phrase["words"] = list_of_words
-                list_of_phrases.append(dict_phrase)
-            json_data["phrases"] = list_of_phrases
-            json_data["used_phonemes"] = list_of_used_phonemes
-            list_of_voices.append(json_data)
-        out_dict["voices"] = list_of_voices
+        out_dict["voices"] = [self._voice_to_dict(voice) for voice in self.project_node.children]
         return out_dict
 
+    def _voice_to_dict(self, voice):
+        if voice in self._pending_voices:
+            return self._pending_voice_to_dict(voice)
+        start_frame = 0
+        end_frame = 1
+        if len(voice.children) > 0:
+            start_frame = voice.children[0].start_frame
+            end_frame = voice.children[-1].end_frame
+        json_data = {"name": voice.name, "start_frame": start_frame, "end_frame": end_frame,
+                     "text": voice.text, "num_children": len(voice.descendants)}
+        list_of_used_phonemes = []
+        json_data["phrases"] = [self._phrase_to_dict(phrase, phr_id, list_of_used_phonemes)
+                                for phr_id, phrase in enumerate(voice.children)]
+        json_data["used_phonemes"] = list_of_used_phonemes
+        return json_data
+
+    def _pending_voice_to_dict(self, voice):
+        """Like _voice_to_dict, with the phrases of a pending voice read from the source file."""
+        phrases = self._read_pending_phrases(voice)
+        list_of_used_phonemes = []
+        num_children = len(phrases)
+        for phrase in phrases:
+            num_children += len(phrase["words"])
+            for word in phrase["words"]:
+                num_children += len(word["phonemes"])
+                for phoneme in word["phonemes"]:
+                    if phoneme["text"] not in list_of_used_phonemes:
+                        list_of_used_phonemes.append(phoneme["text"])
+        return {"name": voice.name,
+                "start_frame": phrases[0]["start_frame"] if phrases else 0,
+                "end_frame": phrases[-1]["end_frame"] if phrases else 1,
+                "text": voice.text, "num_children": num_children,
+                "phrases": phrases, "used_phonemes": list_of_used_phonemes}
+
+    def _phrase_to_dict(self, phrase, phr_id, list_of_used_phonemes):
+        dict_phrase = {"id": phr_id, "text": phrase.text, "start_frame": phrase.start_frame,
+                       "end_frame": phrase.end_frame, "tags": phrase.tags}
+        list_of_words = []
+        for wor_id, word in enumerate(phrase.children):
+            dict_word = {"id": wor_id, "text": word.text, "start_frame": word.start_frame,
+                         "end_frame": word.end_frame, "tags": word.tags}
+            list_of_phonemes = []
+            for pho_id, phoneme in enumerate(word.children):
+                dict_phoneme = {"id": pho_id, "text": phoneme.text,
+                                "frame": phoneme.start_frame, "tags": phoneme.tags}
+                list_of_phonemes.append(dict_phoneme)
+                if phoneme.text not in list_of_used_phonemes:
+                    list_of_used_phonemes.append(phoneme.text)
+            dict_word["phonemes"] = list_of_phonemes
+            list_of_words.append(dict_word)
+        dict_phrase["words"] = list_of_words
+        return dict_phrase
+
+    def start_undo_journal(self):
+        """Record edits of the loaded document from now on, with an empty history."""
+        self.undo_journal.clear()
+        self.project_node.undo_journal = self.undo_journal
+
+    def get_autosave_path(self):
+        if self.path:
+            return "{}.autosave".format(self.path)
+        return os.path.join(utilities.get_app_data_path(), "autosave",
+                            "{}.autosave".format(os.path.basename(self.soundPath) or self.name))
+
+    def autosave(self):
+        """
+        Write the changes since the last autosave to the journal.
+
+        Only the phrases or voices that changed are appended, the journal is
+        rewritten as one snapshot when voices were added or removed or when it
+        needs compaction.
+        """
+        if self.journal is None:
+            self.journal = AutosaveJournal(self.get_autosave_path())
+        elif not (self.project_node.changed or any(voice.changed for voice in self.project_node.children)):
+            return False
+        self._dirty = self.dirty
+        if self.project_node.changed or self.journal.needs_compaction():
+            # Pending voices go into the snapshot without being built.
+            self.journal.write_snapshot(self.copy_to_dict(load_voices=False))
+        else:
+            delta = {"project": {"sound_path": self.soundPath, "fps": self.fps,
+                                 "sound_duration": self.soundDuration,
+                                 "phoneme_set": self.parent.phonemeset.selected_set},
+                     "voices": {}, "phrases": {}}
+            for voi_id, voice in enumerate(self.project_node.children):
+                if voice.changed_whole:
+                    delta["voices"][voi_id] = self._voice_to_dict(voice)
+                elif voice.changed_phrases:
+                    delta["phrases"][voi_id] = {phr_id: self._phrase_to_dict(phrase, phr_id, [])
+                                                for phr_id, phrase in enumerate(voice.children)
+                                                if phrase in voice.changed_phrases}
+            self.journal.append_delta(delta)
+        self._clear_changed()
+        return True
+
+    def has_autosave(self):
+        """True if an autosave journal newer than the project file exists."""
+        autosave_path = self.get_autosave_path()
+        if not os.path.exists(autosave_path):
+            return False
+        return not (self.path and os.path.exists(self.path)) or \
+            os.path.getmtime(autosave_path) > os.path.getmtime(self.path)
+
+    def recover_autosave(self):
+        """Replace the document with the state recorded in the autosave journal."""
+        project = AutosaveJournal(self.get_autosave_path()).replay()
+        if project is None:
+            return False
+        name = self.project_node.name
+        self.open_from_dict(project)
+        self.project_node.name = name
+        self._dirty = True
+        self.recovered_autosave = True
+        return True
+
+    def discard_autosave(self):
+        if self.journal is not None:
+            self.journal.discard()
+            self.journal = None
+        elif os.path.exists(self.get_autosave_path()):
+            os.remove(self.get_autosave_path())
+
     def save2(self, path):
         output_dict = self.copy_to_dict()
         with Path(path).open('w') as f:
@@ -356,7 +626,24 @@ class LipsyncDoc:
             saved_sound_path = os.path.basename(self.soundPath)
         else:
             saved_sound_path = self.soundPath
-        self._dirty = False
+        self.dirty = False
+        self.discard_autosave()
+
+    def save_binary(self, path):
+        self.load_all_voices()
+        self.path = os.path.normpath(path)
+        self.name = os.path.basename(path)
+        self.project_node.name = self.name
+        if os.path.dirname(self.path) == os.path.dirname(self.soundPath):
+            saved_sound_path = os.path.basename(self.soundPath)
+        else:
+            saved_sound_path = self.soundPath
+        stores = [TimelineStore.from_voice(voice) for voice in self.project_node.children]
+        project_binary.write_project(self.path, stores, sound_path=saved_sound_path, fps=self.fps,
+                                     sound_duration=self.soundDuration,
+                                     phoneme_set=self.parent.phonemeset.selected_set)
+        self.dirty = False
+        self.discard_autosave()
 
     def save(self, path):
         self.path = os.path.normpath(path)
@@ -366,6 +653,7 @@ class LipsyncDoc:
             saved_sound_path = os.path.basename(self.soundPath)
         else:
             saved_sound_path = self.soundPath
+        self.load_all_voices()
         out_file = open(self.path, "w")
         out_file.write("lipsync version 1\n")
         out_file.write("{}\n".format(saved_sound_path))
@@ -375,12 +663,14 @@ class LipsyncDoc:
         for voice in self.project_node.children:
             voice.save(out_file)
         out_file.close()
-        self._dirty = False
+        self.dirty = False
+        self.discard_autosave()
 
     def convert_to_phonemeset_old(self):
         # The base set is the CMU39 set, we will convert everything to that and from it to the desired one for now
         new_set = self.parent.main_window.phoneme_set.currentText()
         old_set = self.parent.phonemeset.selected_set
+        self.load_all_voices()
         if old_set != new_set:
             if old_set != "CMU_39":
                 conversion_map_to_cmu = {v: k for k, v in self.parent.phonemeset.conversion.items()}
@@ -405,6 +695,7 @@ class LipsyncDoc:
         # The base set is the CMU39 set, we will convert everything to that and from it to the desired one for now
         new_set = self.parent.main_window.phoneme_set.currentText()
         old_set = self.parent.phonemeset.selected_set
+        self.load_all_voices()
         conversion_dict = {}
         if old_set != new_set:
             new_map = PhonemeSet()
@@ -486,13 +777,25 @@ class LipsyncDoc:
                 list_of_words = []
                 mode = distribution_mode.lower()
                 if mode == "original":
-                    # Use original timestamps for each phoneme
+                    # Use original timestamps for each phoneme, one phoneme per word.
+                    # Phonemes closer together than a frame go on consecutive frames,
+                    # those pushed past the last frame of the sound are dropped.
+                    end_of_sound = int(round(self.soundDuration))
+                    last_frame = max(0, end_of_sound - 1)
+                    previous_frame = -1
                     for p in phoneme_results:
-                        start_frame = int(round(p["start"] * self.fps))
-                        end_frame = int(round((p.get("start", 0) + p.get("duration", 0)) * self.fps))
+                        if p.get("phoneme") is None:
+                            continue
+                        start_frame = max(int(round(p["start"] * self.fps)), previous_frame + 1)
+                        if start_frame > last_frame:
+                            logging.info("Dropping phonemes that start after the end of the sound")
+                            break
+                        end_frame = min(int(round((p.get("start", 0) + p.get("duration", 0)) * self.fps)),
+                                        end_of_sound)
                         if end_frame < start_frame:
                             end_frame = start_frame
                         list_of_words.append((start_frame, end_frame))
+                        previous_frame = start_frame
                 elif mode == "even":
                     # Distribute phonemes evenly across the sound duration
                     total_phonemes = len(phonemes)
@@ -529,7 +832,9 @@ class LipsyncDoc:
                     peak_right = word[1]
                     
                     # Calculate phonemes for this word considering remaining words and phonemes
-                    if i == len(list_of_words) - 1:
+                    if mode == "original":
+                        amount_of_phonemes = 1
+                    elif i == len(list_of_words) - 1:
                         # Last word - use all remaining phonemes
                         amount_of_phonemes = remaining_phonemes
                     else:
@@ -30,8 +30,10 @@ from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtCore import QFile
 from PySide6.QtUiTools import QUiLoader as uic
 
+import image_export
 import path_utils
 import utilities
+import video_export
 from AboutBoxQT import AboutBox
 from MouthViewQT import MouthView
 from SettingsQT import SettingsWindow
@@ -39,10 +41,10 @@ from WaveformViewRewrite import WaveformView
 import LipsyncDoc
 
 app_title = "Papagayo-NG"
-lipsync_extension_list = ("pgo", "pg2")
+lipsync_extension_list = ("pgo", "pg2", "pgb")
 audio_extension_list = ("wav", "mp3", "aiff", "aif", "au", "snd", "mov", "m4a")
 export_file_types = ("txt", "json", "dat")
-exporter_list = ("MOHO", "ALELO", "Images", "JSON")
+exporter_list = ("MOHO", "ALELO", "Images", "Video", "JSON")
 lipsync_extension = "".join(" *.{}".format(ext) for ext in lipsync_extension_list)[1:]
 audio_extensions = "".join(" *.{}".format(ext) for ext in audio_extension_list)[1:]
 open_wildcard = "{} and sound files ({} {})".format(app_title, audio_extensions, lipsync_extension)
@@ -151,6 +153,9 @@ def open_file_no_gui(path, parent):
         elif path.endswith(lipsync_extension_list[1]):
             # open a json based lipsync project
             doc.open_json(path)
+        elif path.endswith(lipsync_extension_list[2]):
+            # open a binary lipsync project
+            doc.open_binary(path)
         if doc.sound is None:
             logging.info(f"Could not load Sound file: {doc.soundPath}")
             return None
@@ -294,6 +299,10 @@ class LipsyncFrame:
         self.main_window.action_open.triggered.connect(self.on_open)
         self.main_window.action_save.triggered.connect(self.on_save)
         self.main_window.action_save_as.triggered.connect(self.on_save_as)
+        self.main_window.action_undo.triggered.connect(self.on_undo)
+        self.main_window.action_undo.setShortcut(QtGui.QKeySequence.StandardKey.Undo)
+        self.redo_shortcut = QtGui.QShortcut(QtGui.QKeySequence.StandardKey.Redo, self.main_window)
+        self.redo_shortcut.activated.connect(self.on_redo)
         self.main_window.action_zoom_in.triggered.connect(self.main_window.waveform_view.on_zoom_in)
         self.main_window.action_zoom_out.triggered.connect(self.main_window.waveform_view.on_zoom_out)
         self.main_window.action_reset_zoom.triggered.connect(self.main_window.waveform_view.on_zoom_reset)
@@ -333,6 +342,8 @@ class LipsyncFrame:
         self.change_stylesheet()
         self.cur_frame = 0
         self.timer = None
+        self.autosave_timer = QtCore.QTimer()
+        self.autosave_timer.timeout.connect(self.on_autosave)
         self.wv_height = 1
         self.old_height = self.wv_height
         self.zoom_factor = 1
@@ -401,6 +412,7 @@ class LipsyncFrame:
         target_voice_name = self.main_window.voice_for_selection.currentText()
         new_voice_parent = next(
             (v for v in self.doc.project_node.children if v.name == target_voice_name), None)
+        self.doc.load_voice(new_voice_parent)
         # Find existing parent object for selected one
         old_parent = moving_object.parent
         parent_instance = old_parent.object_type
@@ -450,12 +462,14 @@ class LipsyncFrame:
             if not old_parent.children:
                 old_parent.parent = None
         self.main_window.waveform_view.set_document(self.doc, force=True, clear_scene=True)
+        self._end_edit()
 
     def _sync_tags_from_widget(self):
         """Push the current contents of the tag list widget into the selected object's tags."""
         tags = [self.main_window.list_of_tags.item(i).text()
                 for i in range(self.main_window.list_of_tags.count())]
         self.main_window.waveform_view.currently_selected_object.set_tags(tags)
+        self._end_edit()
 
     def add_tag(self):
         if self.main_window.tag_entry.text():
@@ -470,13 +484,15 @@ class LipsyncFrame:
     def spread_out(self):
         wfv = self.main_window.waveform_view
         top_nodes = self.doc.current_voice.children
-        num_frames = wfv.waveform_polygon.polygon().boundingRect().width() / wfv.frame_width
+        num_frames = wfv.waveform_polygon.width() / wfv.frame_width
         frames_per_top_level = num_frames / len(top_nodes)
         for num, top_node in enumerate(top_nodes):
             top_node.start_frame = round((num * frames_per_top_level) + int(bool(num)))
             top_node.end_frame = round((num * frames_per_top_level) + frames_per_top_level)
-            top_node.move_button.after_reposition()
-            top_node.move_button.reposition_descendants2(True)
+            if top_node.move_button:
+                top_node.move_button.after_reposition()
+            top_node.reposition_descendants2(True)
+        wfv.update_visible_buttons()
 
     def apply_changed_fps(self):
         new_fps_value = self.main_window.fps_input.value()
@@ -557,6 +573,7 @@ class LipsyncFrame:
                     return False
             elif result == QtWidgets.QMessageBox.StandardButton.No:
                 self.config.set_fps(str(self.doc.fps))
+                self.doc.discard_autosave()
                 return True
         else:
             return True
@@ -574,11 +591,23 @@ class LipsyncFrame:
             self.open(file_path)
 
     def _open_lipsync_project(self, path):
-        """Open a .pgo/.pg2 project, prompting for audio if the referenced file is missing."""
+        """Open a .pgo/.pg2/.pgb project, prompting for audio if the referenced file is missing."""
         if path.endswith(lipsync_extension_list[0]):
             self.doc.open(path)
         elif path.endswith(lipsync_extension_list[1]):
-            self.doc.open_json(path)
+            # Only the first voice is built now, the others when their tab gets selected.
+            self.doc.open_json(path, lazy_voices=True)
+        elif path.endswith(lipsync_extension_list[2]):
+            self.doc.open_binary(path)
+        if self.doc.has_autosave():
+            result = QtWidgets.QMessageBox.question(
+                self.main_window, app_title,
+                self.translator.translate("LipsyncFrame",
+                                          "This project has unsaved changes from an autosave. Recover them?"))
+            if result == QtWidgets.QMessageBox.StandardButton.Yes:
+                self.doc.recover_autosave()
+            else:
+                self.doc.discard_autosave()
         while self.doc.sound is None:
             # if no sound file found, then ask user to specify one
             dlg = QtWidgets.QMessageBox(self.main_window)
@@ -655,7 +684,15 @@ class LipsyncFrame:
 
         # reload dictionary
         self.on_reload_dictionary()
-        self.doc.dirty = False
+        # Changes recovered from an autosave are still unsaved.
+        self.doc.dirty = self.doc.recovered_autosave
+        self.doc.start_undo_journal()
+        self._update_undo_actions()
+        autosave_interval = self.config.get_autosave_interval()
+        if autosave_interval > 0:
+            self.autosave_timer.start(autosave_interval * 1000)
+        else:
+            self.autosave_timer.stop()
 
     def open(self, path):
         while self.main_window.current_voice.tabBar().count() > 1:
@@ -668,6 +705,47 @@ class LipsyncFrame:
         if self.doc is not None:
             self._post_load_setup(path)
 
+    def _update_undo_actions(self):
+        self.main_window.action_undo.setEnabled(self.doc is not None and self.doc.undo_journal.can_undo)
+
+    def _end_edit(self):
+        """Make the edit that just finished one undo step."""
+        self.doc.undo_journal.checkpoint()
+        self._update_undo_actions()
+
+    def _refresh_after_undo(self):
+        self.doc.dirty = True
+        self.main_window.waveform_view.first_update = True
+        self.ignore_text_changes = True
+        self.main_window.voice_name_input.setText(self.doc.current_voice.name)
+        self.main_window.text_edit.setText(self.doc.current_voice.text)
+        self.ignore_text_changes = False
+        self.main_window.waveform_view.set_document(self.doc, True, True)
+        self._update_undo_actions()
+
+    def on_undo(self, event=None):
+        if self.doc is not None and self.doc.undo_journal.undo():
+            self._refresh_after_undo()
+
+    def on_redo(self, event=None):
+        if self.doc is not None and self.doc.undo_journal.redo():
+            self._refresh_after_undo()
+
+    def on_autosave(self):
+        if self.doc is None or not self.doc.dirty:
+            return
+        try:
+            self.doc.autosave()
+        except OSError as e:
+            logging.warning("Autosave failed: {}".format(e))
+        except RuntimeError as e:
+            # The project file changed on disk, so the voices that aren't loaded yet
+            # can't be read any more; every later tick would fail the same way.
+            logging.warning("Autosave failed, autosave is off until the project is reopened: {}".format(e))
+            self.autosave_timer.stop()
+            self.main_window.statusbar.showMessage(self.translator.translate(
+                "LipsyncFrame", "Autosave stopped: the project file changed on disk."))
+
     def on_save(self):
         if self.doc is None:
             return
@@ -678,6 +756,8 @@ class LipsyncFrame:
             self.doc.save(self.doc.path)
         elif self.doc.path.endswith(lipsync_extension_list[1]):
             self.doc.save2(self.doc.path)
+        elif self.doc.path.endswith(lipsync_extension_list[2]):
+            self.doc.save_binary(self.doc.path)
 
     def on_save_as(self):
         if self.doc is None:
@@ -693,6 +773,8 @@ class LipsyncFrame:
                 self.doc.save(file_path)
             elif file_path.endswith(lipsync_extension_list[1]):
                 self.doc.save2(file_path)
+            elif file_path.endswith(lipsync_extension_list[2]):
+                self.doc.save_binary(file_path)
             self.main_window.setWindowTitle("{} [{}] - {}".format(self.doc.name, file_path, app_title))
 
     def _set_doc_widgets_enabled(self, enabled):
@@ -742,6 +824,10 @@ class LipsyncFrame:
         self.settings_dlg.main_window.finished.connect(self.settings_closed)
 
     def settings_closed(self):
+        if self.doc is not None:
+            # The rest frame settings are baked into the per-voice frame tables.
+            for voice in self.doc.project_node.children:
+                voice.invalidate_frame_index()
         self.main_window.waveform_view.set_document(self.doc, True, True)
         self._set_recognizer_checkboxes(self.config.get_recognizer())
         self.change_stylesheet()
@@ -828,7 +914,7 @@ class LipsyncFrame:
         self.main_window.mouth_view.draw_me()
 
     def on_export_choice(self, event=None):
-        if self.main_window.export_combo.currentText() == "Images":
+        if self.main_window.export_combo.currentText() in ("Images", "Video"):
             self.main_window.choose_imageset_button.setEnabled(True)
         else:
             self.main_window.choose_imageset_button.setEnabled(False)
@@ -865,13 +951,21 @@ class LipsyncFrame:
                 return
             language = self.main_window.language_choice.currentText()
             phonemeset_name = self.main_window.phoneme_set.currentText()
-            old_doc = self.doc.copy_to_dict()
+            undo_journal = self.doc.undo_journal
+            undo_journal.begin()
             self.doc.dirty = True
-            self.doc.current_voice.children = []
-            return_value = self.doc.current_voice.run_breakdown(self.doc.soundDuration, self, language, self.langman,
-                                                                self.phonemeset)
+            try:
+                self.doc.current_voice.children = []
+                return_value = self.doc.current_voice.run_breakdown(self.doc.soundDuration, self, language,
+                                                                    self.langman, self.phonemeset)
+            except Exception:
+                undo_journal.rollback()
+                raise
             if return_value == -1:
-                self.doc.open_from_dict(old_doc)
+                undo_journal.rollback()
+            else:
+                undo_journal.commit()
+            self._update_undo_actions()
             self.phonemeset.selected_set = self.phonemeset.load(phonemeset_name)
             self.main_window.waveform_view.first_update = True
             self.ignore_text_changes = True
@@ -902,8 +996,13 @@ class LipsyncFrame:
             "message_key": "Export Image Strip",
             "default_ext": "",
             "wildcard_key": None,
-            "export": lambda self, fp, rest: self.doc.current_voice.export_images(
-                fp, self.main_window.mouth_choice.currentText(), rest),
+            "export": lambda self, fp, rest: self._export_image_strip(fp, rest),
+        },
+        "Video": {
+            "message_key": "Export Mouth Video",
+            "default_ext": ".mp4",
+            "wildcard_key": "Videos (*.mp4 *.mov *.mkv *.webm);;Image sequences (*.png);;Raw RGB frames (*.rgb)",
+            "export": lambda self, fp, rest: self._export_video(fp, rest),
         },
         "JSON": {
             "message_key": "Export JSON Object",
@@ -914,6 +1013,45 @@ class LipsyncFrame:
         },
     }
 
+    def _export_image_strip(self, file_path, rest_frames):
+        voice = self.doc.current_voice
+        mouth = self.main_window.mouth_choice.currentText()
+        exporter = image_export.ImageStripExporter()
+        self._run_export(
+            self.translator.translate("LipsyncFrame", "Exporting Image Strip..."), len(voice.leaves), exporter,
+            lambda progress_callback: voice.export_images(file_path, mouth, rest_frames, progress_callback, exporter),
+            self.translator.translate("LipsyncFrame", "Exported {0} images."))
+
+    def _export_video(self, file_path, rest_frames):
+        voice = self.doc.current_voice
+        mouth = self.main_window.mouth_choice.currentText()
+        exporter = video_export.VideoExporter()
+        self._run_export(
+            self.translator.translate("LipsyncFrame", "Exporting Video..."), voice.get_num_export_frames(), exporter,
+            lambda progress_callback: voice.export_video(file_path, mouth, self.doc.soundPath, progress_callback,
+                                                         exporter),
+            self.translator.translate("LipsyncFrame", "Exported {0} frames."))
+
+    def _run_export(self, label, total, exporter, export, done_message):
+        """Run export on a worker thread, with a progress dialog whose Cancel button cancels exporter."""
+        dialog = QtWidgets.QProgressDialog(
+            label, self.translator.translate("LipsyncFrame", "Cancel"), 0, total, self.main_window)
+        dialog.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(500)
+        dialog.canceled.connect(exporter.cancel)
+        worker = utilities.Worker(lambda progress_callback: export(progress_callback.emit))
+        # Keep the worker until its queued signals are delivered, see WaveformView.start_recalc.
+        worker.setAutoDelete(False)
+        worker.signals.progress.connect(dialog.setValue)
+        worker.signals.result.connect(lambda written: self.main_window.statusbar.showMessage(
+            self.translator.translate("LipsyncFrame", "Export cancelled.") if exporter.cancelled else
+            done_message.format(written), 5000))
+        worker.signals.error.connect(lambda error_info: self.show_error_dialog(str(error_info[1])))
+        worker.signals.finished.connect(dialog.reset)
+        worker.signals.finished.connect(lambda: setattr(self, "_export_worker", None))
+        self._export_worker = worker
+        self.threadpool.start(worker)
+
     def _alelo_fps_check(self):
         """ALELO expects 100 fps; warn and confirm before exporting at another rate."""
         if self.config.get_fps() == 100:
@@ -1026,18 +1164,18 @@ class LipsyncFrame:
         # and skips the expensive scene clear + waveform recalc.
         self.main_window.waveform_view.set_document(self.doc, True)
         self.main_window.mouth_view.draw_me()
+        self.doc.undo_journal.clear()
+        self._update_undo_actions()
 
     def on_del_object(self):
-        self.main_window.waveform_view.currently_selected_object.node.parent = None
-        all_delete_items = []
-        all_delete_items.extend(self.main_window.waveform_view.currently_selected_object.node.descendants)
-        all_delete_items.append(self.main_window.waveform_view.currently_selected_object.node)
-        for item in self.main_window.waveform_view.scene().items():
-            if isinstance(item, QtWidgets.QGraphicsProxyWidget):
-                for to_delete in all_delete_items:
-                    if item.widget() == to_delete.move_button:
-                        self.main_window.waveform_view.scene().removeItem(item)
-        del self.main_window.waveform_view.currently_selected_object.node
+        wfv = self.main_window.waveform_view
+        selected_button = wfv.currently_selected_object
+        selected_button.node.parent = None
+        selected_button.selected = False
+        wfv.currently_selected_object = None
+        # The buttons of the removed nodes go back to the pool.
+        wfv.update_visible_buttons()
+        self._end_edit()
 
     def on_del_voice(self, event=None):
         if (not self.doc) or (len(self.doc.project_node.children) == 1):
@@ -1049,12 +1187,15 @@ class LipsyncFrame:
             new_index -= 1
         else:
             new_index = 0
+        # Switch first: making a voice current reads its phrases if it is still
+        # pending, and if that fails nothing has been deleted yet.
+        remaining = [voice for voice in self.doc.project_node.children if voice is not voice_to_delete]
+        self.doc.current_voice = remaining[new_index]
         # Detach and delete the voice node.  Its MovableButton proxies are
         # cleaned up by set_document's _remove_all_button_proxies below —
         # no need to manually scan the scene here.
         voice_to_delete.parent = None
         del voice_to_delete
-        self.doc.current_voice = self.doc.project_node.children[new_index]
         # Suppress re-entrant tab/signal handling while we rebuild the UI.
         self._updating_voices = True
         self.ignore_text_changes = True
@@ -1078,6 +1219,9 @@ class LipsyncFrame:
         # and skips the expensive scene clear + waveform recalc.
         self.main_window.waveform_view.set_document(self.doc, True)
         self.main_window.mouth_view.draw_me()
+        # The voice tabs don't follow undo, so the history can't reach back past this.
+        self.doc.undo_journal.clear()
+        self._update_undo_actions()
 
     def on_voice_image_choose(self, event=None):
         language = self.main_window.language_choice.currentText()
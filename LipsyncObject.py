@@ -4,10 +4,13 @@ import anytree
 from pathlib import Path
 import importlib
 import logging
+import image_export
 import path_utils
 import utilities
+import video_export
 from PronunciationDialogQT import show_pronunciation_dialog
 from settings_manager import SettingsManager
+from frame_index import FrameIndex
 
 # Symbols stripped from words before dictionary/breakdown lookup.
 strip_symbols = '.,!?;-/()"'
@@ -18,28 +21,181 @@ class LipSyncObject(NodeMixin):
     '''
     This should be a general class for all LipSync Objects
     '''
+    # Set on the project node to record edits for undo, see undo_journal.
+    undo_journal = None
 
     def __init__(self, parent=None, children=None, object_type="voice", text="", start_frame=0, end_frame=0, name="",
                  tags=None, num_children=0, sound_duration=0, fps=24):
-        self.parent = parent
-        self.config = SettingsManager.get_instance()
-        if children:
-            self.children = children
+        # Set the data before attaching, the attach hook already needs the type and frames.
+        self._frame_index = None
+        # What changed since the last autosave, see _mark_changed().
+        self.changed_whole = False
+        self.changed_phrases = None
         self.object_type = object_type
         self.name = name
         self.text = text
         self.start_frame = start_frame
         self.end_frame = end_frame
+        self.parent = parent
+        self.config = SettingsManager.get_instance()
+        if children:
+            self.children = children
         self.tags = tags if tags else []
         self.num_children = num_children
         self.move_button = None
-        if self.parent:
+        if self.parent and not sound_duration:
             self.sound_duration = self.root.sound_duration
         else:
             self.sound_duration = sound_duration
         self.fps = fps
         self.last_returned_frame = "rest"
 
+    # The node attributes are properties so the frame index, the autosave change tracking
+    # and the undo journal can follow changes.
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        old_value = self.__dict__.get("_name")
+        self._name = value
+        if old_value is not None and old_value != value:
+            self._attribute_changed("name", old_value)
+
+    @property
+    def tags(self):
+        return self._tags
+
+    @tags.setter
+    def tags(self, value):
+        old_value = self.__dict__.get("_tags")
+        self._tags = value
+        if old_value is not None and old_value != value:
+            self._attribute_changed("tags", old_value)
+
+    @property
+    def start_frame(self):
+        return self._start_frame
+
+    @start_frame.setter
+    def start_frame(self, value):
+        old_value = self.__dict__.get("_start_frame")
+        self._start_frame = value
+        if old_value is not None and old_value != value:
+            self._attribute_changed("start_frame", old_value)
+
+    @property
+    def end_frame(self):
+        return self._end_frame
+
+    @end_frame.setter
+    def end_frame(self, value):
+        old_value = self.__dict__.get("_end_frame")
+        self._end_frame = value
+        if old_value is not None and old_value != value:
+            self._attribute_changed("end_frame", old_value)
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        old_value = self.__dict__.get("_text")
+        self._text = value
+        if old_value is not None and old_value != value:
+            self._attribute_changed("text", old_value)
+
+    @property
+    def frame_index(self):
+        """The FrameIndex of this voice, built on first use and kept up to date afterwards."""
+        if self._frame_index is None:
+            self._frame_index = FrameIndex(self)
+        return self._frame_index
+
+    def invalidate_frame_index(self):
+        """Drop the resolved frame table of this voice's FrameIndex, if it has one."""
+        if self._frame_index is not None:
+            self._frame_index.invalidate()
+
+    def _get_voice_frame_index(self, node=None):
+        node = self if node is None else node
+        while node is not None:
+            if node.object_type == "voice":
+                return node._frame_index
+            node = node.parent
+        return None
+
+    def _get_undo_journal(self, node=None):
+        node = self if node is None else node
+        while node.parent is not None:
+            node = node.parent
+        return node.undo_journal
+
+    def _attribute_changed(self, attribute, old_value):
+        if attribute in ("start_frame", "end_frame", "text"):
+            frame_index = self._get_voice_frame_index()
+            if frame_index is not None:
+                frame_index.node_changed(self, attribute, old_value)
+        self._mark_changed()
+        undo_journal = self._get_undo_journal()
+        if undo_journal is not None:
+            undo_journal.record_set(self, attribute, old_value, getattr(self, attribute))
+
+    def _post_attach(self, parent):
+        frame_index = self._get_voice_frame_index(parent)
+        if frame_index is not None:
+            frame_index.add_subtree(self)
+        parent._mark_changed()
+        undo_journal = self._get_undo_journal(parent)
+        if undo_journal is not None:
+            undo_journal.record_attach(self, parent)
+
+    def _pre_detach(self, parent):
+        undo_journal = self._get_undo_journal(parent)
+        # Looking up the index is linear, so only while it is recorded.
+        if undo_journal is not None and undo_journal.recording:
+            undo_journal.record_detach(self, parent, parent.children.index(self))
+
+    def _post_detach(self, parent):
+        frame_index = self._get_voice_frame_index(parent)
+        if frame_index is not None:
+            frame_index.remove_subtree(self)
+        parent._mark_changed()
+
+    def _mark_changed(self):
+        """
+        Record that this node or its children changed.
+
+        Changes inside a phrase are collected per phrase on the voice, changes of
+        the voice itself or its list of phrases flag the whole voice, and changes
+        of the list of voices flag the project node.
+        """
+        phrase = None
+        node = self
+        while node is not None:
+            if node.object_type == "phrase":
+                phrase = node
+            elif node.object_type in ("voice", "project"):
+                if phrase is None:
+                    node.changed_whole = True
+                else:
+                    if node.changed_phrases is None:
+                        node.changed_phrases = set()
+                    node.changed_phrases.add(phrase)
+                return
+            node = node.parent
+
+    @property
+    def changed(self):
+        """True if _mark_changed() was called for this voice or project since clear_changed()."""
+        return self.changed_whole or bool(self.changed_phrases)
+
+    def clear_changed(self):
+        self.changed_whole = False
+        self.changed_phrases = None
+
     def get_min_size(self):
         # An object should be at least be able to contain all it's phonemes since only 1 phoneme per frame is allowed.
         if self.object_type == "phoneme":
@@ -119,6 +275,11 @@ class LipSyncObject(NodeMixin):
         return right_most_pos
 
     def get_phoneme_at_frame(self, frame):
+        if self.object_type == "voice":
+            phoneme = self.frame_index.phoneme_starting_at(frame)
+            if phoneme is not None:
+                self.last_returned_frame = phoneme
+            return self.frame_index.get_phoneme(frame)
         for descendant in self.descendants:
             if descendant.object_type == "phoneme":
                 if descendant.start_frame == frame:
@@ -140,6 +301,8 @@ class LipSyncObject(NodeMixin):
                 return self.last_returned_frame
 
     def frame_is_in_word(self, frame):
+        if self.object_type == "voice":
+            return self.frame_index.is_in_word(frame)
         is_in_word = False
         for descendant in self.descendants:
             if descendant.object_type == "word":
@@ -174,7 +337,8 @@ class LipSyncObject(NodeMixin):
             for child in self.descendants:
                 child.start_frame += x_diff
                 child.end_frame += x_diff
-                child.move_button.after_reposition()
+                if child.move_button:
+                    child.move_button.after_reposition()
 
     def reposition_descendants2(self, did_resize=False, x_diff=0):
         if did_resize:
@@ -182,7 +346,8 @@ class LipSyncObject(NodeMixin):
                 for position, child in enumerate(self.children):
                     child.start_frame = round(self.start_frame +
                                               ((self.get_frame_size() / self.get_min_size()) * position))
-                    child.move_button.after_reposition()
+                    if child.move_button:
+                        child.move_button.after_reposition()
                 # self.wfv_parent.doc.dirty = True
             elif self.object_type == "phrase":
                 extra_space = self.get_frame_size() - self.get_min_size()
@@ -221,14 +386,16 @@ class LipSyncObject(NodeMixin):
                     if not moved_child and extra_space == 0:
                         break
                 for child in self.children:
-                    child.move_button.after_reposition()
+                    if child.move_button:
+                        child.move_button.after_reposition()
                     child.reposition_descendants2(True, 0)
                 # self.wfv_parent.doc.dirty = True
         else:
             for child in self.descendants:
                 child.start_frame += x_diff
                 child.end_frame += x_diff
-                child.move_button.after_reposition()
+                if child.move_button:
+                    child.move_button.after_reposition()
             # self.wfv_parent.doc.dirty = True
 
     def open(self, in_file):
@@ -433,34 +600,51 @@ class LipSyncObject(NodeMixin):
         out_file.write("{:d} {}\n".format(end_frame + 2, "rest"))
         out_file.close()
 
-    def export_images(self, path, currentmouth, use_rest_frame_settings=False):
+    def _export_mouth_dir(self, currentmouth):
         if not self.config.get_mouth_dir():
             logging.info("Use normal procedure.\n")
-            phonemedict = {}
-            mouth_full_dir = Path(path_utils.get_resource_path("rsrc", "mouths")) / currentmouth
-            for files in mouth_full_dir.iterdir():
-                phonemedict[files.stem] = files.suffix
-            for phoneme in self.leaves:
-                try:
-                    shutil.copy(mouth_full_dir / (phoneme.text + phonemedict[phoneme.text]),
-                                path + str(phoneme.start_frame).rjust(6, '0') +
-                                phoneme.text + phonemedict[phoneme.text])
-                except KeyError:
-                    logging.info("Phoneme \'{0}\' does not exist in chosen directory.".format(phoneme.text))
-
-        else:
-            logging.info("Use this dir: {}\n".format(self.config.get_mouth_dir()))
-            phonemedict = {}
-            for files in Path(self.config.get_mouth_dir()).iterdir():
-                phonemedict[files.stem] = files.suffix
-            for phoneme in self.leaves:
-                try:
-                    shutil.copy(
-                        "{}/{}{}".format(self.config.get_mouth_dir(), phoneme.text, phonemedict[phoneme.text]),
-                        "{}{}{}{}".format(path, str(phoneme.start_frame).rjust(6, "0"), phoneme.text,
-                                          phonemedict[phoneme.text]))
-                except KeyError:
-                    logging.info("Phoneme \'{0}\' does not exist in chosen directory.".format(phoneme.text))
+            return Path(path_utils.get_resource_path("rsrc", "mouths")) / currentmouth
+        logging.info("Use this dir: {}\n".format(self.config.get_mouth_dir()))
+        return Path(self.config.get_mouth_dir())
+
+    def export_images(self, path, currentmouth, use_rest_frame_settings=False, progress_callback=None,
+                      exporter=None):
+        """
+        Write the mouth image of every phoneme to path + frame number + phoneme.
+
+        The files are linked or copied by an ImageStripExporter, pass one as
+        exporter to be able to cancel the export. Returns the number of files written.
+        """
+        phonemedict = image_export.mouth_files(self._export_mouth_dir(currentmouth))
+        files = []
+        for phoneme in self.leaves:
+            try:
+                source = phonemedict[phoneme.text]
+            except KeyError:
+                logging.info("Phoneme \'{0}\' does not exist in chosen directory.".format(phoneme.text))
+                continue
+            files.append((source, "{}{}{}{}".format(path, str(phoneme.start_frame).rjust(6, "0"), phoneme.text,
+                                                    source.suffix)))
+        if exporter is None:
+            exporter = image_export.ImageStripExporter()
+        return exporter.export(files, progress_callback)
+
+    def export_video(self, path, currentmouth, sound_path=None, progress_callback=None, exporter=None):
+        """
+        Render the mouths of this voice into a video or image sequence at path, see video_export.
+
+        Pass a VideoExporter as exporter to be able to cancel the export.
+        Returns the number of frames written.
+        """
+        if exporter is None:
+            exporter = video_export.VideoExporter()
+        return exporter.export(self, image_export.mouth_files(self._export_mouth_dir(currentmouth)), path,
+                               self.fps, self.get_num_export_frames(), sound_path=sound_path,
+                               progress_callback=progress_callback)
+
+    def get_num_export_frames(self):
+        """The length of the sound in frames, or up to the last phoneme if that is longer."""
+        return max([self.sound_duration or 0] + [leaf.end_frame + 1 for leaf in self.leaves])
 
     def export_alelo(self, path, language, languagemanager, use_rest_frame_settings=False):
         out_file = open(path, 'w')
@@ -469,7 +653,7 @@ class LipSyncObject(NodeMixin):
                 text = word.text.strip(strip_symbols)
                 details = languagemanager.language_table[language]
                 if languagemanager.current_language != language:
-                    languagemanager.LoadLanguage(details)
+                    languagemanager.load_language(details)
                     languagemanager.current_language = language
                 if details["case"] == "upper":
                     pronunciation = languagemanager.raw_dictionary[text.upper()]
@@ -19,6 +19,7 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+from collections.abc import Mapping
 from pathlib import Path
 import path_utils
 
@@ -27,6 +28,49 @@ from PySide6 import QtGui, QtCore, QtWidgets
 import utilities
 
 
+class MouthSet(Mapping):
+    """The images of one mouth set by phoneme, decoded when the set is first used.
+
+    The phonemes are known from the file names, so listing the sets or
+    checking for a phoneme doesn't decode anything.
+    """
+
+    def __init__(self, dir_name, names, supported_imagetypes):
+        self.path = Path(dir_name)
+        self._paths = {}
+        for files in names:
+            if ".svn" in files or files.lower().split(".")[-1] not in supported_imagetypes:
+                continue
+            self._paths[files.split('.')[0]] = self.path.joinpath(files)
+        self._pixmaps = None
+
+    @property
+    def is_loaded(self):
+        return self._pixmaps is not None
+
+    def load(self):
+        if self._pixmaps is None:
+            self._pixmaps = {phoneme: QtGui.QPixmap(str(path)) for phoneme, path in self._paths.items()}
+        return self._pixmaps
+
+    def __getitem__(self, phoneme):
+        return self.load()[phoneme]
+
+    def __contains__(self, phoneme):
+        return phoneme in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+
+# directory -> (mtime_ns, MouthSet), shared by all MouthViews so every set is decoded
+# at most once. A set is listed and decoded again when its directory was modified.
+_mouth_sets = {}
+
+
 class MouthView(QtWidgets.QGraphicsView):
     def __init__(self, parent=None):
         super(MouthView, self).__init__(parent)
@@ -41,6 +85,13 @@ class MouthView(QtWidgets.QGraphicsView):
         self.current_phoneme = "rest"
         self.current_mouth = None
         self.mouths = {}
+        # Mouths scaled to the view, (mouth set, phoneme) -> QPixmap for _scaled_size.
+        # They are scaled again only when the view is resized.
+        self._scaled = {}
+        self._scaled_size = None
+        # The scene keeps one pixmap item and one text item, frames only swap the pixmap.
+        self._pixmap_item = None
+        self._missing_text = None
         self.load_mouths()
 
     def draw_me(self, dc=None):
@@ -55,22 +106,7 @@ class MouthView(QtWidgets.QGraphicsView):
                 self.current_phoneme = phoneme
         else:
             self.current_phoneme = "rest"
-        if not self.current_mouth:
-            self.current_mouth = list(self.mouths)[0]
-        if self.current_mouth in self.mouths.keys():
-            if self.current_phoneme in self.mouths[self.current_mouth].keys():
-                bitmap = self.mouths[self.current_mouth][self.current_phoneme]
-            else:
-                bitmap = self.mouths[self.current_mouth]["rest"]
-        else:
-            bitmap = self.mouths[list(self.mouths)[0]]["rest"]
-        self.scene().clear()
-        bitmap = bitmap.scaled(self.sceneRect().width() or 200, self.sceneRect().height() or 200,
-                               QtCore.Qt.AspectRatioMode.KeepAspectRatio)
-        self.scene().addPixmap(bitmap)
-        if self.current_phoneme not in self.mouths[self.current_mouth].keys():
-            self.scene().addText(self.translator.translate("MouthView", "Missing Mouth: {0}").format(self.current_phoneme), QtGui.QFont("Swiss", 14))
-        self.fitInView(self.x(), self.y(), self.width(), self.height())
+        self.show_phoneme(self.current_phoneme)
 
     def set_frame(self, frame):
         self.old_frame = self.cur_frame
@@ -78,50 +114,75 @@ class MouthView(QtWidgets.QGraphicsView):
         self.draw_me()
 
     def set_phoneme_picture(self, phoneme):
+        self.show_phoneme(phoneme)
+
+    def _view_size(self):
+        size = self.viewport().size()
+        return QtCore.QSize(size.width() or 200, size.height() or 200)
+
+    def _scaled_pixmap(self, mouth, phoneme):
+        size = self._view_size()
+        if size != self._scaled_size:
+            self._scaled.clear()
+            self._scaled_size = size
+        pixmap = self._scaled.get((mouth, phoneme))
+        if pixmap is None:
+            pixmap = self.mouths[mouth][phoneme].scaled(size, QtCore.Qt.AspectRatioMode.KeepAspectRatio)
+            self._scaled[(mouth, phoneme)] = pixmap
+        return pixmap
+
+    def show_phoneme(self, phoneme):
         if not self.current_mouth:
             self.current_mouth = list(self.mouths)[0]
-        if self.current_mouth in self.mouths.keys():
-            if phoneme in self.mouths[self.current_mouth].keys():
-                bitmap = self.mouths[self.current_mouth][phoneme]
-            else:
-                bitmap = self.mouths[self.current_mouth]["rest"]
+        mouth = self.current_mouth if self.current_mouth in self.mouths else list(self.mouths)[0]
+        missing = phoneme not in self.mouths[mouth]
+        pixmap = self._scaled_pixmap(mouth, "rest" if missing else phoneme)
+        if self._pixmap_item is None or self._pixmap_item.scene() is not self.scene():
+            self.scene().clear()
+            self._pixmap_item = self.scene().addPixmap(pixmap)
+            self._missing_text = self.scene().addText("", QtGui.QFont("Swiss", 14))
         else:
-            bitmap = self.mouths[list(self.mouths)[0]]["rest"]
-        self.scene().clear()
-        bitmap = bitmap.scaled(self.sceneRect().width() or 200, self.sceneRect().height() or 200,
-                               QtCore.Qt.AspectRatioMode.KeepAspectRatio)
-        self.scene().addPixmap(bitmap)
-        if phoneme not in self.mouths[self.current_mouth].keys():
-            self.scene().addText(self.translator.translate("MouthView", "Missing Mouth: {0}").format(phoneme), QtGui.QFont("Swiss", 14))
-        self.fitInView(self.x(), self.y(), self.width(), self.height())
+            self._pixmap_item.setPixmap(pixmap)
+        self._missing_text.setVisible(missing)
+        if missing:
+            self._missing_text.setPlainText(
+                self.translator.translate("MouthView", "Missing Mouth: {0}").format(phoneme))
+        if self.sceneRect() != self._pixmap_item.boundingRect():
+            self.setSceneRect(self._pixmap_item.boundingRect())
+            self.fitInView(self.sceneRect(), QtCore.Qt.AspectRatioMode.KeepAspectRatio)
+
+    def resizeEvent(self, event):
+        super(MouthView, self).resizeEvent(event)
+        if self.mouths:
+            self.show_phoneme(self.current_phoneme)
+            self.fitInView(self.sceneRect(), QtCore.Qt.AspectRatioMode.KeepAspectRatio)
 
     def set_document(self, doc):
         self.doc = doc
         self.draw_me()
 
     def process_mouth_dir(self, dir_name, names, supported_imagetypes):
-        has_images = False
-        for files in names:
-            files = files.lower()
-            if files.split(".")[-1] in supported_imagetypes:
-                has_images = True
-        if not has_images:
-            return
-        self.add_mouth(dir_name, names)
+        dir_name = Path(dir_name)
+        mtime = dir_name.stat().st_mtime_ns
+        cached = _mouth_sets.get(dir_name)
+        if cached is not None and cached[0] == mtime:
+            mouth_set = cached[1]
+        else:
+            mouth_set = MouthSet(dir_name, names, supported_imagetypes)
+            if not mouth_set:
+                _mouth_sets.pop(dir_name, None)
+                return
+            _mouth_sets[dir_name] = (mtime, mouth_set)
+        self.add_mouth(mouth_set)
 
     def load_mouths(self):
         supported_imagetypes = QtGui.QImageReader.supportedImageFormats()
         mouth_dir = Path(path_utils.get_resource_path("rsrc", "mouths"))
+        self._scaled.clear()
         for directory, dir_names, file_names in mouth_dir.walk():
             self.process_mouth_dir(directory, file_names, supported_imagetypes)
 
-    def add_mouth(self, dir_name, names):
-        bitmaps = {}
-        for files in names:
-            if ".svn" in files:
-                continue
-            path = dir_name.joinpath(files)
-            bitmaps[files.split('.')[0]] = QtGui.QPixmap(path)
-        self.mouths[dir_name.name] = bitmaps
+    def add_mouth(self, mouth_set):
+        self.mouths[mouth_set.path.name] = mouth_set
         if self.current_mouth is None:
-            self.current_mouth = dir_name.name
+            self.current_mouth = mouth_set.path.name
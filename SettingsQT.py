@@ -215,6 +215,7 @@ class SettingsWindow:
         
         self.main_window.rest_after_words.setChecked(self.settings_manager.get_rest_after_words())
         self.main_window.rest_after_phonemes.setChecked(self.settings_manager.get_rest_after_phonemes())
+        self.main_window.timeline_items.setChecked(self.settings_manager.get_timeline_items())
         
         recog_index = self.main_window.selected_recognizer.findText(self.settings_manager.get_recognizer())
         self.main_window.selected_recognizer.setCurrentIndex(recog_index)
@@ -301,6 +302,7 @@ class SettingsWindow:
         self.settings_manager.set_recognizer(self.main_window.selected_recognizer.currentText())
         self.settings_manager.set_rest_after_words(self.main_window.rest_after_words.isChecked())
         self.settings_manager.set_rest_after_phonemes(self.main_window.rest_after_phonemes.isChecked())
+        self.settings_manager.set_timeline_items(self.main_window.timeline_items.isChecked())
         self.settings_manager.set_language(self.main_window.ui_language.currentText())
         # Strip the download-status mark from the model name before saving.
         onnx_model_text = self.main_window.available_onnx_models.currentText()
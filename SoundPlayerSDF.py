@@ -2,11 +2,15 @@ import sounddevice as sd
 import soundfile as sf
 import numpy as np
 
+from audio_source import open_audio_source
+
 
 class SoundPlayer:
     def __init__(self, soundfile_path, parent=None, fps=24):
         self.soundfile_path = soundfile_path
-        self.soundfile, self.samplerate = sf.read(soundfile_path, dtype='float32')
+        # Samples are read on demand, see audio_source.
+        self.audio = open_audio_source(soundfile_path)
+        self.samplerate = self.audio.samplerate
         self.soundinfo = sf.info(soundfile_path)
         self.channels = self.soundinfo.channels
         self.volume = 1.0
@@ -19,6 +23,18 @@ class SoundPlayer:
         self.stream.start()
         self.playing = False
 
+    @property
+    def soundfile(self):
+        """All samples at once, this decodes the whole file."""
+        return self.audio.read(0, self.audio.frames)
+
+    @property
+    def length(self):
+        return self.audio.frames
+
+    def get_samples(self, start, end):
+        return self.audio.read(start, end)
+
     def change_fps(self, new_fps):
         self.fps = new_fps
         self.stream.close()
@@ -30,10 +46,10 @@ class SoundPlayer:
         if self.playing:
             start = self.current_frame
             end = start + frames
-            if end > len(self.soundfile):
-                end = len(self.soundfile)
+            if end > self.audio.frames:
+                end = self.audio.frames
                 self.playing = False
-            data = self.soundfile[start:end] * self.volume
+            data = self.audio.read(start, end) * self.volume
             if self.channels == 1:
                 data = np.expand_dims(data, axis=1)
             outdata[:len(data)] = data
@@ -79,9 +95,9 @@ class SoundPlayer:
         return self.soundinfo.duration
 
     def get_rms_amplitude(self, time_pos, sample_dur):
-        time_start = time_pos * (len(self.soundfile) / self.Duration())
-        time_end = (time_pos + sample_dur) * (len(self.soundfile) / self.Duration())
-        samples = self.soundfile[int(time_start):int(time_end)]
+        time_start = time_pos * (self.audio.frames / self.Duration())
+        time_end = (time_pos + sample_dur) * (self.audio.frames / self.Duration())
+        samples = self.audio.read(int(time_start), int(time_end))
 
         if len(samples):
             rms_amplitude = np.sqrt(np.mean(samples ** 2))
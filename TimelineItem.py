@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: ISO-8859-1 -*-
+
+"""TimelineItem: a lipsync object painted directly as a QGraphicsItem.
+
+The lightweight alternative to MovableButton, enabled with the
+"timeline_items" graphics setting. A MovableButton is a QPushButton inside a
+QGraphicsProxyWidget with its own stylesheet and widget event handling,
+which gets expensive with thousands of nodes on screen. A TimelineItem only
+paints a rectangle, its handles and its text, with pens and brushes that are
+shared by all items of the same type and state, and handles move and resize
+in the scene's mouse events.
+
+Dragging and resizing follow the same rules as MovableButton, both come
+from TimelineNodeMixin and WaveformView.move_button_to. WaveformView treats
+both the same way, so TimelineItem provides the widget style geometry
+methods (move, resize, setGeometry, width, height) MovableButton has.
+"""
+
+from PySide6 import QtCore, QtGui
+import PySide6.QtWidgets as QtWidgets
+
+from MovableButton import TimelineNodeMixin, cached_style, node_colors
+
+
+def _style(object_type, selected, has_tags):
+    """The (fill brush, handle brush, border pen) shared by all items in this state."""
+    def build():
+        fill, line = node_colors(object_type)
+        border = QtGui.QPen(line, 2 if selected else 1)
+        border.setJoinStyle(QtCore.Qt.PenJoinStyle.MiterJoin)
+        if has_tags and object_type != "phoneme":
+            border.setStyle(QtCore.Qt.PenStyle.DashLine)
+        return QtGui.QBrush(fill), QtGui.QBrush(line), border
+    return cached_style(("item", object_type, selected, has_tags), build)
+
+
+class TimelineItem(TimelineNodeMixin, QtWidgets.QGraphicsItem):
+    def __init__(self, lipsync_object, wfv_parent, phoneme_offset=None):
+        super(TimelineItem, self).__init__()
+        self.wfv_parent = wfv_parent
+        # WaveformView positions buttons through their proxy, an item is its own.
+        self.proxy = self
+        self._width = 0
+        self._height = 0
+        self._font = QtWidgets.QApplication.font()
+        self._metrics = QtGui.QFontMetrics(self._font)
+        self.bind(lipsync_object, phoneme_offset)
+
+    def bind(self, lipsync_object, phoneme_offset=None):
+        """Show ``lipsync_object`` with this item, see MovableButton.bind."""
+        self.title = lipsync_object.text
+        self.node = lipsync_object
+        self.node.move_button = self
+        self.phoneme_offset = phoneme_offset if phoneme_offset is not None else 0
+        self.is_resizing = False
+        self.is_moving = False
+        self.resize_origin = 0  # 0 = left, 1 = right
+        self.hot_spot = 0
+        self._selected = False
+        self._has_tags = bool(lipsync_object.tags)
+        self.setToolTip(lipsync_object.text)
+        self.fit_text_to_size()
+        self.update()
+
+    # ------------------------------------------------------------------ #
+    # Widget style geometry
+    # ------------------------------------------------------------------ #
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def move(self, x, y):
+        self.setPos(x, y)
+
+    def resize(self, width, height):
+        # The minimum width of a MovableButton is one frame.
+        width = max(width, self.convert_to_pixels(1))
+        if width != self._width or height != self._height:
+            self.prepareGeometryChange()
+            self._width = width
+            self._height = height
+
+    def setGeometry(self, *rect):
+        if len(rect) == 1:
+            rect = rect[0]
+            rect = (rect.x(), rect.y(), rect.width(), rect.height())
+        x, y, width, height = rect
+        self.setPos(x, y)
+        self.resize(width, height)
+
+    def boundingRect(self):
+        return QtCore.QRectF(0, 0, self._width, self._height)
+
+    @property
+    def selected(self):
+        return self._selected
+
+    @selected.setter
+    def selected(self, value):
+        value = bool(value)
+        if value != self._selected:
+            self._selected = value
+            self.update()
+
+    # ------------------------------------------------------------------ #
+    # Painting
+    # ------------------------------------------------------------------ #
+    def paint(self, painter, option, widget=None):
+        fill, handle_brush, border = _style(self.node.object_type, self._selected, self._has_tags)
+        rect = self.boundingRect()
+        painter.setPen(QtCore.Qt.PenStyle.NoPen)
+        painter.setBrush(fill)
+        painter.drawRect(rect)
+        inset = border.widthF() / 2
+        if self.is_phoneme():
+            painter.setPen(border)
+            painter.setBrush(QtCore.Qt.BrushStyle.NoBrush)
+            painter.drawRect(rect.adjusted(inset, inset, -inset, -inset))
+        else:
+            # Phrase/word: left/right handles are wider; top/bottom are lines.
+            handle = self.get_handle_width()
+            painter.setBrush(handle_brush)
+            painter.drawRect(QtCore.QRectF(0, 0, handle, self._height))
+            painter.drawRect(QtCore.QRectF(self._width - handle, 0, handle, self._height))
+            painter.setPen(border)
+            painter.drawLine(QtCore.QLineF(handle, inset, self._width - handle, inset))
+            painter.drawLine(QtCore.QLineF(handle, self._height - inset, self._width - handle, self._height - inset))
+        if self.title:
+            painter.setPen(QtCore.Qt.GlobalColor.black)
+            painter.setFont(self._font)
+            painter.drawText(rect, QtCore.Qt.AlignmentFlag.AlignCenter, self.title)
+
+    # ------------------------------------------------------------------ #
+    # Text fitting
+    # ------------------------------------------------------------------ #
+    def _available_width(self):
+        pad = self.convert_to_pixels(0.5)
+        if self.is_phoneme():
+            return self.convert_to_pixels(self.node.get_frame_size()) - pad
+        return self.convert_to_pixels(self.node.get_frame_size()) + pad
+
+    def fit_text_to_size(self):
+        """Truncate the displayed title so it fits, see MovableButton.fit_text_to_size."""
+        full = self.node.text
+        avail = self._available_width()
+        if self._metrics.horizontalAdvance(full) <= avail:
+            self.title = full
+            return
+        lo, hi = 0, len(full)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._metrics.horizontalAdvance(full[:mid]) <= avail:
+                lo = mid
+            else:
+                hi = mid - 1
+        self.title = full[:lo]
+
+    # ------------------------------------------------------------------ #
+    # Repositioning
+    # ------------------------------------------------------------------ #
+    def after_reposition(self):
+        self.setGeometry(self.convert_to_pixels(self.node.start_frame), self.y(),
+                         self.convert_to_pixels(self.node.get_frame_size()), self.height())
+        self.update()
+
+    # ------------------------------------------------------------------ #
+    # Tags
+    # ------------------------------------------------------------------ #
+    def set_tags(self, new_taglist):
+        self.node.tags = new_taglist
+        self.setToolTip("".join("{}\n".format(entry) for entry in self.node.tags)[:-1])
+        self._has_tags = len(self.node.tags) > 0
+        self.update()
+
+    # ------------------------------------------------------------------ #
+    # Mouse handling
+    # ------------------------------------------------------------------ #
+    def mousePressEvent(self, event):
+        if self.wfv_parent.doc.sound.is_playing():
+            return
+        if event.button() == QtCore.Qt.MouseButton.RightButton and self.is_word():
+            # Manually enter the pronunciation for this word.
+            self._edit_pronunciation(self.wfv_parent)
+            return
+        if event.button() == QtCore.Qt.MouseButton.LeftButton:
+            # Accepting the press makes this item receive the move and release events.
+            self.hot_spot = event.pos().x()
+            event.accept()
+
+    def mouseMoveEvent(self, event):
+        if self.wfv_parent.doc.sound.is_playing():
+            return
+        if event.buttons() != QtCore.Qt.MouseButton.LeftButton:
+            return
+        scene_x = event.scenePos().x()
+        if not self.is_moving and not self.is_resizing:
+            self._pick_drag_mode(scene_x)
+            self.is_moving = not self.is_resizing
+        if self.is_resizing:
+            self._resize_to(scene_x)
+        else:
+            self.wfv_parent.move_button_to(self, scene_x - self.hot_spot)
+
+    def mouseDoubleClickEvent(self, event):
+        if self.wfv_parent.doc.sound.is_playing() or self.is_phoneme():
+            return
+        self._play_node()
+
+    def mouseReleaseEvent(self, event):
+        if self.is_moving:
+            self.is_moving = False
+            # Children may have moved into or out of view.
+            self.wfv_parent.update_visible_buttons()
+            self._end_edit()
+        self._finish_mouse_edit()
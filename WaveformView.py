@@ -37,11 +37,17 @@ from LipsyncDoc import *  # noqa: F401,F403  (star-import kept for back-compat)
 import utilities
 from SceneWithDrag import SceneWithDrag
 from MovableButton import MovableButton
+from TimelineItem import TimelineItem
+from waveform_envelope import EnvelopePyramid, MAX_SAMPLES_PER_FRAME
+from waveform_cache import WaveformCache
 
 # Constants --------------------------------------------------------------- #
 font = QtGui.QFont("Swiss", 6)
 default_sample_width = 4
 default_samples_per_frame = 2
+# Buttons are created for nodes within this many viewport widths left and
+# right of the visible area, so short scrolls don't have to rebind anything.
+button_margin = 0.5
 
 
 def normalize(x):
@@ -56,30 +62,29 @@ def normalize(x):
 
 # ------------------------------------------------------------------------- #
 # Worker for off-UI-thread waveform computation.
-# Returns (amp_array, num_samples) -- no Qt scene objects are touched here.
+# Returns (envelope, amp_array, num_samples) -- no Qt scene objects are
+# touched here.
 # ------------------------------------------------------------------------- #
 class _WaveformRecalcWorker(QtCore.QRunnable):
-    def __init__(self, sound, samples_per_sec, duration):
+    def __init__(self, sound, fps, samples_per_frame, cache):
         super().__init__()
         self._sound = sound
-        self._samples_per_sec = samples_per_sec
-        self._duration = duration
+        self._fps = fps
+        self._samples_per_frame = samples_per_frame
+        self._cache = cache
         self.signals = utilities.WorkerSignals()
 
     @QtCore.Slot()
     def run(self):
         try:
-            sample_dur = 1.0 / self._samples_per_sec
-            n = max(1, int(self._duration / sample_dur) + 1)
-            amp = np.empty(n, dtype=float)
-            time_pos = 0.0
-            for i in range(n):
-                amp[i] = self._sound.get_rms_amplitude(time_pos, sample_dur)
-                time_pos += sample_dur
-                if i % max(1, n // 100) == 0:
-                    self.signals.progress.emit(int(100 * i / n))
-            amp = normalize(amp)
-            self.signals.result.emit((amp, n))
+            envelope = self._cache.load(self._sound, self._fps)
+            if envelope is None:
+                envelope = EnvelopePyramid.from_sound(
+                    self._sound, self._fps,
+                    lambda seconds: self.signals.progress.emit(int(seconds)))
+                self._cache.store(envelope)
+            amp = normalize(envelope.rms(self._samples_per_frame))
+            self.signals.result.emit((envelope, amp, len(amp)))
             self.signals.finished.emit()
         except Exception:
             import traceback
@@ -87,6 +92,68 @@ class _WaveformRecalcWorker(QtCore.QRunnable):
             self.signals.error.emit((exctype, value, traceback.format_exc()))
 
 
+# ------------------------------------------------------------------------- #
+# Scene item drawing the waveform envelope.
+# Only the samples inside the exposed rect are turned into points, so a long
+# sound costs nothing more than a short one at paint time.
+# ------------------------------------------------------------------------- #
+class WaveformItem(QtWidgets.QGraphicsItem):
+    def __init__(self, pen, brush):
+        super().__init__()
+        self.setFlag(QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        self._pen = QtGui.QPen(pen)
+        self._brush = QtGui.QBrush(brush)
+        self._amp = np.array([], dtype=float)
+        self._sample_width = 1
+        self._half_height = 0
+        self._peak = 0.0
+
+    def set_waveform(self, amp, sample_width, half_height):
+        """Show amp (normalized, one value per display sample) as bars of sample_width."""
+        self.prepareGeometryChange()
+        self._amp = np.asarray(amp, dtype=float)
+        self._sample_width = sample_width
+        self._half_height = half_height
+        self._peak = float(self._amp.max()) * half_height if self._amp.size else 0.0
+        self.update()
+
+    def width(self):
+        return self._amp.size * self._sample_width
+
+    def boundingRect(self):
+        margin = self._pen.widthF() + 1
+        return QtCore.QRectF(-margin, self._half_height - self._peak - margin,
+                             self.width() + 2 * margin, 2 * (self._peak + margin))
+
+    def paint(self, painter, option, widget=None):
+        n = self._amp.size
+        if n == 0:
+            return
+        sw = self._sample_width
+        # QGraphicsScene.render() exposes the whole item, so also clip to what the painter can reach.
+        to_item, _ = painter.worldTransform().inverted()
+        exposed = option.exposedRect.intersected(to_item.mapRect(QtCore.QRectF(painter.viewport())))
+        # One extra sample on each side keeps the cut edges of the outline out of view.
+        first = max(0, int(exposed.left() // sw) - 1)
+        last = min(n, int(exposed.right() // sw) + 2)
+        if first >= last:
+            return
+        fitted = self._amp[first:last] * self._half_height
+        edges = np.arange(first, last + 1) * sw
+        # Upper envelope left to right: (x, y) then (x + sw, y) per sample,
+        # followed by the mirrored lower envelope right to left.
+        upper_x = np.empty(2 * fitted.size)
+        upper_x[0::2] = edges[:-1]
+        upper_x[1::2] = edges[1:]
+        upper_y = np.repeat(self._half_height - fitted, 2)
+        lower_y = np.repeat(self._half_height + fitted, 2)[::-1]
+        all_x = np.concatenate([upper_x, upper_x[::-1]]).tolist()
+        all_y = np.concatenate([upper_y, lower_y]).tolist()
+        painter.setPen(self._pen)
+        painter.setBrush(self._brush)
+        painter.drawPolygon(QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in zip(all_x, all_y)]))
+
+
 class WaveformView(QtWidgets.QGraphicsView):
     def __init__(self, parent=None):
         super(WaveformView, self).__init__(parent)
@@ -127,10 +194,21 @@ class WaveformView(QtWidgets.QGraphicsView):
         self.temp_word = None
         self.temp_phoneme = None
         self.temp_button = None
+        # Buttons exist only for the nodes around the visible area, see
+        # update_visible_buttons. id(node) -> button, and hidden spare buttons.
+        self._bound_buttons = {}
+        self._button_pool = []
+        # Paint nodes as TimelineItems instead of MovableButton widgets.
+        self.use_timeline_items = self.settings.get_timeline_items()
         self.draw_play_marker = False
         self.num_samples = 0
         self.list_of_lines = []
         self.amp = np.array([], dtype=float)
+        # Amplitude envelope of the current sound at every zoom level, built
+        # once per sound and fps; zooming only slices it. Envelopes are kept
+        # on disk as well, so reopening a project doesn't scan its sound again.
+        self._envelope = None
+        self.waveform_cache = WaveformCache()
         self.temp_play_marker = None
         self.scroll_position = 0
         self.first_update = True
@@ -152,11 +230,14 @@ class WaveformView(QtWidgets.QGraphicsView):
         self._bg_cache_key = None  # (frame_width, samples_per_frame, num_samples, height)
         self._bg_lines = []        # list[QLineF]
         self._bg_texts = []        # list[(QRectF, str)]
+        self._bg_line_xs = np.array([])  # x of each line / text, for clipping
+        self._bg_text_xs = np.array([])
 
         self.scene().setSceneRect(0, 0, self.width(), self.height())
         self.resize_timer = QtCore.QTimer(self)
         self.resize_timer.setSingleShot(True)
         self.resize_timer.timeout.connect(self.resize_finished)
+        self.horizontalScrollBar().valueChanged.connect(self.update_visible_buttons)
 
     # ------------------------------------------------------------------ #
     # Helpers
@@ -275,14 +356,16 @@ class WaveformView(QtWidgets.QGraphicsView):
             super(WaveformView, self).mousePressEvent(event)
             return
         possible_item = self.itemAt(event.pos())
-        if type(possible_item) == QtWidgets.QGraphicsPolygonItem:
+        if isinstance(possible_item, QtWidgets.QGraphicsProxyWidget):
+            possible_item = possible_item.widget()
+        elif not isinstance(possible_item, TimelineItem):
             possible_item = None
         if not possible_item:
             self._select_object(None)
             self._populate_tag_panel(None)
             self.is_scrubbing = True
         else:
-            widget = possible_item.widget()
+            widget = possible_item
             self._select_object(widget)
             self._populate_tag_panel(widget)
         event.accept()
@@ -324,7 +407,11 @@ class WaveformView(QtWidgets.QGraphicsView):
                      - ((self.width() - self.sceneRect().width()) / 2) - e.source().hot_spot)
         else:
             new_x = position.x() + self.horizontalScrollBar().value() - e.source().hot_spot
-        dropped_widget = e.source()
+        self.move_button_to(e.source(), new_x)
+        e.accept()
+
+    def move_button_to(self, dropped_widget, new_x):
+        """Move a button to new_x if its node fits there, snapping to whole frames."""
         if new_x >= dropped_widget.node.get_left_max() * self.frame_width:
             if new_x + dropped_widget.width() <= dropped_widget.node.get_right_max() * self.frame_width:
                 dropped_widget.move(new_x, dropped_widget.y())
@@ -335,12 +422,11 @@ class WaveformView(QtWidgets.QGraphicsView):
                 else:
                     x_diff = round(dropped_widget.x() / self.frame_width) - dropped_widget.node.start_frame
                     dropped_widget.node.start_frame = round(dropped_widget.x() / self.frame_width)
-                    dropped_widget.end_frame = round(
+                    dropped_widget.node.end_frame = round(
                         (dropped_widget.x() + dropped_widget.width()) / self.frame_width)
                     dropped_widget.move(dropped_widget.node.start_frame * self.frame_width, dropped_widget.y())
                 dropped_widget.reposition_descendants(False, x_diff)
                 self.doc.dirty = True
-        e.accept()
 
     # ------------------------------------------------------------------ #
     # Play marker / frame tracking
@@ -376,15 +462,20 @@ class WaveformView(QtWidgets.QGraphicsView):
         cache_key = (self.frame_width, self.samples_per_frame, len(self.amp), bg_height)
         if cache_key != self._bg_cache_key:
             self._build_bg_cache(cache_key, text_width, top_border, bg_height)
-        if self._bg_lines:
-            painter.drawLines(self._bg_lines)
-        for text_rect, label in self._bg_texts:
+        # The caches are sorted by x, only draw what lies in the exposed rect.
+        first, last = np.searchsorted(self._bg_line_xs, [rect.left() - 1, rect.right() + 1])
+        if last > first:
+            painter.drawLines(self._bg_lines[first:last])
+        first, last = np.searchsorted(self._bg_text_xs, [rect.left() - text_width - 4, rect.right() + 1])
+        for text_rect, label in self._bg_texts[first:last]:
             painter.drawText(text_rect, QtCore.Qt.AlignmentFlag.AlignLeft, label)
 
     def _build_bg_cache(self, cache_key, text_width, top_border, bg_height):
         self._bg_cache_key = cache_key
         self._bg_lines = []
         self._bg_texts = []
+        self._bg_line_xs = np.array([])
+        self._bg_text_xs = np.array([])
         frame_width, samples_per_frame, n_samples, _ = cache_key
         if n_samples == 0:
             return
@@ -412,6 +503,8 @@ class WaveformView(QtWidgets.QGraphicsView):
                 text_rect = QtCore.QRectF(int(xf + 4), fm.height() - 2,
                                           text_width, top_border)
                 self._bg_texts.append((text_rect, str(int(frame))))
+        self._bg_line_xs = np.array([line.x1() for line in self._bg_lines])
+        self._bg_text_xs = np.array([text_rect.x() for text_rect, _ in self._bg_texts])
 
     # ------------------------------------------------------------------ #
     # Waveform creation (vectorized)
@@ -430,7 +523,7 @@ class WaveformView(QtWidgets.QGraphicsView):
         update_rect = self.scene().sceneRect()
         update_rect.setHeight(self.size().height() - 1)
         if self.doc and self.waveform_polygon is not None:
-            update_rect.setWidth(self.waveform_polygon.polygon().boundingRect().width())
+            update_rect.setWidth(self.waveform_polygon.width())
             self.setSceneRect(update_rect)
             self.scene().setSceneRect(update_rect)
         self.horizontalScrollBar().setValue(self.scroll_position)
@@ -440,66 +533,30 @@ class WaveformView(QtWidgets.QGraphicsView):
                     self.temp_play_marker.rect().x(), 1, self.frame_width + 1, self.height())
         except RuntimeError:
             pass
-        if self.waveform_polygon is not None:
-            self.waveform_polygon.resetTransform()
         self.scene().update()
 
     def create_waveform(self, progress_callback):
-        """Build the waveform polygon from ``self.amp`` using numpy.
+        """Hand ``self.amp`` to the waveform item.
 
-        The old implementation appended points one-by-one in a Python loop and
-        called ``progress_callback`` + ``statusbar.showMessage`` per sample.
-        Here the upper and lower envelope point arrays are constructed with
-        numpy and converted to a QPolygonF in one shot.
+        The item only builds points for the part of the scene being painted,
+        so this no longer depends on the length of the sound.
         """
         if self.amp.size == 0:
             return
         available_height = int(self.height() / 2)
-        fitted = self.amp * available_height
-        offset = 0
-        n = fitted.size
-        sw = self.sample_width
-
-        # Upper envelope: for each sample, (x, y) then (x+sw, y).
-        xs0 = np.arange(n) * sw
-        xs1 = xs0 + sw
-        upper_x = np.empty(2 * n)
-        upper_y = np.empty(2 * n)
-        upper_x[0::2] = xs0
-        upper_x[1::2] = xs1
-        upper_y[0::2] = available_height - fitted + offset
-        upper_y[1::2] = available_height - fitted + offset
-
-        # Lower envelope: mirror, reversed.
-        rev = fitted[::-1]
-        lower_x = np.empty(2 * n)
-        lower_y = np.empty(2 * n)
-        lower_x[0::2] = (n - np.arange(n)) * sw
-        lower_x[1::2] = (n - np.arange(n) - 1) * sw
-        lower_y[0::2] = available_height + rev + offset
-        lower_y[1::2] = available_height + rev + offset
-        # Drop the degenerate duplicate at index 0 of the lower run.
-        if n > 0:
-            lower_y[0] = lower_y[1]
-
-        all_x = np.concatenate([upper_x, lower_x])
-        all_y = np.concatenate([upper_y, lower_y])
-        temp_polygon = QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in zip(all_x, all_y)])
+        if self.waveform_polygon is None:
+            self.waveform_polygon = WaveformItem(
+                self._color("wave_line_color", "wave_line_color"),
+                self._color("wave_fill_color", "wave_fill_color"))
+            self.scene().addItem(self.waveform_polygon)
+        self.waveform_polygon.set_waveform(self.amp, self.sample_width, available_height)
+        self.waveform_polygon.setZValue(1)
 
         if progress_callback is not None:
             try:
-                progress_callback(n)
+                progress_callback(self.amp.size)
             except RuntimeError:
                 pass
-
-        if self.waveform_polygon is not None:
-            self.waveform_polygon.setPolygon(temp_polygon)
-        else:
-            self.waveform_polygon = self.scene().addPolygon(
-                temp_polygon,
-                self._color("wave_line_color", "wave_line_color"),
-                self._color("wave_fill_color", "wave_fill_color"))
-        self.waveform_polygon.setZValue(1)
         if self.main_window is not None:
             self.main_window.statusbar.showMessage("Papagayo-NG")
 
@@ -522,79 +579,95 @@ class WaveformView(QtWidgets.QGraphicsView):
         if self.doc is None:
             return
         self.setUpdatesEnabled(False)
-        fm, _, text_height = self._text_metrics()
-        top_border = fm.height() * 2 + 4
-        current_num = 0
-        total = max(1, self.doc.current_voice.num_children)
-
-        for phrase in self.doc.current_voice.children:
-            self._make_or_show_button(phrase, top_border, text_height, 0)
-            self.temp_phrase = phrase.move_button
-            current_num += 1
-            self._report_progress(progress_callback, current_num, total, "Preparing Buttons")
-
-            word_count = 0
-            for word in phrase.children:
-                y = top_border + 4 + text_height + (text_height * (word_count % 2))
-                self._make_or_show_button(word, y, text_height, word_count % 2)
-                self.temp_word = word.move_button
-                word_count += 1
-                current_num += 1
-                self._report_progress(progress_callback, current_num, total, "Preparing Buttons")
-
-                phoneme_count = 0
-                for phoneme in word.children:
-                    self._make_or_show_phoneme(phoneme, text_height, phoneme_count % 2)
-                    self.temp_phoneme = phoneme.move_button
-                    phoneme_count += 1
-                    current_num += 1
-                    self._report_progress(progress_callback, current_num, total, "Preparing Buttons")
-
-        self.main_window.statusbar.showMessage("Papagayo-NG")
-        self.setUpdatesEnabled(True)
-
-    def _report_progress(self, progress_callback, current, total, label):
+        self.update_visible_buttons()
         if progress_callback is not None:
             try:
-                progress_callback(current)
+                progress_callback(self.doc.current_voice.num_children)
             except RuntimeError:
                 pass
-        self.main_window.statusbar.showMessage(
-            self.translator.translate("WaveformView", "{}: {{0}}%".format(label)).format(
-                str(int((current / total) * 100))))
+        self.main_window.statusbar.showMessage("Papagayo-NG")
+        self.setUpdatesEnabled(True)
 
-    def _make_or_show_button(self, node, y, text_height, slot):
-        """Create-or-reuse a phrase/word button at row ``y``."""
-        if node.move_button:
-            try:
-                node.move_button.setVisible(True)
-                return
-            except RuntimeError:
-                pass  # fall through and recreate
-        button = MovableButton(node, self)
-        node.move_button = button
-        proxy = self.scene().addWidget(button)
-        proxy.setGeometry(QtCore.QRect(
-            node.start_frame * self.frame_width, y,
-            (node.end_frame - node.start_frame) * self.frame_width + 1, text_height))
-        proxy.setZValue(99)
-
-    def _make_or_show_phoneme(self, node, text_height, slot):
-        """Create-or-reuse a phoneme button (bottom of the view, staggered)."""
-        if node.move_button:
-            try:
-                node.move_button.setVisible(True)
-                return
-            except RuntimeError:
-                pass
-        button = MovableButton(node, self, slot)
-        node.move_button = button
-        proxy = self.scene().addWidget(button)
-        y = self.height() - int(self.horizontalScrollBar().height() * 1.5) \
-            - (text_height + (text_height * slot))
-        proxy.setGeometry(QtCore.QRect(
-            node.start_frame * self.frame_width, y, self.frame_width, text_height))
-        proxy.setZValue(99)
+    def _visible_frame_range(self):
+        """First and last frame that should have buttons, the viewport plus button_margin on each side."""
+        left = self.mapToScene(0, 0).x()
+        width = self.viewport().width()
+        margin = width * button_margin
+        return (left - margin) / self.frame_width, (left + width + margin) / self.frame_width
+
+    def _is_pinned(self, button):
+        """Buttons that are selected or being dragged keep their node even off-screen."""
+        return button is self.currently_selected_object or button.is_moving or button.is_resizing
+
+    def update_visible_buttons(self, *args):
+        """Bind buttons to the nodes of the current voice around the viewport.
+
+        Buttons of nodes that scrolled out of range go back to a pool and are
+        rebound to nodes that scrolled in, so the number of widgets depends on
+        the zoom level and not on the size of the voice.
+        """
+        if self.doc is None or self.doc.current_voice is None:
+            return
+        first_frame, last_frame = self._visible_frame_range()
+        fm, _, text_height = self._text_metrics()
+        top_border = fm.height() * 2 + 4
+        phoneme_bottom = self.height() - int(self.horizontalScrollBar().height() * 1.5)
+        wanted = []
+        for phrase in self.doc.current_voice.children:
+            if phrase.end_frame < first_frame or phrase.start_frame > last_frame:
+                continue
+            wanted.append((phrase, top_border, 0))
+            for word_count, word in enumerate(phrase.children):
+                if word.end_frame < first_frame or word.start_frame > last_frame:
+                    continue
+                slot = word_count % 2
+                wanted.append((word, top_border + 4 + text_height + (text_height * slot), slot))
+                for phoneme_count, phoneme in enumerate(word.children):
+                    if phoneme.start_frame + 1 < first_frame or phoneme.start_frame > last_frame:
+                        continue
+                    slot = phoneme_count % 2
+                    wanted.append((phoneme, phoneme_bottom - (text_height + (text_height * slot)), slot))
+
+        wanted_ids = set(id(node) for node, _, _ in wanted)
+        for key, button in list(self._bound_buttons.items()):
+            if (key not in wanted_ids or button.node.move_button is not button) and not self._is_pinned(button):
+                self._release_button(key, button)
+        for node, y, slot in wanted:
+            button = self._bound_buttons.get(id(node))
+            if button is None or button.node is not node:
+                self._bind_button(node, y, slot, text_height)
+
+    def _bind_button(self, node, y, slot, text_height):
+        if self._button_pool:
+            button = self._button_pool.pop()
+            button.bind(node, slot)
+        elif self.use_timeline_items:
+            button = TimelineItem(node, self, slot)
+            self.scene().addItem(button)
+            button.setZValue(99)
+        else:
+            button = MovableButton(node, self, slot)
+            button.proxy = self.scene().addWidget(button)
+            button.proxy.setZValue(99)
+        proxy = button.proxy
+        if node.object_type == "phoneme":
+            width = self.frame_width
+        else:
+            width = (node.end_frame - node.start_frame) * self.frame_width + 1
+        proxy.setGeometry(QtCore.QRect(node.start_frame * self.frame_width, y, width, text_height))
+        proxy.setVisible(True)
+        self._bound_buttons[id(node)] = button
+
+    def _release_button(self, key, button):
+        del self._bound_buttons[key]
+        if button.node.move_button is button:
+            button.node.move_button = None
+        button.proxy.setVisible(False)
+        self._button_pool.append(button)
+
+    def _release_all_buttons(self):
+        for key, button in list(self._bound_buttons.items()):
+            self._release_button(key, button)
 
     # ------------------------------------------------------------------ #
     # Waveform recalculation (threaded)
@@ -618,7 +691,8 @@ class WaveformView(QtWidgets.QGraphicsView):
             # result/finished signals are ignored.
             self._recalc_gen += 1
             gen = self._recalc_gen
-            worker = _WaveformRecalcWorker(self.doc.sound, self.samples_per_sec, duration)
+            worker = _WaveformRecalcWorker(self.doc.sound, self._waveform_fps(), self.samples_per_frame,
+                                           self.waveform_cache)
             # Prevent QThreadPool from auto-deleting the runnable when run()
             # finishes.  Auto-deletion destroys the WorkerSignals QObject
             # before its queued (cross-thread) signal emissions are delivered
@@ -638,7 +712,7 @@ class WaveformView(QtWidgets.QGraphicsView):
     def _on_recalc_result(self, result, gen=None):
         if gen is not None and gen != self._recalc_gen:
             return  # stale worker — a newer recalc has been started
-        self.amp, self.num_samples = result
+        self._envelope, self.amp, self.num_samples = result
 
     def _on_recalc_finished(self, gen):
         if gen != self._recalc_gen:
@@ -655,23 +729,27 @@ class WaveformView(QtWidgets.QGraphicsView):
         self.main_window.lip_sync_frame.status_progress.hide()
         self.start_create_waveform()
 
+    def _waveform_fps(self):
+        return self.samples_per_sec / self.samples_per_frame
+
     def recalc_waveform(self, progress_callback):
-        """Synchronous fallback (kept for API compatibility)."""
-        duration = self.doc.sound.Duration()
-        sample_dur = 1.0 / self.samples_per_sec
-        n = max(1, int(duration / sample_dur) + 1)
-        amp = np.empty(n, dtype=float)
-        time_pos = 0.0
-        for i in range(n):
-            amp[i] = self.doc.sound.get_rms_amplitude(time_pos, sample_dur)
-            time_pos += sample_dur
-            if progress_callback is not None and i % max(1, n // 100) == 0:
-                try:
-                    progress_callback(time_pos)
-                except RuntimeError:
-                    pass
-        self.amp = normalize(amp)
-        self.num_samples = n
+        """Synchronous path for zooming; only builds the envelope if the sound or fps changed."""
+        fps = self._waveform_fps()
+        envelope = self._envelope
+        if envelope is None or envelope.sound is not self.doc.sound or envelope.fps != fps:
+            def report_progress(seconds):
+                if progress_callback is not None:
+                    try:
+                        progress_callback(int(seconds))
+                    except RuntimeError:
+                        pass
+            envelope = self.waveform_cache.load(self.doc.sound, fps)
+            if envelope is None:
+                envelope = EnvelopePyramid.from_sound(self.doc.sound, fps, report_progress)
+                self.waveform_cache.store(envelope)
+            self._envelope = envelope
+        self.amp = normalize(envelope.rms(self.samples_per_frame))
+        self.num_samples = len(self.amp)
 
     # ------------------------------------------------------------------ #
     # Document lifecycle
@@ -688,30 +766,24 @@ class WaveformView(QtWidgets.QGraphicsView):
         # we need to clean up old button proxies at minimum.
         needs_cleanup = (document != self.doc) or force or clear_scene
         if needs_cleanup:
+            # The buttons are rebound to the nodes of the new document/voice.
+            self._release_all_buttons()
             if sound_changed:
                 # Full rebuild: clear the entire scene (waveform + buttons).
+                # The pool is emptied anyway, so this is where the renderer can change.
+                self._button_pool = []
+                self.use_timeline_items = self.settings.get_timeline_items()
                 self.scene().clear()
                 self.waveform_polygon = None
                 self.temp_play_marker = None
                 self._bg_cache_key = None  # force bg rebuild
                 self._last_sound = new_sound
-            else:
-                # Voice-only change: remove just the movable-button proxies,
-                # keep the waveform polygon and background cache intact.
-                self._remove_all_button_proxies()
-            # Buttons were destroyed; drop the dangling selection reference.
+                self._envelope = None
+            # Buttons were released; drop the dangling selection reference.
             self.currently_selected_object = None
         self.doc = document
         if self.doc is None or self.doc.sound is None:
             return
-        # Hide every button in the document, then create/show only the ones
-        # belonging to the current voice.
-        for l_object in self.doc.project_node.descendants:
-            try:
-                if l_object.move_button:
-                    l_object.move_button.setVisible(False)
-            except RuntimeError:
-                pass
         self.create_movbuttons(self.main_window.lip_sync_frame.status_bar_progress)
         # Only recalc the waveform when the sound actually changed — switching
         # voices (or adding/removing voices) reuses the existing waveform.
@@ -721,14 +793,6 @@ class WaveformView(QtWidgets.QGraphicsView):
         self.setViewportUpdateMode(QtWidgets.QGraphicsView.ViewportUpdateMode.FullViewportUpdate)
         self.scene().update()
 
-    def _remove_all_button_proxies(self):
-        """Remove QGraphicsProxyWidget items (movable buttons) from the scene
-        without touching the waveform polygon or background."""
-        scene = self.scene()
-        for item in list(scene.items()):
-            if isinstance(item, QtWidgets.QGraphicsProxyWidget):
-                scene.removeItem(item)
-
     # ------------------------------------------------------------------ #
     # Scroll / zoom
     # ------------------------------------------------------------------ #
@@ -744,30 +808,21 @@ class WaveformView(QtWidgets.QGraphicsView):
 
     def resizeEvent(self, event):
         update_rect = self.scene().sceneRect()
-        width_factor = 1  # Only the height needs to change.
-        try:
-            height_factor = event.size().height() / event.oldSize().height()
-        except ZeroDivisionError:
-            height_factor = 1
         update_rect.setHeight(event.size().height())
         if self.doc and self.waveform_polygon is not None:
-            update_rect.setWidth(self.waveform_polygon.polygon().boundingRect().width())
+            update_rect.setWidth(self.waveform_polygon.width())
             self.setSceneRect(update_rect)
             self.scene().setSceneRect(update_rect)
-            origin_x, origin_y = 0, 0
-            height_factor = height_factor * self.waveform_polygon.transform().m22()
-            self.waveform_polygon.setTransform(QtGui.QTransform().translate(
-                origin_x, origin_y).scale(width_factor, height_factor).translate(-origin_x, -origin_y))
+            self.waveform_polygon.set_waveform(self.amp, self.sample_width, int(event.size().height() / 2))
             _, _, text_height = self._text_metrics()
-            for phoneme_node in self.doc.current_voice.leaves:
-                if phoneme_node.move_button:
-                    widget = phoneme_node.move_button
-                    if widget.is_phoneme():
-                        widget.setGeometry(
-                            widget.x(),
-                            self.height() - (self.horizontalScrollBar().height() * 1.5) -
-                            (text_height + (text_height * widget.phoneme_offset)),
-                            self.frame_width + 5, text_height)
+            for widget in self._bound_buttons.values():
+                if widget.is_phoneme():
+                    widget.setGeometry(
+                        widget.x(),
+                        self.height() - (self.horizontalScrollBar().height() * 1.5) -
+                        (text_height + (text_height * widget.phoneme_offset)),
+                        self.frame_width + 5, text_height)
+            self.update_visible_buttons()
             self.resize_timer.start(150)
         self.horizontalScrollBar().setValue(self.scroll_position)
         if self.temp_play_marker:
@@ -779,9 +834,9 @@ class WaveformView(QtWidgets.QGraphicsView):
         if self.doc is None:
             return
         self.frame_width = self.sample_width * self.samples_per_frame
-        for node in self.doc.current_voice.descendants:
-            node.move_button.after_reposition()
-            node.move_button.fit_text_to_size()
+        for button in self._bound_buttons.values():
+            button.after_reposition()
+            button.fit_text_to_size()
         self.start_recalc()
         if self.temp_play_marker:
             self.temp_play_marker.setRect(
@@ -792,9 +847,10 @@ class WaveformView(QtWidgets.QGraphicsView):
         self.setSceneRect(self.scene().sceneRect())
         self.horizontalScrollBar().setValue(self.scroll_position)
         self.start_create_waveform()
+        self.update_visible_buttons()
 
     def on_zoom_in(self, event=None):
-        if self.doc is not None and self.samples_per_frame < 16:
+        if self.doc is not None and self.samples_per_frame < MAX_SAMPLES_PER_FRAME:
             self.samples_per_frame *= 2
             self.samples_per_sec = self.doc.fps * self.samples_per_frame
             self.scroll_position *= 2
@@ -0,0 +1,163 @@
+"""
+Sample access for SoundPlayerSDF without decoding the whole file up front.
+
+PCM and float WAV files are memory-mapped and only the requested slices are
+converted to float32. Other formats are decoded in blocks when they are
+first needed and a bounded number of blocks is kept, unless the file is
+small enough that reading it at once is cheaper.
+
+All sources return float32 samples shaped like soundfile.read(): 1-D for mono
+files, (frames, channels) otherwise.
+"""
+
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import soundfile as sf
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> (stored dtype, offset, scale) so that (stored - offset) / scale is in [-1, 1).
+_WAV_SAMPLE_TYPES = {
+    (WAVE_FORMAT_PCM, 8): ("u1", 128, 128.0),
+    (WAVE_FORMAT_PCM, 16): ("<i2", 0, 32768.0),
+    (WAVE_FORMAT_PCM, 32): ("<i4", 0, 2147483648.0),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): ("<f4", 0, 1.0),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): ("<f8", 0, 1.0),
+}
+
+
+def _read_wav_layout(path):
+    """Return (format tag, channels, samplerate, bits, data offset, data size) of a RIFF WAV file, None otherwise."""
+    with open(path, "rb") as in_file:
+        riff_header = in_file.read(12)
+        if len(riff_header) < 12 or riff_header[:4] != b"RIFF" or riff_header[8:12] != b"WAVE":
+            return None
+        wav_format = None
+        while True:
+            chunk_header = in_file.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = in_file.read(chunk_size)
+                format_tag, channels, samplerate, _, _, bits = struct.unpack_from("<HHIIHH", fmt)
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    # The actual format is in the first two bytes of the sub format GUID.
+                    (format_tag,) = struct.unpack_from("<H", fmt, 24)
+                wav_format = (format_tag, channels, samplerate, bits)
+                if chunk_size % 2:
+                    in_file.seek(1, 1)
+            elif chunk_id == b"data":
+                if wav_format is None:
+                    return None
+                return wav_format + (in_file.tell(), chunk_size)
+            else:
+                in_file.seek(chunk_size + chunk_size % 2, 1)
+
+
+class InMemorySource:
+    def __init__(self, path):
+        self.samples, self.samplerate = sf.read(path, dtype="float32")
+        self.channels = 1 if self.samples.ndim == 1 else self.samples.shape[1]
+        self.frames = len(self.samples)
+
+    def read(self, start, stop):
+        return self.samples[max(start, 0):min(stop, self.frames)]
+
+    def close(self):
+        pass
+
+
+class MappedWavSource:
+    """A PCM or float WAV file mapped into memory, converted slice by slice."""
+
+    def __init__(self, path, layout):
+        format_tag, self.channels, self.samplerate, bits, data_offset, data_size = layout
+        dtype, self._offset, self._scale = _WAV_SAMPLE_TYPES[(format_tag, bits)]
+        frame_size = np.dtype(dtype).itemsize * self.channels
+        # Truncated files announce more data than they have.
+        with open(path, "rb") as in_file:
+            in_file.seek(0, 2)
+            data_size = min(data_size, in_file.tell() - data_offset)
+        self.frames = data_size // frame_size
+        if self.frames:
+            self._data = np.memmap(path, dtype=dtype, mode="r", offset=data_offset,
+                                   shape=(self.frames, self.channels))
+        else:
+            self._data = np.zeros((0, self.channels), dtype=dtype)
+
+    def read(self, start, stop):
+        samples = self._data[max(start, 0):min(stop, self.frames)]
+        if self._offset or self._scale != 1.0:
+            samples = (samples.astype(np.float32) - self._offset) / np.float32(self._scale)
+        else:
+            samples = samples.astype(np.float32)
+        return samples[:, 0] if self.channels == 1 else samples
+
+    def close(self):
+        mapping = getattr(self._data, "_mmap", None)
+        self._data = np.zeros((0, self.channels), dtype=self._data.dtype)
+        if mapping is not None:
+            mapping.close()
+
+
+class BlockDecodedSource:
+    """Decodes a compressed file in fixed size blocks, keeping the most recently used ones."""
+
+    def __init__(self, path, block_frames=1 << 16, max_blocks=64):
+        self._file = sf.SoundFile(path)
+        self.samplerate = self._file.samplerate
+        self.channels = self._file.channels
+        self.frames = self._file.frames
+        self.block_frames = block_frames
+        self.max_blocks = max_blocks
+        self._blocks = OrderedDict()
+        # The playback callback reads from the audio thread while the GUI reads for the waveform.
+        self._lock = threading.Lock()
+
+    def _block(self, index):
+        block = self._blocks.get(index)
+        if block is not None:
+            self._blocks.move_to_end(index)
+            return block
+        self._file.seek(index * self.block_frames)
+        block = self._file.read(self.block_frames, dtype="float32", always_2d=True)
+        self._blocks[index] = block
+        if len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def read(self, start, stop):
+        start = max(start, 0)
+        stop = min(stop, self.frames)
+        if stop <= start:
+            samples = np.zeros((0, self.channels), dtype=np.float32)
+        else:
+            parts = []
+            with self._lock:
+                for index in range(start // self.block_frames, (stop - 1) // self.block_frames + 1):
+                    block_start = index * self.block_frames
+                    parts.append(self._block(index)[max(start - block_start, 0):stop - block_start])
+            samples = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return samples[:, 0] if self.channels == 1 else samples
+
+    def close(self):
+        with self._lock:
+            self._blocks.clear()
+            self._file.close()
+
+
+def open_audio_source(path, max_in_memory_bytes=64 << 20):
+    """Pick the cheapest way to serve the samples of path."""
+    layout = _read_wav_layout(path)
+    if layout is not None and (layout[0], layout[3]) in _WAV_SAMPLE_TYPES:
+        return MappedWavSource(path, layout)
+    info = sf.info(path)
+    if info.frames * info.channels * 4 <= max_in_memory_bytes:
+        return InMemorySource(path)
+    return BlockDecodedSource(path)
@@ -0,0 +1,86 @@
+"""
+Append-only autosave journal for LipsyncDoc.
+
+The first line of a journal is a snapshot of the whole project in the .pg2
+layout; every later line only holds what changed since the entry before it:
+the project settings plus the voices or single phrases that were edited.
+Once the deltas add up to more than the snapshot, or there are too many of
+them, the journal is compacted into a fresh snapshot.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+
+def apply_delta(project, delta):
+    """Apply one journal delta to a project dict in the .pg2 layout."""
+    project.update(delta["project"])
+    for voice_index, voice in delta["voices"].items():
+        project["voices"][int(voice_index)] = voice
+    for voice_index, phrases in delta["phrases"].items():
+        voice_phrases = project["voices"][int(voice_index)]["phrases"]
+        for phrase_index, phrase in phrases.items():
+            voice_phrases[int(phrase_index)] = phrase
+
+
+class AutosaveJournal:
+    def __init__(self, path, max_entries=50):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.entry_count = 0
+        self.snapshot_size = 0
+        self.delta_size = 0
+
+    def exists(self):
+        return self.path.exists()
+
+    def needs_compaction(self):
+        """True before the first snapshot and once the deltas outweigh the snapshot."""
+        return (self.entry_count == 0 or self.entry_count >= self.max_entries or
+                self.delta_size > self.snapshot_size)
+
+    def write_snapshot(self, project):
+        data = json.dumps({"snapshot": project}) + "\n"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as out_file:
+            out_file.write(data)
+        os.replace(temp_path, self.path)
+        self.entry_count = 1
+        self.snapshot_size = len(data)
+        self.delta_size = 0
+
+    def append_delta(self, delta):
+        line = json.dumps({"delta": delta}) + "\n"
+        with self.path.open("a", encoding="utf-8") as out_file:
+            out_file.write(line)
+        self.entry_count += 1
+        self.delta_size += len(line)
+
+    def discard(self):
+        self.entry_count = 0
+        self.snapshot_size = 0
+        self.delta_size = 0
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def replay(self):
+        """Return the project the journal describes as a .pg2 style dict, None if it holds no snapshot."""
+        project = None
+        with self.path.open(encoding="utf-8") as in_file:
+            for line in in_file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last entry is cut off when the program died while appending it.
+                    logging.warning("Ignoring incomplete entry at the end of {}".format(self.path))
+                    break
+                if "snapshot" in entry:
+                    project = entry["snapshot"]
+                elif project is not None:
+                    apply_delta(project, entry["delta"])
+        return project
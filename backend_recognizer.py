@@ -11,7 +11,6 @@ integration point.
 """
 
 import atexit
-import base64
 import logging
 import os
 import socket
@@ -21,7 +20,6 @@ import time
 from pathlib import Path
 from typing import List, Optional
 
-import numpy as np
 import requests
 import soundfile as sf
 
@@ -33,6 +31,19 @@ logger = logging.getLogger(__name__)
 _DEFAULT_PORT = 8765
 _HEALTH_TIMEOUT = 30  # seconds to wait for the backend to become healthy
 _HTTP_TIMEOUT = 120  # seconds for individual HTTP requests
+# Recognition requests wait for the backend's --inference-timeout (300 s by default,
+# read from /status once the models are loaded) plus this margin, so the backend's
+# 504 arrives before the client gives up.
+_DEFAULT_INFERENCE_TIMEOUT = 300
+_INFERENCE_TIMEOUT_MARGIN = 30
+# /process_audio/file answers for paths the backend can't use: from another host,
+# not found on its file system, or not readable as audio.
+_PATH_NOT_USABLE_STATUSES = (403, 404, 415)
+_BUSY_RETRIES = 30  # times a recognition request is retried while the backend's queue is full (429)
+
+
+class _PathNotUsable(Exception):
+    """The backend couldn't use the path of an audio file; sending the samples may still work."""
 
 
 def _find_free_port(preferred: int = _DEFAULT_PORT) -> int:
@@ -72,6 +83,7 @@ class BackendRecognizer:
         self._loaded_emotion_path: str = ""
         self._available: bool = False
         self._progress_callback = None
+        self._recognition_timeout: float = _DEFAULT_INFERENCE_TIMEOUT + _INFERENCE_TIMEOUT_MARGIN
 
         if phoneme_model_path:
             self._start_backend_with_models(phoneme_model_path, emotion_model_path)
@@ -186,12 +198,23 @@ class BackendRecognizer:
             self._loaded_phoneme_path = phoneme_model_path
             self._loaded_emotion_path = emotion_model_path
             logger.info("Backend loaded models (phoneme=%s, emotion=%s)", phoneme_model_path, emotion_model_path or "none")
+            self._recognition_timeout = self._inference_timeout() + _INFERENCE_TIMEOUT_MARGIN
             return True
         except requests.RequestException as exc:
             logger.error("Failed to call backend /start: %s", exc)
             self._available = False
             return False
 
+    def _inference_timeout(self) -> float:
+        """The backend's timeout for recognition requests, from ``/status``."""
+        try:
+            resp = requests.get(f"{self._base_url}/status", timeout=10)
+            if resp.status_code == 200:
+                return float(resp.json().get("inference", {}).get("timeout", _DEFAULT_INFERENCE_TIMEOUT))
+        except (requests.RequestException, ValueError) as exc:
+            logger.warning("Could not read the backend's inference timeout: %s", exc)
+        return _DEFAULT_INFERENCE_TIMEOUT
+
     # ------------------------------------------------------------------ #
     #  Model management (delegated to the backend's REST API)
     # ------------------------------------------------------------------ #
@@ -370,63 +393,194 @@ class BackendRecognizer:
             logger.error("Backend is not available; cannot predict")
             return []
 
+        # The backend runs on this host, so it can read the file itself.  Fall
+        # back to sending the samples only if it can't use the path (another
+        # host, a different file system, a format it can't read).
         try:
-            audio_data, sample_rate = sf.read(audio_file)
-        except Exception as exc:
-            logger.error("Failed to read audio file %s: %s", audio_file, exc)
+            result = self._process_audio_file(audio_file)
+        except _PathNotUsable:
+            result = self._process_audio_raw(audio_file)
+        if result is None:
             return []
 
-        # Ensure float32 and flatten multi-channel to mono.
-        if audio_data.dtype != np.float32:
-            audio_data = audio_data.astype(np.float32)
-        if audio_data.ndim > 1:
-            channels = audio_data.shape[1]
-            audio_data = audio_data.mean(axis=1)
+        output = self._timed_phonemes(result)
+        logger.info("Backend recognized %d phonemes from %s", len(output), audio_file)
+        return output
+
+    def predict_batch(self, audio_files: List[str], model_type: str = "phoneme") -> List[List[dict]]:
+        """Recognize phonemes in several audio files, like :meth:`predict` for each.
+
+        The backend runs clips of similar length through the model together,
+        so this is faster than one ``predict`` per file for directories of
+        dialogue lines.  Returns one list per file, empty for files that failed.
+        """
+        if not self._available:
+            logger.error("Backend is not available; cannot predict")
+            return [[] for _ in audio_files]
+        if not audio_files:
+            return []
+
+        try:
+            results = self._process_audio_batch_files(audio_files)
+        except _PathNotUsable:
+            results = self._process_audio_batch_upload(audio_files)
+        if results is None:
+            return [[] for _ in audio_files]
+
+        outputs = []
+        for audio_file, result in zip(audio_files, results):
+            if "error" in result:
+                logger.error("Backend failed to recognize %s: %s", audio_file, result["error"])
+                outputs.append([])
+                continue
+            outputs.append(self._timed_phonemes(result))
+        logger.info("Backend recognized %d files in a batch", len(audio_files))
+        return outputs
+
+    @staticmethod
+    def _timed_phonemes(result: dict) -> List[dict]:
+        """Convert one /process_audio result to ``start``/``duration``/``phoneme`` dicts."""
+        segments = result.get("phoneme_segments")
+        if segments:
+            # Start and end of the frames the model emitted each phoneme on.
+            output = [{
+                "start": segment["start"],
+                "duration": segment["end"] - segment["start"],
+                "phoneme": segment["phoneme_cmu"],
+            } for segment in segments]
         else:
-            channels = 1
-        audio_data = audio_data.squeeze()
+            # Backends before 0.7.0 only report the average phoneme length.
+            phonemes_cmu = result.get("phonemes_cmu", [])
+            if not phonemes_cmu:
+                logger.warning("Backend returned no CMU phonemes")
+                return []
+
+            sample_length_ms = result.get("sample_length", 0.0)
+            sample_length_sec = sample_length_ms / 1000.0 if sample_length_ms else 0.0
+
+            output = []
+            for i, phoneme in enumerate(phonemes_cmu):
+                if phoneme is None:
+                    continue
+                output.append({
+                    "start": i * sample_length_sec,
+                    "duration": sample_length_sec,
+                    "phoneme": phoneme,
+                })
 
-        audio_bytes = audio_data.tobytes()
-        audio_b64 = base64.b64encode(audio_bytes).decode("ascii")
+        return output
 
-        payload = {
-            "audio_base64": audio_b64,
-            "sample_rate": sample_rate,
-            "channels": channels,
-            "chunk_id": 0,
-        }
+    def _process_audio_batch_files(self, audio_files: List[str]) -> Optional[List[dict]]:
+        """Let the backend read all *audio_files* from disk; no audio goes over HTTP.
 
+        Raises _PathNotUsable if the backend can't take paths (another host, or
+        before 0.8.0), returns None for failures uploading wouldn't fix.
+        """
+        payload = {"paths": [str(Path(audio_file).resolve()) for audio_file in audio_files]}
         try:
-            resp = requests.post(f"{self._base_url}/process_audio", json=payload, timeout=_HTTP_TIMEOUT)
+            resp = self._post_when_not_busy(lambda: requests.post(
+                f"{self._base_url}/process_audio/batch/files", json=payload, timeout=self._recognition_timeout))
         except requests.RequestException as exc:
-            logger.error("Failed to call /process_audio: %s", exc)
-            return []
-
+            logger.error("Failed to call /process_audio/batch/files: %s", exc)
+            return None
+        if resp.status_code in _PATH_NOT_USABLE_STATUSES:
+            logger.warning("/process_audio/batch/files returned %s: %s", resp.status_code, resp.text)
+            raise _PathNotUsable(resp.text)
         if resp.status_code != 200:
-            logger.error("/process_audio returned %s: %s", resp.status_code, resp.text)
-            return []
+            # Recognition failed or timed out, uploading would only run the batch again.
+            logger.error("/process_audio/batch/files returned %s: %s", resp.status_code, resp.text)
+            return None
+        return resp.json().get("results")
 
-        result = resp.json()
-        phonemes_cmu = result.get("phonemes_cmu", [])
-        if not phonemes_cmu:
-            logger.warning("Backend returned no CMU phonemes")
-            return []
+    def _process_audio_batch_upload(self, audio_files: List[str]) -> Optional[List[dict]]:
+        """Upload *audio_files* as multipart/form-data for the backend to decode."""
+        handles = []
+        try:
+            for audio_file in audio_files:
+                handles.append(open(audio_file, "rb"))
+            files = [("files", (Path(audio_file).name, handle)) for audio_file, handle in zip(audio_files, handles)]
+
+            def upload():
+                for handle in handles:
+                    handle.seek(0)
+                return requests.post(f"{self._base_url}/process_audio/batch", files=files,
+                                     timeout=self._recognition_timeout)
+
+            resp = self._post_when_not_busy(upload)
+        except (OSError, requests.RequestException) as exc:
+            logger.error("Failed to call /process_audio/batch: %s", exc)
+            return None
+        finally:
+            for handle in handles:
+                handle.close()
+        if resp.status_code != 200:
+            logger.error("/process_audio/batch returned %s: %s", resp.status_code, resp.text)
+            return None
+        return resp.json().get("results")
 
-        sample_length_ms = result.get("sample_length", 0.0)
-        sample_length_sec = sample_length_ms / 1000.0 if sample_length_ms else 0.0
+    @staticmethod
+    def _post_when_not_busy(send) -> requests.Response:
+        """Call *send* until the backend isn't answering 429 (its recognition queue is full)."""
+        for _ in range(_BUSY_RETRIES):
+            resp = send()
+            if resp.status_code != 429:
+                return resp
+            delay = float(resp.headers.get("Retry-After", 1))
+            logger.info("Backend is busy, retrying in %.0f s", delay)
+            time.sleep(delay)
+        return send()
+
+    def _process_audio_file(self, audio_file: str) -> Optional[dict]:
+        """Let the backend read *audio_file* from disk; no audio goes over HTTP.
+
+        Raises _PathNotUsable if the backend couldn't use the path, returns
+        None for failures sending the samples wouldn't fix.
+        """
+        payload = {"path": str(Path(audio_file).resolve()), "chunk_id": 0}
+        try:
+            resp = self._post_when_not_busy(lambda: requests.post(
+                f"{self._base_url}/process_audio/file", json=payload, timeout=self._recognition_timeout))
+        except requests.RequestException as exc:
+            # Includes timeouts: the backend may still be busy with the clip,
+            # sending it again would only queue a second run behind it.
+            logger.error("Failed to call /process_audio/file: %s", exc)
+            return None
+        if resp.status_code in _PATH_NOT_USABLE_STATUSES:
+            logger.warning("/process_audio/file returned %s: %s", resp.status_code, resp.text)
+            raise _PathNotUsable(resp.text)
+        if resp.status_code != 200:
+            # Recognition itself failed or timed out, the samples wouldn't fare better.
+            logger.error("/process_audio/file returned %s: %s", resp.status_code, resp.text)
+            return None
+        return resp.json()
 
-        output = []
-        for i, phoneme in enumerate(phonemes_cmu):
-            if phoneme is None:
-                continue
-            output.append({
-                "start": i * sample_length_sec,
-                "duration": sample_length_sec,
-                "phoneme": phoneme,
-            })
+    def _process_audio_raw(self, audio_file: str) -> Optional[dict]:
+        """Send the samples of *audio_file* as raw float32 PCM (application/octet-stream)."""
+        try:
+            audio_data, sample_rate = sf.read(audio_file, dtype="float32", always_2d=True)
+        except Exception as exc:
+            logger.error("Failed to read audio file %s: %s", audio_file, exc)
+            return None
 
-        logger.info("Backend recognized %d phonemes from %s", len(output), audio_file)
-        return output
+        # The backend mixes interleaved channels down itself.
+        channels = audio_data.shape[1]
+        params = {"sample_rate": sample_rate, "channels": channels, "chunk_id": 0}
+        try:
+            audio_bytes = audio_data.tobytes()
+            resp = self._post_when_not_busy(lambda: requests.post(
+                f"{self._base_url}/process_audio/raw",
+                params=params,
+                data=audio_bytes,
+                headers={"Content-Type": "application/octet-stream"},
+                timeout=self._recognition_timeout,
+            ))
+        except requests.RequestException as exc:
+            logger.error("Failed to call /process_audio/raw: %s", exc)
+            return None
+        if resp.status_code != 200:
+            logger.error("/process_audio/raw returned %s: %s", resp.status_code, resp.text)
+            return None
+        return resp.json()
 
     def change_model(self, model_path: str, model_type: str = "phoneme") -> bool:
         """Load a different model into the running backend."""
@@ -21,6 +21,13 @@ def parse_args():
     parser.add_argument("--enable-output", action="store_true")
     parser.add_argument("--vad-system", default="volume", choices=["volume", "energy", "silero"])
     parser.add_argument("--volume-threshold", type=float, default=0.05)
+    parser.add_argument("--window-seconds", type=float, default=30.0,
+                        help="Recognise longer audio in windows of this many seconds (0 = whole utterance at once)")
+    parser.add_argument("--window-overlap", type=float, default=1.0, help="Overlap between recognition windows in seconds")
+    parser.add_argument("--inference-workers", type=int, default=1, help="Recognition requests run at the same time")
+    parser.add_argument("--inference-queue", type=int, default=8,
+                        help="Recognition requests that may wait for a worker, more are answered with 429")
+    parser.add_argument("--inference-timeout", type=float, default=300.0, help="Seconds before a recognition request fails with 504")
     parser.add_argument("--autoload", action="store_true")
     parser.add_argument("--ui", action="store_true", help="Launch the Tkinter UI instead of running CLI server")
     parser.add_argument("--environment", action="store_true", help="Print runtime and resource information as JSON, then exit")
@@ -55,11 +62,14 @@ def main():
                 enable_output=args.enable_output,
                 vad_system=args.vad_system,
                 volume_level_threshold=args.volume_threshold,
+                window_seconds=args.window_seconds,
+                window_overlap_seconds=args.window_overlap,
             )
         )
         backend.start()
 
-    app = create_backend_app(backend)
+    app = create_backend_app(backend, inference_workers=args.inference_workers,
+                             inference_queue=args.inference_queue, inference_timeout=args.inference_timeout)
     config = uvicorn.Config(app, host=args.host, port=args.port, log_level="info")
     server = uvicorn.Server(config)
     # Expose the server so the /shutdown endpoint can terminate the process.
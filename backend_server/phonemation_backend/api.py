@@ -7,18 +7,33 @@ import time
 from pathlib import Path
 from typing import Dict, List, Optional, TYPE_CHECKING
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
 from pydantic import BaseModel, Field
 from starlette.middleware.cors import CORSMiddleware
 
 from .environment import get_environment_info
+from .inference_pool import InferencePool, PoolFullError
 
 if TYPE_CHECKING:
     from .service import PhonemationBackend
 
 # 0.5.0: /hotkeys endpoints removed again; hotkeys are captured by the frontend
 # (BackgroundInputCapture GDExtension) since the backend may run remotely.
-API_VERSION = "0.5.0"
+# 0.6.0: /process_audio/raw (octet-stream body) and /process_audio/file (same-host path).
+# 0.7.0: phoneme_segments with CTC start/end times in the /process_audio* results.
+# 0.8.0: /process_audio/batch (multipart uploads) and /process_audio/batch/files (same-host paths).
+# 0.9.0: recognition runs on a bounded worker pool: 429 when its queue is full, 504 on timeout,
+#        queue depth and latencies under "inference" in /status.
+# 0.9.1: /process_audio/file answers 415 for files it can't read as audio, 500 only
+#        for recognition failures.
+API_VERSION = "0.9.1"
+
+# Clients allowed to hand over file paths instead of audio data.
+_LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+class _UnreadableAudioFile(Exception):
+    """Raised for a /process_audio/file path that can't be read as audio."""
 
 
 class BackendStartRequest(BaseModel):
@@ -32,6 +47,8 @@ class BackendStartRequest(BaseModel):
     volume_level_threshold: float = Field(0.05, description="Volume threshold for speech capture")
     audio_source: str = Field("local", description="Audio source: 'local' uses system audio devices, 'remote' accepts audio from client")
     viseme_set: str = Field("preston_blair", description="Phoneme target set used for visemes. One of: cmu_39, preston_blair, fleming_dobbs, rhubarb")
+    window_seconds: float = Field(30.0, description="Longer audio is recognised in windows of this many seconds to bound memory use; 0 runs it in one piece")
+    window_overlap_seconds: float = Field(1.0, description="Overlap between recognition windows, their logits are cross-faded there")
 
 
 class ProcessAudioRequest(BaseModel):
@@ -41,6 +58,15 @@ class ProcessAudioRequest(BaseModel):
     chunk_id: int = Field(0, description="Client-side chunk identifier echoed back for sync pairing")
 
 
+class ProcessAudioFileRequest(BaseModel):
+    path: str = Field(..., description="Path of an audio file on the backend's host, readable by soundfile")
+    chunk_id: int = Field(0, description="Client-side chunk identifier echoed back for sync pairing")
+
+
+class ProcessAudioBatchFilesRequest(BaseModel):
+    paths: List[str] = Field(..., description="Paths of audio files on the backend's host, readable by soundfile")
+
+
 class ModelDownloadRequest(BaseModel):
     model_id: str = Field(..., description="HuggingFace model ID to download (e.g. steveway/wav2vec2-xls-r-300m-timit-phoneme_onnx)")
     force: bool = Field(False, description="Re-download even if the model already exists locally")
@@ -204,7 +230,8 @@ def _run_download(model_id: str, model_type: str, force: bool, progress) -> None
         progress.set_error(str(exc))
 
 
-def create_backend_app(backend: Optional["PhonemationBackend"] = None) -> FastAPI:
+def create_backend_app(backend: Optional["PhonemationBackend"] = None, inference_workers: int = 1,
+                       inference_queue: int = 8, inference_timeout: float = 300.0) -> FastAPI:
     app = FastAPI(
         title="Phonemation Backend API",
         description="Frontend-independent audio AI processing API for Phonemation clients such as Godot.",
@@ -220,6 +247,8 @@ def create_backend_app(backend: Optional["PhonemationBackend"] = None) -> FastAP
     app.state.backend = backend
     # uvicorn.Server handle, set by the launcher so /shutdown can stop the process.
     app.state.server = None
+    # Recognition runs here, so the event loop keeps serving /health, /status, ...
+    app.state.inference = InferencePool(inference_workers, inference_queue, inference_timeout)
 
     @app.get("/health")
     async def health():
@@ -229,8 +258,11 @@ def create_backend_app(backend: Optional["PhonemationBackend"] = None) -> FastAP
     async def status():
         current_backend = app.state.backend
         if not current_backend:
-            return {"running": False, "initialized": False, "environment": get_environment_info()}
-        return current_backend.get_status()
+            status = {"running": False, "initialized": False, "environment": get_environment_info()}
+        else:
+            status = current_backend.get_status()
+        status["inference"] = app.state.inference.stats()
+        return status
 
     @app.get("/emotions")
     async def emotions():
@@ -411,6 +443,7 @@ def create_backend_app(backend: Optional["PhonemationBackend"] = None) -> FastAP
         server = getattr(app.state, "server", None)
         if server is not None:
             logging.info("Remote shutdown requested; stopping server.")
+            app.state.inference.shutdown()
             server.should_exit = True
             return {"status": "shutting_down"}
 
@@ -448,23 +481,117 @@ def create_backend_app(backend: Optional["PhonemationBackend"] = None) -> FastAP
         output = current_backend.get_next_output(block=timeout > 0, timeout=timeout or None)
         return {"output": output}
 
-    @app.post("/process_audio")
-    async def process_audio(request: ProcessAudioRequest):
+    def _require_initialized_backend():
         current_backend = app.state.backend
         if not current_backend:
             raise HTTPException(status_code=400, detail="Backend not initialized")
         if not current_backend.status.initialized:
             raise HTTPException(status_code=400, detail="Backend not initialized. Call /start first.")
+        return current_backend
+
+    def _require_local_client(http_request: Request) -> None:
+        client_host = http_request.client.host if http_request.client else None
+        if client_host not in _LOOPBACK_HOSTS:
+            raise HTTPException(status_code=403, detail="File paths are only accepted from clients on this host")
+
+    async def _run_inference(process):
+        """Run process on the inference pool, mapping a full queue to 429 and a timeout to 504."""
         try:
-            result = current_backend.process_audio(request.audio_base64, request.sample_rate, request.channels)
+            return await app.state.inference.run(process)
+        except PoolFullError as exc:
+            raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "1"}) from exc
+        except TimeoutError as exc:
+            raise HTTPException(status_code=504, detail=str(exc)) from exc
+
+    async def _processed(process, chunk_id: int) -> dict:
+        """Run one of the backend's process_audio* methods and finish its result for the response."""
+        try:
+            result = await _run_inference(process)
             if result is None:
                 raise HTTPException(status_code=500, detail="Audio processing failed")
-            result["chunk_id"] = request.chunk_id
+            result["chunk_id"] = chunk_id
             return result
         except HTTPException:
             raise
+        except _UnreadableAudioFile as exc:
+            raise HTTPException(status_code=415, detail=str(exc)) from exc
         except Exception as exc:
             logging.error("Audio processing failed: %s", exc)
             raise HTTPException(status_code=500, detail=f"Audio processing failed: {exc}") from exc
 
+    async def _batch_response(process) -> dict:
+        """Run one of the backend's batch methods; every clip's result or error, chunk_id is its index."""
+        start_time = time.time()
+        try:
+            results = await _run_inference(process)
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.error("Batch audio processing failed: %s", exc)
+            raise HTTPException(status_code=500, detail=f"Audio processing failed: {exc}") from exc
+        response = []
+        for index, result in enumerate(results):
+            if result is None:
+                result = {"error": "Audio processing failed"}
+            result["chunk_id"] = index
+            response.append(result)
+        return {"results": response, "inference_time": time.time() - start_time}
+
+    @app.post("/process_audio")
+    async def process_audio(request: ProcessAudioRequest):
+        current_backend = _require_initialized_backend()
+        return await _processed(
+            lambda: current_backend.process_audio(request.audio_base64, request.sample_rate, request.channels),
+            request.chunk_id,
+        )
+
+    @app.post("/process_audio/raw")
+    async def process_audio_raw(request: Request, sample_rate: int = 44100, channels: int = 1, chunk_id: int = 0):
+        """Like /process_audio, with the float32 PCM data as the application/octet-stream body.
+
+        Avoids the base64 overhead and the decoding copies of the JSON transport.
+        """
+        current_backend = _require_initialized_backend()
+        audio_bytes = await request.body()
+        if len(audio_bytes) % (4 * max(1, channels)):
+            raise HTTPException(status_code=400, detail="Body is not a whole number of float32 frames")
+        return await _processed(
+            lambda: current_backend.process_audio_bytes(audio_bytes, sample_rate, channels),
+            chunk_id,
+        )
+
+    @app.post("/process_audio/file")
+    async def process_audio_file(request: ProcessAudioFileRequest, http_request: Request):
+        """Like /process_audio, for a file the backend reads itself. Only for clients on the same host."""
+        _require_local_client(http_request)
+        current_backend = _require_initialized_backend()
+        if not Path(request.path).is_file():
+            raise HTTPException(status_code=404, detail=f"Audio file not found: {request.path}")
+
+        def process():
+            # Told apart from recognition failures, the client can still send the samples itself.
+            clip = current_backend.read_audio_file(request.path)
+            if clip is None:
+                raise _UnreadableAudioFile(f"Can't read audio file: {request.path}")
+            return current_backend.process_audio_samples(*clip)
+
+        return await _processed(process, request.chunk_id)
+
+    @app.post("/process_audio/batch")
+    async def process_audio_batch(files: List[UploadFile] = File(...)):
+        """Recognise several uploaded audio files, clips of similar length run through the model together.
+
+        Returns {"results": [...]} in upload order, each like a /process_audio
+        result with chunk_id set to its index, or {"error", "chunk_id"}.
+        """
+        current_backend = _require_initialized_backend()
+        return await _batch_response(lambda: current_backend.process_audio_files([upload.file for upload in files]))
+
+    @app.post("/process_audio/batch/files")
+    async def process_audio_batch_files(request: ProcessAudioBatchFilesRequest, http_request: Request):
+        """Like /process_audio/batch, for files the backend reads itself. Only for clients on the same host."""
+        _require_local_client(http_request)
+        current_backend = _require_initialized_backend()
+        return await _batch_response(lambda: current_backend.process_audio_files(request.paths))
+
     return app
@@ -0,0 +1,122 @@
+"""Bounded worker pool that keeps model inference off the API's event loop.
+
+The ONNX sessions are synchronous, so running them in an ``async def``
+handler stalls every other request (``/health``, ``/status``, download
+progress) until the clip is recognised. ``InferencePool`` runs them on a
+small thread pool instead and bounds how much work may wait for it:
+requests beyond ``max_workers + max_queue`` are rejected straight away
+(``PoolFullError``, answered with 429) instead of piling up, and every
+request gives up after ``timeout`` seconds (``TimeoutError``, answered
+with 504).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class PoolFullError(Exception):
+    """Raised when the pool's queue is full."""
+
+
+class InferencePool:
+    # Number of recent requests the latency figures in stats() are taken from.
+    LATENCY_WINDOW = 100
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 8, timeout: float = 300.0):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        # (seconds waiting in the queue, seconds running) of recent requests.
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+
+    async def run(self, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` on a worker and return its result.
+
+        Raises PoolFullError if max_workers requests are running and
+        max_queue more are waiting, TimeoutError if the result takes longer
+        than ``timeout`` seconds. A request that times out while queued is
+        dropped; one that is already running can't be interrupted, it keeps
+        its worker until it is done and its result is discarded.
+        """
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PoolFullError(
+                    f"{self._running} requests running and {self._queued} queued, try again later")
+            self._queued += 1
+
+        submitted = time.monotonic()
+        abandoned = threading.Event()
+
+        def work():
+            started = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                if abandoned.is_set():
+                    return None
+                self._running += 1
+            failed = True
+            try:
+                result = fn()
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+                    self._latencies.append((started - submitted, time.monotonic() - started))
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, work)
+        # Retrieve the outcome of requests that were given up on, so it isn't logged as never retrieved.
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        try:
+            # Shielded: cancelling a queued job would skip work() and its bookkeeping.
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError as exc:
+            abandoned.set()
+            with self._lock:
+                self._timed_out += 1
+            logging.warning("Inference request timed out after %.1f seconds", self.timeout)
+            raise TimeoutError(f"Inference did not finish within {self.timeout:g} seconds") from exc
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, counters and recent latencies (in seconds), for /status."""
+        with self._lock:
+            latencies = list(self._latencies)
+            stats = {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "timeout": self.timeout,
+                "running": self._running,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+        waits = [wait for wait, _ in latencies]
+        totals = sorted(wait + run for wait, run in latencies)
+        stats["recent_requests"] = len(latencies)
+        stats["queue_wait_avg"] = sum(waits) / len(waits) if waits else 0.0
+        stats["latency_avg"] = sum(totals) / len(totals) if totals else 0.0
+        stats["latency_p95"] = totals[min(len(totals) - 1, int(len(totals) * 0.95))] if totals else 0.0
+        return stats
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -25,6 +25,13 @@ from .audio.manager import speech_file_to_array_fn_resize
 
 class ComboRecognizer:
     MODEL_OUTPUT_MAXSIZE = 64
+    # The models take 16 kHz audio, wav2vec2 emits one frame of logits per
+    # 320 samples (20 ms) with a receptive field of 400 samples.
+    SAMPLE_RATE = 16000
+    FRAME_STRIDE = 320
+    FRAME_SIZE = 400
+    # Padded samples per batched phoneme model run (clips x longest clip), bounds its memory.
+    BATCH_MAX_SAMPLES = 16000 * 240
 
     __instance = None
 
@@ -34,7 +41,8 @@ class ComboRecognizer:
             ComboRecognizer()
         return ComboRecognizer.__instance
 
-    def __init__(self, phoneme_model_path, emotion_model_path, audio_manager=None, onnx_providers=None):
+    def __init__(self, phoneme_model_path, emotion_model_path, audio_manager=None, onnx_providers=None,
+                 window_seconds=30.0, window_overlap_seconds=1.0):
         self.recognition_thread = None
         self._processing_stop_event = threading.Event()
         if ComboRecognizer.__instance is not None:
@@ -56,6 +64,9 @@ class ComboRecognizer:
         self.audio_in_thread = None
         self.audio_out_thread = None
         self.providers = self._resolve_providers(onnx_providers)
+        # Longer audio is run through the phoneme model in overlapping windows, 0 disables it.
+        self.window_seconds = window_seconds
+        self.window_overlap_seconds = window_overlap_seconds
         self.emotion_model_path = emotion_model_path
         self.phoneme_model_path = phoneme_model_path
         self.emotion_model_name = Path(emotion_model_path).name if emotion_model_path else None
@@ -340,6 +351,118 @@ class ComboRecognizer:
             logging.error(f"Error decoding tokens: {str(e)}")
             return []
 
+    def decode_segments(self, prediction):
+        """CTC-decode per-frame token ids into timed phonemes.
+
+        Runs of the same token are collapsed and special tokens (the CTC
+        blank among them) dropped. Every phoneme gets the start and end in
+        seconds of the frames it was emitted on.
+        """
+        special_tokens = self.phoneme_settings.get("special_tokens", [])
+        frame_seconds = self.FRAME_STRIDE / self.SAMPLE_RATE
+        segments = []
+        run_start = 0
+        for frame in range(1, len(prediction) + 1):
+            if frame < len(prediction) and prediction[frame] == prediction[run_start]:
+                continue
+            token = self.token_dict.get(prediction[run_start])
+            if token is not None and token not in special_tokens:
+                segments.append({"phoneme": token, "start": run_start * frame_seconds, "end": frame * frame_seconds})
+            run_start = frame
+        return segments
+
+    def predict_phoneme_ids(self, audio):
+        """The most likely token id of every frame of audio, see decode_tokens and decode_segments."""
+        try:
+            if isinstance(audio, str):
+                audio = speech_file_to_array_fn_resize(audio)
+            if not self.phoneme_model:
+                logging.error("No phoneme model loaded")
+                return None
+            return np.argmax(self.phoneme_logits(audio), axis=-1).tolist()
+        except Exception as e:
+            logging.error(f"Error in phoneme prediction: {str(e)}")
+            return None
+
+    def predict_phoneme_ids_batch(self, audios):
+        """predict_phoneme_ids for several clips, with clips of similar length run together.
+
+        Clips are sorted by length and packed into padded batches of up to
+        BATCH_MAX_SAMPLES, so there is little padding and one model run per
+        batch instead of one per clip. The padding is masked out with an
+        attention_mask; models without one (like the wav2vec2 exports used
+        here) only get clips of the same length batched. Clips longer than
+        window_seconds are run on their own, in windows. Returns a list in
+        the order of audios, None for clips that failed.
+        """
+        results = [None] * len(audios)
+        if not self.phoneme_model:
+            logging.error("No phoneme model loaded")
+            return results
+        audios = [np.asarray(audio, dtype=np.float32).reshape(-1) for audio in audios]
+        window = self.window_seconds * self.SAMPLE_RATE
+        batched = []
+        for index, audio in enumerate(audios):
+            if window > 0 and len(audio) > window:
+                results[index] = self.predict_phoneme_ids(audio)
+            else:
+                batched.append(index)
+
+        for batch in self._batches(batched, [len(audio) for audio in audios]):
+            try:
+                logits = self._run_phoneme_batch([audios[index] for index in batch])
+            except Exception as e:
+                logging.warning(f"Batched phoneme prediction of {len(batch)} clips failed, "
+                                f"running them one by one: {str(e)}")
+                for index in batch:
+                    results[index] = self.predict_phoneme_ids(audios[index])
+                continue
+            for index, clip_logits in zip(batch, logits):
+                results[index] = np.argmax(clip_logits, axis=-1).tolist()
+        return results
+
+    def _batches(self, indices, lengths):
+        """Split indices into batches of similar lengths, see predict_phoneme_ids_batch."""
+        model_inputs = self.phoneme_model.get_inputs()
+        # Models exported with a fixed batch size of 1 can only run clips one by one.
+        max_batch_size = 1 if model_inputs[0].shape[0] == 1 else len(indices)
+        # Without an attention_mask the model attends over the padding, which changes
+        # the logits of the shorter clips, so only clips of the same length share a run.
+        equal_lengths_only = not self._takes_attention_mask()
+        batches = []
+        batch = []
+        for index in sorted(indices, key=lambda index: lengths[index]):
+            # Sorted ascending, so the new clip is the longest of its batch.
+            if batch and (len(batch) >= max_batch_size
+                          or (equal_lengths_only and lengths[index] != lengths[batch[0]])
+                          or (len(batch) + 1) * lengths[index] > self.BATCH_MAX_SAMPLES):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _takes_attention_mask(self):
+        return any(model_input.name == "attention_mask" for model_input in self.phoneme_model.get_inputs())
+
+    def _run_phoneme_batch(self, clips):
+        """The logits of every clip in one zero-padded run of the phoneme model."""
+        model_inputs = self.phoneme_model.get_inputs()
+        longest = max(len(clip) for clip in clips)
+        values = np.zeros((len(clips), longest), dtype=np.float32)
+        attention_mask = np.zeros((len(clips), longest), dtype=np.int64)
+        for row, clip in enumerate(clips):
+            values[row, :len(clip)] = clip
+            attention_mask[row, :len(clip)] = 1
+        inputs = {model_inputs[0].name: values}
+        if self._takes_attention_mask():
+            inputs["attention_mask"] = attention_mask
+        logits = self.phoneme_model.run(None, inputs)[0]
+        # Drop the frames of the padding.
+        return [logits[row, :max(0, (len(clip) - self.FRAME_SIZE) // self.FRAME_STRIDE + 1)]
+                for row, clip in enumerate(clips)]
+
     def stop(self):
         logging.info("Stopping recognizer")
         self._processing_stop_event.set()
@@ -370,6 +493,68 @@ class ComboRecognizer:
             logging.debug(f"Using model emotion list: {emotions}")
             return emotions
 
+    def _windows(self, num_samples):
+        """(start, end) sample ranges covering num_samples, overlapping by at least window_overlap_seconds.
+
+        Starts are multiples of FRAME_STRIDE, so the frames of every window
+        line up with the frames of the whole utterance.
+        """
+        window = int(self.window_seconds * self.SAMPLE_RATE) // self.FRAME_STRIDE * self.FRAME_STRIDE
+        overlap = int(self.window_overlap_seconds * self.SAMPLE_RATE) // self.FRAME_STRIDE * self.FRAME_STRIDE
+        if window <= 0 or num_samples < window + self.FRAME_STRIDE:
+            return [(0, num_samples)]
+        # As few full windows as give at least the requested overlap, spread evenly.
+        count = math.ceil((num_samples - overlap) / max(self.FRAME_STRIDE, window - overlap))
+        last_start = (num_samples - window) // self.FRAME_STRIDE
+        starts = [round(last_start * index / (count - 1)) * self.FRAME_STRIDE for index in range(count)]
+        # The last window ends with the audio, up to FRAME_STRIDE samples longer than the others.
+        return [(start, start + window) for start in starts[:-1]] + [(starts[-1], num_samples)]
+
+    def phoneme_logits(self, audio):
+        """The phoneme model's logits for audio, shape (frames, tokens).
+
+        Audio longer than window_seconds is run in overlapping windows, so the
+        memory used by the model stays bounded. Where windows overlap their
+        logits are cross-faded, which keeps the frames near the window edges
+        (that have the least context) from deciding the result.
+        """
+        model = self.phoneme_model
+        input_name = model.get_inputs()[0].name
+        audio = np.asarray(audio, dtype=np.float32).reshape(1, -1)
+        windows = self._windows(audio.shape[1])
+        if len(windows) == 1:
+            return model.run(None, {input_name: audio})[0][0]
+
+        merged = None
+        weights = None
+        previous_end_frame = 0
+        for index, (start, end) in enumerate(windows):
+            logits = model.run(None, {input_name: audio[:, start:end]})[0][0]
+            first_frame = start // self.FRAME_STRIDE
+            end_frame = first_frame + len(logits)
+            if merged is None:
+                total_frames = max(end_frame, (audio.shape[1] - self.FRAME_SIZE) // self.FRAME_STRIDE + 1)
+                merged = np.zeros((total_frames, logits.shape[-1]), dtype=np.float32)
+                weights = np.zeros(total_frames, dtype=np.float32)
+            elif end_frame > len(merged):
+                merged = np.pad(merged, ((0, end_frame - len(merged)), (0, 0)))
+                weights = np.pad(weights, (0, end_frame - len(weights)))
+            window_weights = np.ones(len(logits), dtype=np.float32)
+            # Fade in over the frames shared with the previous window, out over the next one.
+            fade_in = min(max(0, previous_end_frame - first_frame), len(logits))
+            if fade_in:
+                window_weights[:fade_in] = np.linspace(0, 1, fade_in + 2, dtype=np.float32)[1:-1]
+            if index + 1 < len(windows):
+                fade_out = min(max(0, end_frame - windows[index + 1][0] // self.FRAME_STRIDE), len(logits))
+                if fade_out:
+                    window_weights[-fade_out:] *= np.linspace(1, 0, fade_out + 2, dtype=np.float32)[1:-1]
+            merged[first_frame:end_frame] += logits * window_weights[:, None]
+            weights[first_frame:end_frame] += window_weights
+            previous_end_frame = end_frame
+        covered = weights > 0
+        merged[covered] /= weights[covered, None]
+        return merged[covered]
+
     def predict(self, audio, model_type="phoneme"):
         try:
             if isinstance(audio, str):
@@ -380,14 +565,12 @@ class ComboRecognizer:
                 logging.error(f"No {model_type} model loaded")
                 return None
                 
-            input_name = model.get_inputs()[0].name
-            inputs = {input_name: audio.astype(np.float32)}
-            
             if model_type == "phoneme":
-                outputs = self.phoneme_model.run(None, inputs)[0]
-                prediction = np.argmax(outputs, axis=-1)
-                return self.decode_tokens(prediction.squeeze().tolist())
+                prediction = self.predict_phoneme_ids(audio)
+                return self.decode_tokens(prediction) if prediction is not None else None
             else:
+                input_name = model.get_inputs()[0].name
+                inputs = {input_name: audio.astype(np.float32)}
                 outputs = self.emotion_model.run(None, inputs)[0]
                 if "wav2vec2-large-robust-12-ft-emotion-msp-dim" in self.emotion_settings["full_name"]:
                     scores = np.squeeze(outputs)
@@ -23,6 +23,8 @@ class BackendConfig:
     onnx_providers: Optional[List[Any]] = None
     audio_source: str = "local"
     viseme_set: str = "preston_blair"
+    window_seconds: float = 30.0
+    window_overlap_seconds: float = 1.0
 
 
 @dataclass
@@ -66,6 +68,8 @@ class PhonemationBackend:
                 self.config.emotion_model_path,
                 self.audio_manager if self.config.audio_source != "remote" else None,
                 onnx_providers=self.config.onnx_providers,
+                window_seconds=self.config.window_seconds,
+                window_overlap_seconds=self.config.window_overlap_seconds,
             )
             providers = self.recognizer.get_gpu_providers()
         else:
@@ -183,57 +187,163 @@ class PhonemationBackend:
         return self.audio_manager.get_device_id_from_name(device_name, device_type)
 
     def process_audio(self, audio_base64: str, sample_rate: int, channels: int = 1) -> Optional[Dict[str, Any]]:
+        """Recognise base64-encoded float32 PCM audio (the JSON transport)."""
         import base64
-        import time
         import numpy as np
-        from .audio.manager import resample_and_reshape_audio_data
 
-        if not self.recognizer:
+        try:
+            audio = np.frombuffer(base64.b64decode(audio_base64), dtype=np.float32)
+        except Exception as exc:
+            logging.error("Error in process_audio: %s", exc)
             return None
+        return self.process_audio_samples(audio, sample_rate, channels)
+
+    def process_audio_bytes(self, audio_bytes: bytes, sample_rate: int, channels: int = 1) -> Optional[Dict[str, Any]]:
+        """Recognise raw float32 PCM audio, the body of an application/octet-stream request."""
+        import numpy as np
 
         try:
-            audio_bytes = base64.b64decode(audio_base64)
+            # Wraps the request body without copying it.
             audio = np.frombuffer(audio_bytes, dtype=np.float32)
+        except Exception as exc:
+            logging.error("Error in process_audio_bytes: %s", exc)
+            return None
+        return self.process_audio_samples(audio, sample_rate, channels)
+
+    def process_audio_file(self, path: str) -> Optional[Dict[str, Any]]:
+        """Recognise an audio file on this host, read directly from disk."""
+        clip = self.read_audio_file(path)
+        return self.process_audio_samples(*clip) if clip is not None else None
+
+    def process_audio_files(self, sources: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Recognise several audio files (paths or file objects) in batches, see process_audio_batch."""
+        clips = [self.read_audio_file(source) for source in sources]
+        valid = [index for index, clip in enumerate(clips) if clip is not None]
+        results = [None] * len(clips)
+        for index, result in zip(valid, self.process_audio_batch([clips[index] for index in valid])):
+            results[index] = result
+        return results
+
+    def read_audio_file(self, source) -> Optional[tuple]:
+        """(interleaved float32 samples, sample rate, channels) of an audio file, None if it can't be read."""
+        import soundfile as sf
 
-            if channels > 1:
-                audio = audio.reshape(-1, channels).mean(axis=1)
+        try:
+            audio, sample_rate = sf.read(source, dtype="float32", always_2d=True)
+        except Exception as exc:
+            logging.error("Failed to read audio file %s: %s", getattr(source, "name", source), exc)
+            return None
+        return audio.reshape(-1), sample_rate, audio.shape[1]
 
-            volume = float(np.sqrt(np.mean(audio ** 2)))
-            modified_audio = resample_and_reshape_audio_data(audio, orig_sampling_rate=sample_rate)
+    def process_audio_samples(self, audio, sample_rate: int, channels: int = 1) -> Optional[Dict[str, Any]]:
+        """Recognise float32 PCM samples, interleaved if there is more than one channel."""
+        import time
+
+        if not self.recognizer:
+            return None
 
+        try:
+            audio, volume, modified_audio = self._prepare_audio(audio, sample_rate, channels)
             start_time = time.time()
-            phonemes = self.recognizer.predict(modified_audio, model_type="phoneme")
-            if not phonemes:
-                return {
-                    "phonemes": [],
-                    "emotions": [],
-                    "sample_length": 0.0,
-                    "volume": volume,
-                    "inference_time": 0.0,
-                    "number_of_phonemes": 0,
-                }
+            prediction = self.recognizer.predict_phoneme_ids(modified_audio)
+            return self._recognition_result(prediction, modified_audio, len(audio) / sample_rate, volume, start_time)
+        except Exception as exc:
+            logging.error("Error in process_audio_samples: %s", exc)
+            return None
+
+    def process_audio_batch(self, clips: List[tuple]) -> List[Optional[Dict[str, Any]]]:
+        """Recognise several (samples, sample_rate, channels) clips, see process_audio_samples.
+
+        The phoneme model runs on batches of clips of similar length, see
+        ComboRecognizer.predict_phoneme_ids_batch. The results are in the
+        order of clips, None for clips that failed. The inference_time of each
+        result is its share of its batch.
+        """
+        import time
+
+        if not self.recognizer:
+            return [None] * len(clips)
 
-            emotions = self.recognizer.predict(modified_audio, model_type="emotion") if self.recognizer.emotion_model else []
-            inference_time = time.time() - start_time
+        prepared = []
+        for audio, sample_rate, channels in clips:
+            try:
+                audio, volume, modified_audio = self._prepare_audio(audio, sample_rate, channels)
+                prepared.append((modified_audio, len(audio) / sample_rate, volume))
+            except Exception as exc:
+                logging.error("Error in process_audio_batch: %s", exc)
+                prepared.append(None)
 
-            sample_length_ms = len(audio) / sample_rate * 1000 / len(phonemes) if phonemes else 0
+        valid = [index for index, clip in enumerate(prepared) if clip is not None]
+        start_time = time.time()
+        predictions = self.recognizer.predict_phoneme_ids_batch([prepared[index][0] for index in valid])
+        phoneme_time = (time.time() - start_time) / max(1, len(valid))
 
-            phonemes_cmu = self.phoneme_mapper.convert_phonemes(phonemes)
-            visemes = self.phoneme_mapper.convert_visemes(phonemes)
+        results = [None] * len(clips)
+        for index, prediction in zip(valid, predictions):
+            modified_audio, duration, volume = prepared[index]
+            try:
+                results[index] = self._recognition_result(prediction, modified_audio, duration, volume,
+                                                          time.time() - phoneme_time)
+            except Exception as exc:
+                logging.error("Error in process_audio_batch: %s", exc)
+        return results
+
+    def _prepare_audio(self, audio, sample_rate: int, channels: int):
+        """Mix audio down to mono and resample it for the models: (mono audio, volume, model input)."""
+        import numpy as np
+        from .audio.manager import resample_and_reshape_audio_data
 
+        if channels > 1:
+            audio = audio.reshape(-1, channels).mean(axis=1)
+        volume = float(np.sqrt(np.mean(audio ** 2)))
+        return audio, volume, resample_and_reshape_audio_data(audio, orig_sampling_rate=sample_rate)
+
+    def _recognition_result(self, prediction, modified_audio, duration: float, volume: float,
+                            start_time: float) -> Dict[str, Any]:
+        """The response for one clip from its phoneme model prediction; runs the emotion model."""
+        import time
+
+        phonemes = self.recognizer.decode_tokens(prediction) if prediction is not None else None
+        if not phonemes:
             return {
-                "phonemes": phonemes,
-                "phonemes_cmu": phonemes_cmu,
-                "visemes": visemes,
-                "emotions": emotions or [],
-                "sample_length": sample_length_ms,
+                "phonemes": [],
+                "phoneme_segments": [],
+                "emotions": [],
+                "sample_length": 0.0,
                 "volume": volume,
-                "inference_time": inference_time,
-                "number_of_phonemes": len(phonemes),
+                "inference_time": 0.0,
+                "number_of_phonemes": 0,
             }
-        except Exception as exc:
-            logging.error("Error in process_audio: %s", exc)
-            return None
+
+        emotions = self.recognizer.predict(modified_audio, model_type="emotion") if self.recognizer.emotion_model else []
+        inference_time = time.time() - start_time
+
+        sample_length_ms = duration * 1000 / len(phonemes)
+
+        phonemes_cmu = self.phoneme_mapper.convert_phonemes(phonemes)
+        visemes = self.phoneme_mapper.convert_visemes(phonemes)
+
+        return {
+            "phonemes": phonemes,
+            "phonemes_cmu": phonemes_cmu,
+            "visemes": visemes,
+            "phoneme_segments": self._map_segments(self.recognizer.decode_segments(prediction)),
+            "emotions": emotions or [],
+            "sample_length": sample_length_ms,
+            "volume": volume,
+            "inference_time": inference_time,
+            "number_of_phonemes": len(phonemes),
+        }
+
+    def _map_segments(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add the CMU phoneme and viseme to timed IPA phonemes, dropping those without one."""
+        mapped = []
+        for segment in segments:
+            cmu = self.phoneme_mapper.ipa_to_cmu_token(segment["phoneme"])
+            if cmu is None:
+                continue
+            mapped.append(dict(segment, phoneme_cmu=cmu, viseme=self.phoneme_mapper.cmu_to_viseme_token(cmu)))
+        return mapped
 
     def _serialize_output(self, output: Dict[str, Any]) -> Dict[str, Any]:
         audio = output.get("audio")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare save/load time and file size of the .pgo, .pg2 and .pgb project formats.
+
+Without an input file a synthetic project is generated, for example:
+    python benchmark_project_formats.py --voices 4 --phrases 2000
+    python benchmark_project_formats.py -i new_lame_test2.pg2
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+import LipsyncDoc
+from LipsyncObject import LipSyncObject
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FORMATS = (("pgo", "open", "save"), ("pg2", "open_json", "save2"), ("pgb", "open_binary", "save_binary"))
+
+
+class ParentClass:
+    def __init__(self):
+        self.phonemeset = LipsyncDoc.PhonemeSet()
+
+
+def new_doc(parent):
+    return LipsyncDoc.LipsyncDoc(LipsyncDoc.LanguageManager(), parent)
+
+
+def build_synthetic_doc(parent, num_voices, num_phrases, seed=0):
+    """Fill a document with random phrases of 6 words with 4 phonemes each."""
+    rng = random.Random(seed)
+    phonemes = parent.phonemeset.set
+    doc = new_doc(parent)
+    frame = 0
+    for voice_id in range(num_voices):
+        voice = LipSyncObject(name="Voice {}".format(voice_id + 1), text="", fps=doc.fps,
+                              parent=doc.project_node, object_type="voice")
+        frame = 0
+        for phrase_id in range(num_phrases):
+            phrase = LipSyncObject(text="phrase {}".format(phrase_id), start_frame=frame, fps=doc.fps,
+                                   object_type="phrase", parent=voice)
+            for word_id in range(6):
+                word = LipSyncObject(text="word{}".format(rng.randrange(500)), start_frame=frame, fps=doc.fps,
+                                     object_type="word", parent=phrase)
+                for _ in range(4):
+                    LipSyncObject(text=rng.choice(phonemes), start_frame=frame, end_frame=frame, fps=doc.fps,
+                                  object_type="phoneme", parent=word)
+                    frame += 1
+                word.end_frame = frame - 1
+            phrase.end_frame = frame - 1
+            frame += 2
+        voice.text = "\n".join(phrase.text for phrase in voice.children)
+        doc.voices.append(voice)
+    # A sound file that doesn't exist, so loading the project doesn't try to open any audio.
+    doc.soundPath = "benchmark.wav"
+    doc.soundDuration = frame
+    doc.project_node.sound_duration = frame
+    doc.current_voice = doc.voices[0]
+    return doc
+
+
+def time_call(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def compare_projects(first, second):
+    """The project content as written to .pg2, without the values that depend on the path."""
+    first_dict, second_dict = first.copy_to_dict(), second.copy_to_dict()
+    for project_dict in (first_dict, second_dict):
+        project_dict.pop("sound_path")
+    return first_dict == second_dict
+
+
+def run_benchmark(doc, parent, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for extension, open_method, save_method in FORMATS:
+            path = os.path.join(temp_dir, "benchmark.{}".format(extension))
+            save_time = time_call(lambda: getattr(doc, save_method)(path), repeat)
+            loaded = []
+
+            def load():
+                # A fresh document per run, LipsyncDoc.open() keeps the voices it already has.
+                loaded[:] = [new_doc(parent)]
+                getattr(loaded[0], open_method)(path)
+
+            load_time = time_call(load, repeat)
+            # .pgo files don't keep tags, so they only round-trip exactly for projects without any.
+            lossless = compare_projects(doc, loaded[0])
+            results.append((extension, save_time, load_time, os.path.getsize(path), lossless))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-i", dest="input_file", help="A project to benchmark instead of a synthetic one.")
+    parser.add_argument("--voices", type=int, default=2, help="Number of voices of the synthetic project.")
+    parser.add_argument("--phrases", type=int, default=1000, help="Number of phrases per voice.")
+    parser.add_argument("--repeat", type=int, default=3, help="Take the best of this many runs.")
+    args = parser.parse_args()
+
+    parent = ParentClass()
+    if args.input_file:
+        doc = new_doc(parent)
+        for extension, open_method, _ in FORMATS:
+            if args.input_file.endswith(extension):
+                getattr(doc, open_method)(args.input_file)
+                break
+        else:
+            parser.error("Unsupported project file: {}".format(args.input_file))
+    else:
+        doc = build_synthetic_doc(parent, args.voices, args.phrases)
+    num_nodes = sum(len(voice.descendants) for voice in doc.project_node.children)
+    logger.info("Benchmarking {} voices with {} nodes".format(len(doc.project_node.children), num_nodes))
+
+    print("{:<8}{:>12}{:>12}{:>14}{:>10}".format("format", "save (s)", "load (s)", "size (bytes)", "lossless"))
+    for extension, save_time, load_time, size, lossless in run_benchmark(doc, parent, args.repeat):
+        print("{:<8}{:>12.3f}{:>12.3f}{:>14d}{:>10}".format(extension, save_time, load_time, size, str(lossless)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Compiled pronunciation dictionaries for the LanguageManager.
+
+Parsing the CMU text dictionaries line by line costs more than everything else
+a short CLI run does, so each source dictionary is compiled once into a binary
+file in the app data dir and memory-mapped on every later start.
+
+Layout of a compiled file (all integers little endian)::
+
+    header   magic, format version, source size, source mtime, entry count, source sha1
+    offsets  (entry count + 1) uint32 offsets into the data block
+    data     b"WORD\\tPH1 PH2 ...\\n" entries, sorted by the UTF-8 bytes of WORD
+
+The cache is invalidated when the size/mtime of the source changes and the
+content hash no longer matches.
+
+Both the compiled files and the IndexedTextDictionary fallback only build the
+phoneme lists of words that are actually looked up, so a process breaking
+down a short script never materialises the whole CMU dictionary.
+
+Compiled dictionaries pickle by reference (file path or shared memory name),
+so worker processes attach to the same read-only pages instead of loading
+their own copy.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+from abc import abstractmethod
+from array import array
+from collections.abc import Mapping
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+
+logger = logging.getLogger("dictionary_cache")
+
+MAGIC = b"PGDICT"
+FORMAT_VERSION = 1
+CACHE_SUFFIX = ".pgdict"
+# magic, version, source size, source mtime_ns, entry count, sha1 of the source; padded to 64 bytes
+HEADER = struct.Struct("<6sHQqQ20s12x")
+ENTRY_SEPARATOR = b"\t"
+
+
+def iter_dictionary_entries(path):
+    """
+    Yield (word, [phonemes]) pairs from a text pronunciation dictionary.
+
+    These are the rules the LanguageManager always used: the first line is
+    only inspected to detect the new CMUdict header, comments are skipped and
+    alternate transcriptions like "WORD(2)" are thrown out.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as in_file:
+        new_cmu_version = in_file.readline().startswith(";;; # CMUdict")
+        for line in in_file:
+            if not new_cmu_version:
+                if line[0] == "#":
+                    continue  # skip comments in the dictionary
+            else:
+                if line.startswith(";;;"):
+                    continue
+            entry = line.split()
+            if len(entry) == 0:
+                continue
+            if entry[0].endswith(")"):
+                continue
+            yield entry[0], entry[1:]
+
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as in_file:
+        for block in iter(lambda: in_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def get_cache_path(source_path, cache_dir):
+    """Return the compiled file location for a source dictionary, unique per absolute source path."""
+    source_path = Path(source_path).resolve()
+    path_hash = hashlib.sha1(str(source_path).encode("utf-8")).hexdigest()[:16]
+    return Path(cache_dir) / "{}_{}{}".format(source_path.name, path_hash, CACHE_SUFFIX)
+
+
+def compile_to_bytes(source_path):
+    """Parse a text dictionary and return its compiled form."""
+    source_stat = os.stat(source_path)
+    source_hash = _file_sha1(source_path)
+    entries = {}
+    for word, phonemes in iter_dictionary_entries(source_path):
+        entries[word.encode("utf-8")] = " ".join(phonemes).encode("utf-8")
+
+    offsets = array("I")
+    data = bytearray()
+    for key in sorted(entries):
+        offsets.append(len(data))
+        data += key + ENTRY_SEPARATOR + entries[key] + b"\n"
+    offsets.append(len(data))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, source_stat.st_size, source_stat.st_mtime_ns,
+                         len(entries), source_hash)
+    return header + offsets.tobytes() + data
+
+
+def compile_dictionary(source_path, target_path):
+    """
+    Parse a text dictionary and write its compiled form to target_path.
+
+    The file is written next to the target and renamed into place, so parallel
+    processes racing to build the same cache never see a half written file.
+    """
+    compiled = compile_to_bytes(source_path)
+    target_path = Path(target_path)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target_path.with_name("{}.{}.tmp".format(target_path.name, os.getpid()))
+    try:
+        with open(temp_path, "wb") as out_file:
+            out_file.write(compiled)
+        os.replace(temp_path, target_path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    return target_path
+
+
+def _read_header(path):
+    with open(path, "rb") as in_file:
+        raw_header = in_file.read(HEADER.size)
+    if len(raw_header) != HEADER.size:
+        return None
+    header = HEADER.unpack(raw_header)
+    if header[0] != MAGIC or header[1] != FORMAT_VERSION:
+        return None
+    return header
+
+
+def is_cache_valid(source_path, cache_path):
+    """
+    Check whether cache_path still matches source_path.
+
+    A matching size and mtime is trusted directly. If only the mtime changed
+    (e.g. after reinstalling) the content hash decides, and a matching cache
+    gets its stored mtime refreshed so the next start takes the fast path.
+    """
+    try:
+        header = _read_header(cache_path)
+        source_stat = os.stat(source_path)
+    except OSError:
+        return False
+    if header is None:
+        return False
+    _, _, cached_size, cached_mtime, entry_count, cached_hash = header
+    if cached_size != source_stat.st_size:
+        return False
+    if cached_mtime == source_stat.st_mtime_ns:
+        return True
+    if _file_sha1(source_path) != cached_hash:
+        return False
+    try:
+        with open(cache_path, "r+b") as cache_file:
+            cache_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, cached_size, source_stat.st_mtime_ns,
+                                         entry_count, cached_hash))
+    except OSError:
+        pass
+    return True
+
+
+class SortedDictionary(Mapping):
+    """
+    Abstract base for read-only WORD -> [phonemes] mappings over a sorted on-disk index.
+
+    Subclasses implement _key_at(index) returning the UTF-8 key of an entry and
+    _phonemes_at(index), Mapping makes this an abc that can't be instantiated
+    without them. Lookups are a binary search, and only the entries that
+    actually get requested are built and kept as Python lists.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._requested = {}
+
+    @abstractmethod
+    def _key_at(self, index):
+        """The UTF-8 key of the entry at index."""
+
+    @abstractmethod
+    def _phonemes_at(self, index):
+        """The phoneme list of the entry at index."""
+
+    def _find(self, key):
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key_at(low) == key:
+            return low
+        return -1
+
+    def __getitem__(self, word):
+        try:
+            return self._requested[word]
+        except KeyError:
+            pass
+        if not isinstance(word, str):
+            raise KeyError(word)
+        index = self._find(word.encode("utf-8"))
+        if index < 0:
+            raise KeyError(word)
+        phonemes = self._phonemes_at(index)
+        self._requested[word] = phonemes
+        return phonemes
+
+    def __contains__(self, word):
+        return word in self._requested or (isinstance(word, str) and self._find(word.encode("utf-8")) >= 0)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self._key_at(index).decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def __reduce__(self):
+        # Re-attach to the same file instead of pickling the contents.
+        return self.__class__, (self.path,)
+
+
+class CompiledDictionary(SortedDictionary):
+    """Mapping backed by a memory-mapped compiled dictionary, see compile_dictionary."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = str(path)
+        with open(self.path, "rb") as in_file:
+            self._mmap = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._attach(self._mmap)
+        except ValueError:
+            self._mmap.close()
+            raise
+
+    def _attach(self, buffer):
+        header = HEADER.unpack_from(buffer, 0)
+        if header[0] != MAGIC or header[1] != FORMAT_VERSION:
+            raise ValueError("Not a compiled dictionary: {}".format(self.path))
+        self._buffer = buffer
+        self._count = header[4]
+        offsets_end = HEADER.size + 4 * (self._count + 1)
+        self._offsets = memoryview(buffer)[HEADER.size:offsets_end].cast("I")
+        if sys.byteorder != "little":
+            self._offsets = array("I", self._offsets)
+            self._offsets.byteswap()
+        self._data_start = offsets_end
+
+    def _entry_at(self, index):
+        return bytes(self._buffer[self._data_start + self._offsets[index]:
+                                  self._data_start + self._offsets[index + 1]])
+
+    def _key_at(self, index):
+        entry = self._entry_at(index)
+        return entry[:entry.index(ENTRY_SEPARATOR)]
+
+    def _phonemes_at(self, index):
+        entry = self._entry_at(index)
+        return entry[entry.index(ENTRY_SEPARATOR) + 1:].decode("utf-8").split()
+
+    def _release(self):
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._buffer = None
+
+    def close(self):
+        self._release()
+        self._mmap.close()
+
+
+class SharedMemoryDictionary(CompiledDictionary):
+    """
+    Compiled dictionary held in a named shared memory block instead of a file.
+
+    For when the app data dir can't hold a cache but a pool of worker processes
+    should still share a single copy. The creating process owns the block and
+    has to close() it when the workers are done, pickling an instance only
+    passes the block name so workers attach to the same memory.
+    """
+
+    def __init__(self, name, owner=False):
+        SortedDictionary.__init__(self)
+        self.path = name
+        self.owner = owner
+        try:
+            self._shared_memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 can't opt out of the resource tracker, which would
+            # unlink the owner's block when a worker exits (bpo-39959). Only the
+            # owner's registration from create() stays, close() unlinks it.
+            self._shared_memory = shared_memory.SharedMemory(name=name)
+            if not owner:
+                resource_tracker.unregister(self._shared_memory._name, "shared_memory")
+        try:
+            self._attach(self._shared_memory.buf)
+        except ValueError:
+            self._shared_memory.close()
+            raise
+
+    @classmethod
+    def create(cls, source_path):
+        compiled = compile_to_bytes(source_path)
+        block = shared_memory.SharedMemory(create=True, size=len(compiled))
+        block.buf[:len(compiled)] = compiled
+        dictionary = cls(block.name, owner=True)
+        block.close()
+        return dictionary
+
+    def close(self):
+        self._release()
+        self._shared_memory.close()
+        if self.owner:
+            # Workers sharing this process's resource tracker unregistered the
+            # block when they attached; register it again so unlink() can drop it.
+            resource_tracker.register(self._shared_memory._name, "shared_memory")
+            self._shared_memory.unlink()
+
+    def __del__(self):
+        # SharedMemory refuses to close while our offset view still points into it.
+        if getattr(self, "_buffer", None) is not None:
+            self._release()
+
+
+class IndexedTextDictionary(SortedDictionary):
+    """
+    Mapping over a text dictionary that only keeps a sorted array of line offsets.
+
+    Used when no compiled cache can be written. Building the index still reads
+    the file once, but afterwards only one integer per word stays resident.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = str(path)
+        self._mmap = None
+        self._offsets = array("Q")
+        if os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb") as in_file:
+            self._mmap = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._build_index()
+
+    def _build_index(self):
+        # Same rules as iter_dictionary_entries, a later duplicate replaces an earlier one.
+        entries = {}
+        new_cmu_version = self._mmap.readline().startswith(b";;; # CMUdict")
+        position = self._mmap.tell()
+        for line in iter(self._mmap.readline, b""):
+            line_start = position
+            position += len(line)
+            if not new_cmu_version:
+                if line[:1] == b"#":
+                    continue
+            else:
+                if line.startswith(b";;;"):
+                    continue
+            entry = line.split(None, 1)
+            if len(entry) == 0 or entry[0].endswith(b")"):
+                continue
+            entries[entry[0]] = line_start
+        self._offsets = array("Q", (entries[key] for key in sorted(entries)))
+        self._count = len(self._offsets)
+
+    def _line_at(self, index):
+        start = self._offsets[index]
+        end = self._mmap.find(b"\n", start)
+        return self._mmap[start:end if end >= 0 else len(self._mmap)]
+
+    def _key_at(self, index):
+        return self._line_at(index).split(None, 1)[0]
+
+    def _phonemes_at(self, index):
+        return self._line_at(index).decode("utf-8", errors="replace").split()[1:]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+
+
+def load_dictionary(source_path, cache_dir):
+    """
+    Return a mapping for source_path, compiling it into cache_dir first if needed.
+
+    Falls back to an IndexedTextDictionary over the text file if the cache
+    can't be written or read.
+    """
+    cache_path = get_cache_path(source_path, cache_dir)
+    try:
+        if not is_cache_valid(source_path, cache_path):
+            logger.info("Compiling dictionary {} to {}".format(source_path, cache_path))
+            compile_dictionary(source_path, cache_path)
+        return CompiledDictionary(cache_path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning("Unable to use compiled dictionary for {}: {}".format(source_path, e))
+    return IndexedTextDictionary(source_path)
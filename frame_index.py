@@ -0,0 +1,136 @@
+"""
+Per-voice frame lookup tables used during playback.
+
+A FrameIndex is created lazily by LipSyncObject.frame_index for a voice and is
+kept up to date by the LipSyncObject change hooks, so looking up the phoneme
+for a frame no longer walks the whole voice on every tick.
+"""
+
+from array import array
+
+
+class FrameIndex:
+    """
+    Maps frame numbers to phonemes for all descendants of one voice.
+
+    Two tables are maintained incrementally while nodes change:
+    the phonemes starting on each frame and how many words cover each frame.
+    From those a compact per-frame array of phoneme ids is resolved on demand,
+    which applies the rest_after_words/rest_after_phonemes settings.
+    """
+
+    def __init__(self, voice):
+        self.voice = voice
+        self._phonemes_by_frame = {}
+        self._word_cover = array("i")
+        self._texts = []
+        self._text_ids = {}
+        self._resolved = None
+        self._tail = "rest"
+        for node in voice.descendants:
+            self._add_node(node)
+
+    def _text_id(self, text):
+        try:
+            return self._text_ids[text]
+        except KeyError:
+            self._text_ids[text] = len(self._texts)
+            self._texts.append(text)
+            return self._text_ids[text]
+
+    def _cover_words(self, start_frame, end_frame, delta):
+        start_frame = max(start_frame, 0)
+        if end_frame < start_frame:
+            return
+        if end_frame >= len(self._word_cover):
+            self._word_cover.extend([0] * (end_frame + 1 - len(self._word_cover)))
+        for frame in range(start_frame, end_frame + 1):
+            self._word_cover[frame] += delta
+
+    def _add_phoneme(self, node, frame):
+        self._phonemes_by_frame.setdefault(frame, []).append(node)
+
+    def _remove_phoneme(self, node, frame):
+        phonemes = self._phonemes_by_frame.get(frame)
+        if phonemes and node in phonemes:
+            phonemes.remove(node)
+            if not phonemes:
+                del self._phonemes_by_frame[frame]
+
+    def _add_node(self, node):
+        if node.object_type == "phoneme":
+            self._add_phoneme(node, node.start_frame)
+        elif node.object_type == "word":
+            self._cover_words(node.start_frame, node.end_frame, 1)
+
+    def _remove_node(self, node):
+        if node.object_type == "phoneme":
+            self._remove_phoneme(node, node.start_frame)
+        elif node.object_type == "word":
+            self._cover_words(node.start_frame, node.end_frame, -1)
+
+    def add_subtree(self, node):
+        for sub_node in (node,) + node.descendants:
+            self._add_node(sub_node)
+        self._resolved = None
+
+    def remove_subtree(self, node):
+        for sub_node in (node,) + node.descendants:
+            self._remove_node(sub_node)
+        self._resolved = None
+
+    def node_changed(self, node, attribute, old_value):
+        """Update the tables after node.<attribute> changed from old_value."""
+        if node.object_type == "phoneme" and attribute == "start_frame":
+            self._remove_phoneme(node, old_value)
+            self._add_phoneme(node, node.start_frame)
+        elif node.object_type == "word" and attribute in ("start_frame", "end_frame"):
+            if attribute == "start_frame":
+                self._cover_words(old_value, node.end_frame, -1)
+            else:
+                self._cover_words(node.start_frame, old_value, -1)
+            self._cover_words(node.start_frame, node.end_frame, 1)
+        self._resolved = None
+
+    def invalidate(self):
+        """Drop the resolved frame table, e.g. after the rest frame settings changed."""
+        self._resolved = None
+
+    def phoneme_starting_at(self, frame):
+        phonemes = self._phonemes_by_frame.get(frame)
+        if phonemes:
+            return phonemes[0].text
+        return None
+
+    def is_in_word(self, frame):
+        return 0 <= frame < len(self._word_cover) and self._word_cover[frame] > 0
+
+    def _resolve(self):
+        rest_after_words = str(self.voice.config.get_rest_after_words()).lower() == "true"
+        rest_after_phonemes = str(self.voice.config.get_rest_after_phonemes()).lower() == "true"
+        last_frame = max([len(self._word_cover) - 1, self.voice.sound_duration or 0] +
+                         list(self._phonemes_by_frame))
+        rest_id = self._text_id("rest")
+        resolved = array("H", [rest_id]) * (last_frame + 1)
+        held_id = rest_id
+        for frame in range(last_frame + 1):
+            text = self.phoneme_starting_at(frame)
+            if text is not None:
+                held_id = self._text_id(text)
+                resolved[frame] = held_id
+            elif rest_after_words and not self.is_in_word(frame):
+                continue
+            elif not rest_after_phonemes:
+                resolved[frame] = held_id
+        self._tail = "rest" if (rest_after_words or rest_after_phonemes) else self._texts[held_id]
+        self._resolved = resolved
+
+    def get_phoneme(self, frame):
+        """Return the phoneme to show on frame, "rest" when nothing is being said."""
+        if self._resolved is None:
+            self._resolve()
+        if frame < 0:
+            return "rest"
+        if frame < len(self._resolved):
+            return self._texts[self._resolved[frame]]
+        return self._tail
@@ -0,0 +1,152 @@
+"""
+Writes the mouth image of every phoneme of a voice next to each other as an image strip.
+
+Every exported file is an exact copy of a mouth image, so instead of
+copying the data the files are placed as reflinks (copy-on-write clones)
+where the filesystem allows it, falling back to copying on a thread pool.
+Whatever doesn't work for the first file isn't tried again for the rest
+of the export. Hard links and symlinks can be asked for explicitly (see
+ALL_PLACE_METHODS); they share the data of the mouth images, so editing
+an exported file edits the mouth, and symlinks break when the mouths move.
+
+The listings of mouth directories are kept and only read again when the
+directory was modified.
+"""
+
+import logging
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+logger = logging.getLogger("image_export")
+
+# ioctl request to clone a whole file on Linux (btrfs, XFS, ...).
+FICLONE = 0x40049409
+PLACE_METHODS = ("reflink", "copy")
+ALL_PLACE_METHODS = ("reflink", "hardlink", "symlink", "copy")
+
+# directory -> (mtime_ns, {phoneme: path})
+_listings = {}
+_listings_lock = threading.Lock()
+
+
+def mouth_files(directory):
+    """The images of a mouth directory by phoneme (file stem)."""
+    directory = Path(directory)
+    mtime = directory.stat().st_mtime_ns
+    with _listings_lock:
+        listing = _listings.get(directory)
+        if listing is not None and listing[0] == mtime:
+            return listing[1]
+    files = {path.stem: path for path in directory.iterdir() if path.is_file()}
+    with _listings_lock:
+        _listings[directory] = (mtime, files)
+    return files
+
+
+def _reflink(source, target):
+    if not sys.platform.startswith("linux"):
+        raise OSError("Reflinks are only supported on Linux")
+    import fcntl
+    with open(source, "rb") as in_file, open(target, "wb") as out_file:
+        try:
+            fcntl.ioctl(out_file.fileno(), FICLONE, in_file.fileno())
+        except OSError:
+            out_file.close()
+            os.unlink(target)
+            raise
+
+
+def _place(method, source, target):
+    if method == "reflink":
+        _reflink(source, target)
+    elif method == "hardlink":
+        os.link(source, target)
+    elif method == "symlink":
+        os.symlink(os.path.abspath(source), target)
+    else:
+        shutil.copyfile(source, target)
+
+
+class ImageStripExporter:
+    """
+    Places the files of an image strip, see export.
+
+    methods are tried in order, from PLACE_METHODS by default; pass
+    ALL_PLACE_METHODS to also try hard links and symlinks.
+
+    cancel() may be called from any thread, the export stops after the files
+    that are being written at that moment.
+    """
+
+    def __init__(self, methods=PLACE_METHODS, max_workers=None):
+        self.methods = list(methods)
+        self.max_workers = max_workers
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def _place_file(self, source, target):
+        try:
+            os.unlink(target)  # Links can't replace files, copies of earlier exports are replaced.
+        except FileNotFoundError:
+            pass
+        for method in list(self.methods):
+            try:
+                _place(method, source, target)
+                return method
+            except OSError as e:
+                if method == self.methods[-1]:
+                    raise
+                with self._lock:
+                    if method in self.methods and len(self.methods) > 1:
+                        logger.info("Not using {} for the image strip: {}".format(method, e))
+                        self.methods.remove(method)
+        raise OSError("No way to write {}".format(target))
+
+    def export(self, files, progress_callback=None):
+        """
+        Write files, a list of (source, target) paths, and return how many were written.
+
+        progress_callback is called with the number of files done so far,
+        about a hundred times per export.
+        """
+        # Later entries for the same target win, like the copies used to overwrite each other.
+        files = list(dict((target, source) for source, target in files).items())
+        if not files:
+            return 0
+        done = 0
+        step = max(1, len(files) // 100)
+        # The first file decides which methods work on this filesystem, before going parallel.
+        target, source = files[0]
+        self._place_file(source, target)
+        done += 1
+        if progress_callback is not None:
+            progress_callback(done)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._place_unless_cancelled, source, target) for target, source in files[1:]]
+            try:
+                for future in as_completed(futures):
+                    if future.result():
+                        done += 1
+                        if progress_callback is not None and (done % step == 0 or done == len(files)):
+                            progress_callback(done)
+            except BaseException:
+                self.cancel()
+                raise
+        return done
+
+    def _place_unless_cancelled(self, source, target):
+        if self.cancelled:
+            return False
+        self._place_file(source, target)
+        return True
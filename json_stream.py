@@ -0,0 +1,134 @@
+"""
+Incremental reading of large JSON documents such as .pg2 projects.
+
+JsonStreamReader walks objects and arrays step by step and only decodes the
+values that are asked for, so a caller can turn every phrase into nodes as
+soon as it is read instead of holding the whole document as Python objects.
+"""
+
+import json
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+_number_chars = "0123456789.eE+-"
+
+
+class JsonStreamReader:
+    """
+    Pull parser over a text file.
+
+    iter_object() yields the keys of an object and iter_array() yields once per
+    element; in both cases the caller has to consume the value before asking
+    for the next one, with read_value(), skip_value() or a nested iteration.
+    """
+
+    def __init__(self, in_file, chunk_size=1 << 16):
+        self.in_file = in_file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.offset = 0
+        self.eof = False
+
+    def _read_more(self, size):
+        if self.position:
+            # Drop what has been consumed already so the buffer only holds the pending value.
+            self.offset += self.position
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        chunk = self.in_file.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def _peek(self):
+        """Skip whitespace and return the next character, "" at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _whitespace:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                return ""
+            self._read_more(self.chunk_size)
+
+    def _next_char(self):
+        char = self._peek()
+        self.position += 1
+        return char
+
+    def _expect(self, expected):
+        char = self._next_char()
+        if char != expected:
+            raise ValueError("Expected '{}' but found '{}' at offset {}".format(expected, char, self.tell()))
+
+    def tell(self):
+        """Character offset of the next value, usable with skip_to() on a fresh reader."""
+        self._peek()
+        return self.offset + self.position
+
+    def skip_to(self, offset):
+        """Discard everything before the given character offset."""
+        while self.offset + len(self.buffer) < offset and not self.eof:
+            self.offset += len(self.buffer)
+            self.buffer = ""
+            self.position = 0
+            self._read_more(max(self.chunk_size, offset - self.offset))
+        self.position = offset - self.offset
+
+    def read_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+                # A number cut off by the end of the buffer decodes as its first part,
+                # "12" of "12.5" or "1" of "1e5": it is only complete once something
+                # else follows it.
+                if self.eof or self.buffer[end:].lstrip(_number_chars):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow by at least the pending size so retries stay linear overall.
+            self._read_more(max(self.chunk_size, len(self.buffer) - self.position))
+
+    def skip_value(self):
+        """Consume the next value without decoding containers as a whole."""
+        char = self._peek()
+        if char == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        elif char == "[":
+            for _ in self.iter_array():
+                self.skip_value()
+        else:
+            self.read_value()
+
+    def iter_object(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self.position += 1
+            return
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            char = self._next_char()
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError("Expected ',' or '}}' but found '{}' at offset {}".format(char, self.tell()))
+
+    def iter_array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield
+            char = self._next_char()
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("Expected ',' or ']' but found '{}' at offset {}".format(char, self.tell()))
@@ -151,6 +151,9 @@ def parse_cli():
             elif args.output_type.upper() == "PG2":
                 if args.output_file:
                     i.save2(args.output_file)
+            elif args.output_type.upper() == "PGB":
+                if args.output_file:
+                    i.save_binary(args.output_file)
 
     return args
 
@@ -0,0 +1,117 @@
+"""
+Binary .pgb project files.
+
+Large projects spend most of their .pg2 save and load time formatting and
+parsing JSON for every phoneme. A .pgb file stores each voice as the columns
+of a TimelineStore instead, so saving and loading is mostly copying arrays:
+
+    header        magic b"PGBIN", format version, length of the metadata
+    metadata      UTF-8 JSON: sound path, fps, sound duration, phoneme set and
+                  per voice its name, text and sparse tags
+    string table  uint32 count, uint32 byte length of every string, UTF-8 data;
+                  the phrase, word and phoneme texts of all voices, interned
+    voices        per voice a uint32 node count followed by the start, end,
+                  text id and parent columns as int32 and the kind column as int8
+
+All numbers are little endian. The metadata holds everything a .pg2 file
+does apart from the values derived from the nodes, so converting between the
+two formats is lossless.
+"""
+
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from timeline_store import TimelineStore
+
+MAGIC = b"PGBIN"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<5sBI")
+COUNT = struct.Struct("<I")
+INT32_COLUMNS = ("start", "end", "text_id", "parent")
+
+
+def _build_string_table(stores):
+    """Intern the texts of all stores, returning the table and each store's text id remapping."""
+    texts = []
+    text_ids = {}
+    remaps = []
+    for store in stores:
+        remap = np.empty(len(store.texts), dtype=np.int32)
+        for local_id, text in enumerate(store.texts):
+            if text not in text_ids:
+                text_ids[text] = len(texts)
+                texts.append(text)
+            remap[local_id] = text_ids[text]
+        remaps.append(remap)
+    return texts, remaps
+
+
+def write_project(path, stores, sound_path="", fps=24, sound_duration=0, phoneme_set="preston_blair"):
+    """Write the voices given as TimelineStores to a .pgb file."""
+    metadata = {"sound_path": sound_path, "fps": fps, "sound_duration": sound_duration,
+                "phoneme_set": phoneme_set,
+                "voices": [{"name": store.name, "text": store.text,
+                            "tags": {str(index): tags for index, tags in store.tags.items()}}
+                           for store in stores]}
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    texts, remaps = _build_string_table(stores)
+    encoded_texts = [text.encode("utf-8") for text in texts]
+    chunks = [HEADER.pack(MAGIC, FORMAT_VERSION, len(metadata_bytes)), metadata_bytes,
+              COUNT.pack(len(encoded_texts)),
+              np.array([len(text) for text in encoded_texts], dtype="<u4").tobytes(),
+              b"".join(encoded_texts)]
+    for store, remap in zip(stores, remaps):
+        chunks.append(COUNT.pack(len(store)))
+        for column in INT32_COLUMNS:
+            values = getattr(store, column)
+            if column == "text_id":
+                values = remap[values]
+            chunks.append(values.astype("<i4").tobytes())
+        chunks.append(store.kind.astype("i1").tobytes())
+    with Path(path).open("wb") as out_file:
+        out_file.write(b"".join(chunks))
+
+
+def read_project(path):
+    """Read a .pgb file, returning its metadata dict and one TimelineStore per voice."""
+    data = Path(path).read_bytes()
+    if len(data) < HEADER.size:
+        raise ValueError("{} is not a Papagayo-NG binary project".format(path))
+    magic, version, metadata_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("{} is not a Papagayo-NG binary project".format(path))
+    if version != FORMAT_VERSION:
+        raise ValueError("{} uses binary project format {}, only {} is supported".format(
+            path, version, FORMAT_VERSION))
+    position = HEADER.size
+    metadata = json.loads(data[position:position + metadata_length].decode("utf-8"))
+    position += metadata_length
+
+    (text_count,) = COUNT.unpack_from(data, position)
+    position += COUNT.size
+    lengths = np.frombuffer(data, dtype="<u4", count=text_count, offset=position)
+    position += lengths.nbytes
+    ends = (np.cumsum(lengths, dtype=np.int64) + position).tolist()
+    texts = []
+    for end in ends:
+        texts.append(data[position:end].decode("utf-8"))
+        position = end
+
+    stores = []
+    for voice_data in metadata["voices"]:
+        (node_count,) = COUNT.unpack_from(data, position)
+        position += COUNT.size
+        columns = {}
+        for column in INT32_COLUMNS:
+            columns[column] = np.frombuffer(data, dtype="<i4", count=node_count, offset=position).copy()
+            position += node_count * 4
+        columns["kind"] = np.frombuffer(data, dtype="i1", count=node_count, offset=position).copy()
+        position += node_count
+        tags = {int(index): node_tags for index, node_tags in voice_data["tags"].items()}
+        stores.append(TimelineStore.from_arrays(texts=texts, tags=tags, name=voice_data["name"],
+                                                text=voice_data["text"], fps=metadata["fps"],
+                                                sound_duration=metadata["sound_duration"], **columns))
+    return metadata, stores
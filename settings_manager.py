@@ -47,6 +47,7 @@ class SettingsManager:
         # Graphics settings
         class Graphics:
             PREFIX = "/Graphics"
+            TIMELINE_ITEMS = f"{PREFIX}/timeline_items"
             
             @staticmethod
             def color_key(name):
@@ -55,6 +56,7 @@ class SettingsManager:
         # Behavior settings
         REST_AFTER_WORDS = "rest_after_words"
         REST_AFTER_PHONEMES = "rest_after_phonemes"
+        AUTOSAVE_INTERVAL = "autosave_interval"
 
         # Backend settings
         HF_TOKEN = "hf_token"
@@ -73,6 +75,8 @@ class SettingsManager:
         
         ini_path = Path(utilities.get_app_data_path()) / "settings.ini"
         self._settings = QtCore.QSettings(str(ini_path), QtCore.QSettings.Format.IniFormat)
+        # Incremented whenever a color may have changed, so styles built from them can be rebuilt.
+        self.colors_version = 0
         SettingsManager._instance = self
     
     def get(self, key, default_value=None):
@@ -247,6 +251,22 @@ class SettingsManager:
         """Set whether to rest after phonemes."""
         self.set(self.Keys.REST_AFTER_PHONEMES, rest)
     
+    def get_autosave_interval(self):
+        """Get the autosave interval in seconds, 0 disables autosaving."""
+        return self.get_int(self.Keys.AUTOSAVE_INTERVAL, 60)
+    
+    def set_autosave_interval(self, seconds):
+        """Set the autosave interval in seconds."""
+        self.set(self.Keys.AUTOSAVE_INTERVAL, seconds)
+    
+    def get_timeline_items(self):
+        """Get whether the timeline is painted as graphics items instead of button widgets."""
+        return self.get_bool(self.Keys.Graphics.TIMELINE_ITEMS, False)
+    
+    def set_timeline_items(self, enabled):
+        """Set whether the timeline is painted as graphics items instead of button widgets."""
+        self.set(self.Keys.Graphics.TIMELINE_ITEMS, enabled)
+    
     def get_color(self, name, default_color=None):
         """
         Get a color setting.
@@ -270,7 +290,10 @@ class SettingsManager:
             name: The color name.
             color: The color value to set.
         """
-        self.set(self.Keys.Graphics.color_key(name), color)
+        key = self.Keys.Graphics.color_key(name)
+        if self.get(key) != color:
+            self.set(key, color)
+            self.colors_version += 1
     
     def reset_colors(self):
         """Reset all color settings to their default values."""
@@ -280,6 +303,7 @@ class SettingsManager:
     def clear_settings(self):
         """Clear all settings."""
         self._settings.clear()
+        self.colors_version += 1
 
     def get_hf_token(self):
         """Get the HuggingFace read-only access token used by the backend."""
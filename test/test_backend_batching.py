@@ -0,0 +1,73 @@
+"""Tests for batched phoneme recognition in the backend (ComboRecognizer.predict_phoneme_ids_batch)."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend_server"))
+pytest.importorskip("onnxruntime")
+pytest.importorskip("soxr")
+recognizer = pytest.importorskip("phonemation_backend.recognizer")
+
+ComboRecognizer = recognizer.ComboRecognizer
+TOKENS = 6
+
+
+class _Input:
+    def __init__(self, name, shape):
+        self.name = name
+        self.shape = shape
+
+
+class GlobalContextModel:
+    """Stand-in wav2vec2: every frame's logits depend on the mean of the whole input, like attention.
+
+    With an attention_mask only the unmasked samples count, without one the
+    padding changes every frame of the shorter clips.
+    """
+
+    def __init__(self, with_mask):
+        self.with_mask = with_mask
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        inputs = [_Input("input_values", ["batch", "sequence"])]
+        if self.with_mask:
+            inputs.append(_Input("attention_mask", ["batch", "sequence"]))
+        return inputs
+
+    def run(self, _, inputs):
+        values = inputs["input_values"]
+        mask = inputs.get("attention_mask", np.ones_like(values, dtype=np.int64))
+        self.batch_sizes.append(len(values))
+        frames = (values.shape[1] - ComboRecognizer.FRAME_SIZE) // ComboRecognizer.FRAME_STRIDE + 1
+        context = (values * mask).sum(axis=1) / mask.sum(axis=1)
+        local = values[:, ::ComboRecognizer.FRAME_STRIDE][:, :frames]
+        ids = np.floor((local + context[:, None]) * 3).astype(int) % TOKENS
+        return [np.eye(TOKENS, dtype=np.float32)[ids]]
+
+
+def _recognizer(model):
+    rec = object.__new__(ComboRecognizer)
+    rec.phoneme_model = model
+    rec.window_seconds = 30.0
+    rec.window_overlap_seconds = 1.0
+    return rec
+
+
+@pytest.mark.parametrize("with_mask", [True, False])
+def test_batched_ids_match_single_runs(with_mask):
+    rng = np.random.default_rng(1)
+    clips = [rng.random(length).astype(np.float32) + 0.5 * index
+             for index, length in enumerate([16000, 24000, 16000, 40000, 24000])]
+    rec = _recognizer(GlobalContextModel(with_mask))
+    single = [rec.predict_phoneme_ids(clip) for clip in clips]
+    rec.phoneme_model.batch_sizes.clear()
+    assert rec.predict_phoneme_ids_batch(clips) == single
+    if with_mask:
+        assert rec.phoneme_model.batch_sizes == [5]
+    else:
+        # Only the clips of equal length share a run.
+        assert sorted(rec.phoneme_model.batch_sizes) == [1, 2, 2]
@@ -0,0 +1,36 @@
+"""Tests for JsonStreamReader with values split across chunks."""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from json_stream import JsonStreamReader
+
+DOCUMENT = {"a": 12.5, "b": 1e5, "c": -0.25e-3, "d": [100, 2.75E+2, -7], "e": "x", "f": True, "g": None}
+
+
+def _read(reader):
+    values = {}
+    for key in reader.iter_object():
+        if key == "d":
+            values[key] = [reader.read_value() for _ in reader.iter_array()]
+        else:
+            values[key] = reader.read_value()
+    return values
+
+
+@pytest.mark.parametrize("chunk_size", range(1, len(json.dumps(DOCUMENT)) + 2))
+def test_numbers_split_at_every_chunk_size(chunk_size):
+    text = json.dumps(DOCUMENT)
+    assert _read(JsonStreamReader(io.StringIO(text), chunk_size=chunk_size)) == DOCUMENT
+    compact = json.dumps(DOCUMENT, separators=(",", ":"))
+    assert _read(JsonStreamReader(io.StringIO(compact), chunk_size=chunk_size)) == DOCUMENT
+
+
+def test_number_at_end_of_file():
+    assert JsonStreamReader(io.StringIO("12.5"), chunk_size=3).read_value() == 12.5
@@ -0,0 +1,97 @@
+"""Tests for reading the phrases of voices on demand (LipsyncDoc.open_json(lazy_voices=True))."""
+
+import json
+import os
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    from LipsyncDoc import LipsyncDoc
+except (ImportError, OSError) as e:  # e.g. no PortAudio for sounddevice
+    pytest.skip("LipsyncDoc can't be imported: {}".format(e), allow_module_level=True)
+
+
+def _phrase(text, start):
+    return {"text": text, "start_frame": start, "end_frame": start + 4, "tags": [],
+            "words": [{"text": text, "start_frame": start, "end_frame": start + 4, "tags": [],
+                       "phonemes": [{"text": "AA", "frame": start, "tags": []}]}]}
+
+
+@pytest.fixture
+def project(tmp_path):
+    path = tmp_path / "lazy.pg2"
+    voices = [{"name": "Voice {}".format(i), "text": "", "num_children": 2,
+               "phrases": [_phrase("one", 0), _phrase("two", 10)]} for i in range(1, 3)]
+    path.write_text(json.dumps({"version": 2, "sound_path": "missing.wav", "fps": 24, "sound_duration": 48,
+                                "num_voices": 2, "phoneme_set": "preston_blair", "voices": voices}))
+    return path
+
+
+@pytest.fixture
+def doc():
+    parent = types.SimpleNamespace(phonemeset=types.SimpleNamespace(selected_set=None))
+    return LipsyncDoc(None, parent)
+
+
+def test_load_voice_reads_deferred_phrases(doc, project):
+    doc.open_json(str(project), lazy_voices=True)
+    second = doc.voices[1]
+    assert len(second.children) == 0
+    doc.load_voice(second)
+    assert [phrase.text for phrase in second.children] == ["one", "two"]
+    doc.load_voice(second)
+    assert len(second.children) == 2
+
+
+def test_load_voice_keeps_voice_pending_when_file_changed(doc, project):
+    doc.open_json(str(project), lazy_voices=True)
+    second = doc.voices[1]
+    stat = os.stat(project)
+    os.utime(project, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    with pytest.raises(RuntimeError):
+        doc.load_voice(second)
+    # Still pending: loading it (e.g. before a save) keeps failing instead of treating it as empty.
+    assert len(second.children) == 0
+    with pytest.raises(RuntimeError):
+        doc.load_all_voices()
+
+
+def test_current_voice_reads_deferred_phrases(doc, project):
+    doc.open_json(str(project), lazy_voices=True)
+    second = doc.voices[1]
+    doc.current_voice = second
+    assert [phrase.text for phrase in second.children] == ["one", "two"]
+    assert not doc.dirty
+
+
+def test_settings_after_voices_apply_to_voices(doc, tmp_path):
+    path = tmp_path / "reordered.pg2"
+    voices = [{"name": "Voice 1", "text": "", "num_children": 1, "phrases": [_phrase("one", 0)]}]
+    path.write_text(json.dumps({"version": 2, "voices": voices, "sound_path": "missing.wav", "fps": 30,
+                                "sound_duration": 90, "phoneme_set": "preston_blair"}))
+    doc.open_json(str(path))
+    assert doc.fps == 30
+    nodes = [doc.voices[0]] + list(doc.voices[0].descendants)
+    assert {node.fps for node in nodes} == {30}
+    assert {node.sound_duration for node in nodes} == {90}
+
+
+def test_autosave_snapshot_keeps_voices_pending(doc, project, tmp_path, monkeypatch):
+    monkeypatch.setattr(doc, "get_autosave_path", lambda: str(tmp_path / "lazy.pg2.autosave"))
+    doc.open_json(str(project), lazy_voices=True)
+    second = doc.voices[1]
+    second.name = "Renamed"
+    assert doc.autosave()
+    # The snapshot copies the phrases from the file instead of building the voice.
+    assert len(second.children) == 0
+    recovered = json.loads((tmp_path / "lazy.pg2.autosave").read_text())["snapshot"]["voices"][1]
+    assert recovered["name"] == "Renamed"
+    assert [phrase["text"] for phrase in recovered["phrases"]] == ["one", "two"]
+    assert recovered["num_children"] == 6
+    assert recovered["used_phonemes"] == ["AA"]
@@ -0,0 +1,81 @@
+"""Tests for undoing and redoing structural edits with the UndoJournal."""
+
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    from LipsyncObject import LipSyncObject
+except (ImportError, OSError) as e:  # e.g. no PortAudio for sounddevice
+    pytest.skip("LipsyncObject can't be imported: {}".format(e), allow_module_level=True)
+from undo_journal import UndoJournal
+
+
+def _project(num_voices, num_phrases):
+    project = LipSyncObject(object_type="project")
+    for v in range(num_voices):
+        voice = LipSyncObject(parent=project, object_type="voice", name="Voice {}".format(v))
+        for p in range(num_phrases):
+            LipSyncObject(parent=voice, object_type="phrase", text="{}.{}".format(v, p),
+                          start_frame=p * 10, end_frame=p * 10 + 5)
+    project.undo_journal = UndoJournal()
+    return project
+
+
+def _shape(project):
+    return [(voice.name, [(phrase.text, phrase.start_frame) for phrase in voice.children])
+            for voice in project.children]
+
+
+def test_undo_and_redo_random_edits():
+    project = _project(3, 8)
+    rng = random.Random(4)
+    journal = project.undo_journal
+    shapes = [_shape(project)]
+    for _ in range(30):
+        voices = project.children
+        phrases = [phrase for voice in voices for phrase in voice.children]
+        action = rng.randrange(4)
+        if action == 0 and phrases:
+            rng.choice(phrases).parent = None
+        elif action == 1 and phrases:
+            rng.choice(phrases).parent = rng.choice(voices)
+        elif action == 2:
+            voice = rng.choice(voices)
+            kept = list(voice.children)
+            rng.shuffle(kept)
+            voice.children = kept[:rng.randrange(len(kept) + 1)]
+        elif phrases:
+            rng.choice(phrases).start_frame = rng.randrange(100)
+        groups = len(journal.undo_stack)
+        journal.checkpoint()
+        if len(journal.undo_stack) > groups:  # Edits that changed nothing aren't recorded.
+            shapes.append(_shape(project))
+
+    for shape in reversed(shapes[:-1]):
+        assert journal.undo()
+        assert _shape(project) == shape
+    for shape in shapes[1:]:
+        assert journal.redo()
+        assert _shape(project) == shape
+
+
+def test_rollback_of_cleared_voice_is_not_quadratic():
+    project = _project(1, 1000)
+    voice = project.children[0]
+    before = _shape(project)
+    journal = project.undo_journal
+    journal.begin()
+    voice.children = []
+    started = time.perf_counter()
+    journal.rollback()
+    # Restoring every phrase on its own took over half a minute.
+    assert time.perf_counter() - started < 5
+    assert _shape(project) == before
@@ -0,0 +1,54 @@
+"""Tests for the ffmpeg command line and the raw frames of video_export."""
+
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+video_export = pytest.importorskip("video_export")
+
+
+def _output_args(command):
+    """The arguments of command after the rawvideo input from stdin."""
+    return command[command.index("-") + 1:]
+
+
+def test_video_path_gets_yuv420p_and_sound():
+    command = video_export.ffmpeg_command("ffmpeg", "out/mouths.mp4", 24, 64, 48, "voice.wav")
+    assert command[:2] == ["ffmpeg", "-y"]
+    assert command[command.index("-s") + 1] == "64x48"
+    assert command[command.index("-r") + 1] == "24"
+    assert _output_args(command) == ["-i", "voice.wav", "-map", "0:v", "-map", "1:a", "-shortest",
+                                     "-pix_fmt", "yuv420p", "out/mouths.mp4"]
+
+
+def test_image_path_gets_frame_number_pattern():
+    command = video_export.ffmpeg_command("ffmpeg", os.path.join("out", "mouths.png"), 24, 64, 48, "voice.wav")
+    # No sound and no yuv420p for images, one numbered file per frame.
+    assert _output_args(command) == [os.path.join("out", "mouths_%06d.png")]
+
+
+def test_image_path_with_pattern_is_kept():
+    command = video_export.ffmpeg_command("ffmpeg", "out/frame%04d.PNG", 24, 64, 48)
+    assert _output_args(command) == ["out/frame%04d.PNG"]
+
+
+def test_pattern_only_looked_for_in_file_name():
+    assert video_export.image_sequence_path("out%1/mouths.png") == "out%1/mouths_%06d.png"
+
+
+def test_raw_path_written_without_ffmpeg(tmp_path):
+    voice = SimpleNamespace(get_phoneme_at_frame=lambda frame: "AI" if frame % 2 else "rest")
+    exporter = video_export.VideoExporter(ffmpeg_path=str(tmp_path / "missing-ffmpeg"), max_workers=1)
+    output_path = str(tmp_path / "mouths.rgb")
+
+    written = exporter.export(voice, {}, output_path, 24, 5, size=(4, 2))
+
+    assert written == 5
+    # No mouth images: every frame is the blank frame.
+    assert Path(output_path).read_bytes() == bytes(4 * 2 * 3 * 5)
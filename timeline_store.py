@@ -0,0 +1,396 @@
+"""
+Columnar storage for the phrases, words and phonemes of a voice.
+
+A LipSyncObject tree carries a full anytree node per phoneme. For very long
+voices TimelineStore keeps the same data in NumPy arrays instead, in pre-order
+so the descendants of a node are always the contiguous slice after it:
+
+    kind         0 = phrase, 1 = word, 2 = phoneme
+    start/end    start_frame/end_frame
+    text_id      index into the interned texts list
+    parent       index of the parent node, -1 for phrases
+    subtree_end  index one past the last descendant
+
+TimelineNode is a thin view on one row that offers the read side and the
+geometry helpers of the LipSyncObject API, so code written against a
+LipSyncObject voice can walk a store the same way.
+"""
+
+import numpy as np
+
+
+KIND_NAMES = ("phrase", "word", "phoneme")
+KIND_IDS = {name: kind_id for kind_id, name in enumerate(KIND_NAMES)}
+PHRASE, WORD, PHONEME = range(3)
+
+
+class TimelineStore:
+    def __init__(self, name="", text="", fps=24, sound_duration=0):
+        self.name = name
+        self.text = text
+        self.fps = fps
+        self.sound_duration = sound_duration
+        self.texts = []
+        self._text_ids = {}
+        self.tags = {}
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.start = np.zeros(0, dtype=np.int32)
+        self.end = np.zeros(0, dtype=np.int32)
+        self.text_id = np.zeros(0, dtype=np.int32)
+        self.parent = np.zeros(0, dtype=np.int32)
+        self.subtree_end = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def intern(self, text):
+        try:
+            return self._text_ids[text]
+        except KeyError:
+            self._text_ids[text] = len(self.texts)
+            self.texts.append(text)
+            return self._text_ids[text]
+
+    def _set_columns(self, rows, tags):
+        """Fill the arrays from (kind, start, end, text, parent) rows given in pre-order."""
+        count = len(rows)
+        self.kind = np.fromiter((row[0] for row in rows), dtype=np.int8, count=count)
+        self.start = np.fromiter((row[1] for row in rows), dtype=np.int32, count=count)
+        self.end = np.fromiter((row[2] for row in rows), dtype=np.int32, count=count)
+        self.text_id = np.fromiter((self.intern(row[3]) for row in rows), dtype=np.int32, count=count)
+        self.parent = np.fromiter((row[4] for row in rows), dtype=np.int32, count=count)
+        self.tags = tags
+        self._update_subtree_ends()
+
+    def _update_subtree_ends(self):
+        # In pre-order a subtree ends where the next node of the same or a higher level starts.
+        count = len(self.kind)
+        self.subtree_end = np.empty(count, dtype=np.int32)
+        for level in (PHRASE, WORD, PHONEME):
+            boundaries = np.append(np.flatnonzero(self.kind <= level), count)
+            members = np.flatnonzero(self.kind == level)
+            self.subtree_end[members] = boundaries[np.searchsorted(boundaries, members, side="right")]
+
+    @classmethod
+    def from_arrays(cls, kind, start, end, text_id, parent, texts, tags=None, **voice_data):
+        """Build a store from columns read back from disk, see project_binary."""
+        store = cls(**voice_data)
+        store.kind = np.asarray(kind, dtype=np.int8)
+        store.start = np.asarray(start, dtype=np.int32)
+        store.end = np.asarray(end, dtype=np.int32)
+        store.text_id = np.asarray(text_id, dtype=np.int32)
+        store.parent = np.asarray(parent, dtype=np.int32)
+        for text in texts:
+            store.intern(text)
+        store.tags = tags or {}
+        store._update_subtree_ends()
+        return store
+
+    @classmethod
+    def from_voice(cls, voice):
+        """Build a store from a LipSyncObject voice."""
+        store = cls(name=voice.name, text=voice.text, fps=voice.fps, sound_duration=voice.sound_duration)
+        rows = []
+        tags = {}
+
+        def add_subtree(node, parent_index):
+            index = len(rows)
+            if node.tags:
+                tags[index] = list(node.tags)
+            rows.append((KIND_IDS[node.object_type], node.start_frame, node.end_frame, node.text, parent_index))
+            for child in node.children:
+                add_subtree(child, index)
+
+        for phrase in voice.children:
+            add_subtree(phrase, -1)
+        store._set_columns(rows, tags)
+        return store
+
+    @classmethod
+    def from_voice_dict(cls, voice_dict, fps=24, sound_duration=0):
+        """Build a store from one voice entry of a .pg2 project."""
+        store = cls(name=voice_dict["name"], text=voice_dict["text"], fps=fps, sound_duration=sound_duration)
+        rows = []
+        tags = {}
+        for phrase in voice_dict["phrases"]:
+            phrase_index = len(rows)
+            if phrase["tags"]:
+                tags[phrase_index] = list(phrase["tags"])
+            rows.append((PHRASE, phrase["start_frame"], phrase["end_frame"], phrase["text"], -1))
+            for word in phrase["words"]:
+                word_index = len(rows)
+                if word["tags"]:
+                    tags[word_index] = list(word["tags"])
+                rows.append((WORD, word["start_frame"], word["end_frame"], word["text"], phrase_index))
+                for phoneme in word["phonemes"]:
+                    if phoneme["tags"]:
+                        tags[len(rows)] = list(phoneme["tags"])
+                    rows.append((PHONEME, phoneme["frame"], phoneme["frame"], phoneme["text"], word_index))
+        store._set_columns(rows, tags)
+        return store
+
+    def to_voice_dict(self):
+        """Return the voice in the layout LipsyncDoc.copy_to_dict writes to .pg2 files."""
+        starts = self.start.tolist()
+        ends = self.end.tolist()
+        text_ids = self.text_id.tolist()
+        list_of_phrases = []
+        list_of_used_phonemes = []
+        phrase_words = word_phonemes = None
+        for index, kind in enumerate(self.kind.tolist()):
+            text = self.texts[text_ids[index]]
+            node_tags = self.tags.get(index, [])
+            if kind == PHRASE:
+                phrase_words = []
+                list_of_phrases.append({"id": len(list_of_phrases), "text": text, "start_frame": starts[index],
+                                        "end_frame": ends[index], "tags": node_tags, "words": phrase_words})
+            elif kind == WORD:
+                word_phonemes = []
+                phrase_words.append({"id": len(phrase_words), "text": text, "start_frame": starts[index],
+                                     "end_frame": ends[index], "tags": node_tags, "phonemes": word_phonemes})
+            else:
+                word_phonemes.append({"id": len(word_phonemes), "text": text, "frame": starts[index],
+                                      "tags": node_tags})
+                if text not in list_of_used_phonemes:
+                    list_of_used_phonemes.append(text)
+        start_frame, end_frame = 0, 1
+        phrases = self.indices_of_kind(PHRASE)
+        if len(phrases):
+            start_frame = int(self.start[phrases[0]])
+            end_frame = int(self.end[phrases[-1]])
+        return {"name": self.name, "start_frame": start_frame, "end_frame": end_frame, "text": self.text,
+                "num_children": len(self), "phrases": list_of_phrases, "used_phonemes": list_of_used_phonemes}
+
+    def to_voice(self, parent=None):
+        """Materialise the store as a LipSyncObject voice."""
+        from LipsyncObject import LipSyncObject
+        voice = LipSyncObject(name=self.name, text=self.text, num_children=len(self), fps=self.fps,
+                              object_type="voice", sound_duration=self.sound_duration)
+        nodes = []
+        text_ids = self.text_id.tolist()
+        for index, (kind, start, end, parent_index) in enumerate(zip(self.kind.tolist(), self.start.tolist(),
+                                                                      self.end.tolist(), self.parent.tolist())):
+            nodes.append(LipSyncObject(text=self.texts[text_ids[index]], start_frame=start, end_frame=end,
+                                       tags=list(self.tags.get(index, [])), fps=self.fps,
+                                       object_type=KIND_NAMES[kind],
+                                       parent=None if parent_index < 0 else nodes[parent_index],
+                                       sound_duration=self.sound_duration))
+        # anytree walks up to the root on every attach to rule out loops,
+        # so the phrases and the voice are only attached once their subtrees are complete.
+        for index in self.indices_of_kind(PHRASE).tolist():
+            nodes[index].parent = voice
+        voice.parent = parent
+        return voice
+
+    # Vectorised queries
+
+    def indices_of_kind(self, kind):
+        return np.flatnonzero(self.kind == kind)
+
+    def min_sizes(self):
+        """get_min_size() for every node at once: the number of phonemes in its subtree."""
+        phoneme_count = np.concatenate(([0], np.cumsum(self.kind == PHONEME)))
+        sizes = phoneme_count[self.subtree_end] - phoneme_count[np.arange(len(self)) + 1]
+        sizes[self.kind == PHONEME] = 1
+        return sizes
+
+    def frame_sizes(self):
+        """get_frame_size() for every node at once."""
+        sizes = self.end - self.start
+        sizes[self.kind == PHONEME] = 1
+        return sizes
+
+    def leaves(self):
+        return np.flatnonzero(self.subtree_end == np.arange(len(self)) + 1)
+
+    def children_of(self, index):
+        """Indices of the children of node index, -1 for the voice itself."""
+        if index < 0:
+            return self.indices_of_kind(PHRASE)
+        sub_parents = self.parent[index + 1:self.subtree_end[index]]
+        return np.flatnonzero(sub_parents == index) + index + 1
+
+    def node(self, index):
+        return TimelineNode(self, index)
+
+    @property
+    def children(self):
+        return [TimelineNode(self, int(index)) for index in self.indices_of_kind(PHRASE)]
+
+    @property
+    def descendants(self):
+        return tuple(TimelineNode(self, index) for index in range(len(self)))
+
+    def export(self, path, rest_after_words=False):
+        """Write a MOHO switch file, the same output as LipSyncObject.export."""
+        lines = ["MohoSwitch1"]
+        phrases = self.indices_of_kind(PHRASE)
+        if len(phrases):
+            end_frame = int(self.end[phrases[-1]])
+            if self.start[phrases[0]] != 0:
+                lines.append("{:d} {}".format(1, "rest"))
+        else:
+            end_frame = 1
+        leaves = self.leaves()
+        if len(leaves):
+            starts = self.start[leaves]
+            text_ids = self.text_id[leaves]
+            previous = np.concatenate(([0], np.arange(len(leaves) - 1)))
+            rest_id = self._text_ids.get("rest", -1)
+            # A "rest" after a different phoneme gets an extra key at its own frame.
+            extra_rest = (text_ids != text_ids[previous]) & (text_ids == rest_id)
+            if rest_after_words:
+                parents = self.parent[leaves]
+                gap_rest = (parents != parents[previous]) & (starts[previous] + 1 < starts)
+            else:
+                gap_rest = np.zeros(len(leaves), dtype=bool)
+            start_list = starts.tolist()
+            previous_start = starts[previous].tolist()
+            for position, text_id in enumerate(text_ids.tolist()):
+                text = self.texts[text_id]
+                if extra_rest[position]:
+                    lines.append("{:d} {}".format(start_list[position], text))
+                if gap_rest[position]:
+                    lines.append("{:d} {}".format(previous_start[position] + 2, "rest"))
+                lines.append("{:d} {}".format(start_list[position] + 1, text))
+        lines.append("{:d} {}".format(end_frame + 2, "rest"))
+        with open(path, "w") as out_file:
+            out_file.write("\n".join(lines) + "\n")
+
+
+class TimelineNode:
+    """A view on one node of a TimelineStore that behaves like a LipSyncObject."""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, TimelineNode) and other.store is self.store and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+    def __repr__(self):
+        return "TimelineNode:{}|{}|start_frame:{}|end_frame:{}".format(self.object_type.capitalize(), self.text,
+                                                                        self.start_frame, self.end_frame)
+
+    @property
+    def object_type(self):
+        return KIND_NAMES[self.store.kind[self.index]]
+
+    @property
+    def text(self):
+        return self.store.texts[self.store.text_id[self.index]]
+
+    @text.setter
+    def text(self, value):
+        self.store.text_id[self.index] = self.store.intern(value)
+
+    @property
+    def start_frame(self):
+        return int(self.store.start[self.index])
+
+    @start_frame.setter
+    def start_frame(self, value):
+        self.store.start[self.index] = value
+        if self.store.kind[self.index] == PHONEME:
+            self.store.end[self.index] = value
+
+    @property
+    def end_frame(self):
+        return int(self.store.end[self.index])
+
+    @end_frame.setter
+    def end_frame(self, value):
+        self.store.end[self.index] = value
+
+    @property
+    def tags(self):
+        return self.store.tags.setdefault(self.index, [])
+
+    @tags.setter
+    def tags(self, value):
+        self.store.tags[self.index] = list(value)
+
+    @property
+    def parent(self):
+        parent_index = int(self.store.parent[self.index])
+        if parent_index < 0:
+            return self.store
+        return TimelineNode(self.store, parent_index)
+
+    @property
+    def children(self):
+        return tuple(TimelineNode(self.store, int(index)) for index in self.store.children_of(self.index))
+
+    @property
+    def descendants(self):
+        return tuple(TimelineNode(self.store, index)
+                     for index in range(self.index + 1, int(self.store.subtree_end[self.index])))
+
+    @property
+    def leaves(self):
+        leaves = self.store.leaves()
+        leaves = leaves[(leaves >= self.index) & (leaves < self.store.subtree_end[self.index])]
+        return tuple(TimelineNode(self.store, int(index)) for index in leaves)
+
+    def _siblings(self):
+        return self.store.children_of(int(self.store.parent[self.index]))
+
+    def get_left_sibling(self):
+        siblings = self._siblings()
+        position = int(np.searchsorted(siblings, self.index))
+        return TimelineNode(self.store, int(siblings[position - 1])) if position > 0 else None
+
+    def get_right_sibling(self):
+        siblings = self._siblings()
+        position = int(np.searchsorted(siblings, self.index))
+        return TimelineNode(self.store, int(siblings[position + 1])) if position + 1 < len(siblings) else None
+
+    def has_left_sibling(self):
+        return self.get_left_sibling() is not None
+
+    def has_right_sibling(self):
+        return self.get_right_sibling() is not None
+
+    def get_parent(self):
+        if self.object_type != "phrase":
+            return self.parent
+        return None
+
+    def get_min_size(self):
+        if self.store.kind[self.index] == PHONEME:
+            return 1
+        descendants = self.store.kind[self.index + 1:self.store.subtree_end[self.index]]
+        return int(np.count_nonzero(descendants == PHONEME))
+
+    def get_frame_size(self):
+        if self.store.kind[self.index] == PHONEME:
+            return 1
+        return self.end_frame - self.start_frame
+
+    def has_shrink_room(self):
+        if self.store.kind[self.index] == PHONEME:
+            return False
+        return self.get_min_size() < self.get_frame_size()
+
+    def get_left_max(self):
+        left_sibling = self.get_left_sibling()
+        if left_sibling is None:
+            parent = self.parent
+            return 0 if parent is self.store else parent.start_frame
+        if left_sibling.object_type == "phoneme":
+            return left_sibling.end_frame + 1
+        return left_sibling.end_frame
+
+    def get_right_max(self):
+        right_sibling = self.get_right_sibling()
+        if right_sibling is not None:
+            return right_sibling.start_frame
+        parent = self.parent
+        if parent is self.store:
+            return self.store.sound_duration
+        return parent.end_frame
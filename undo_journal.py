@@ -0,0 +1,180 @@
+"""
+Undo/redo journal for the LipSyncObject tree of a document.
+
+Once a journal is set as undo_journal on the project node, the LipSyncObject
+change hooks report every edit below it as one of these operations:
+
+    ["attach", node, parent, index]   node was attached as parent's child at index
+    ["detach", node, parent, index]   node was removed from parent, where it was at index
+    ["set", node, attribute, old, new]
+
+Operations are collected in groups. An explicit group runs from begin() to
+commit() or rollback(); edits made outside of one, like dragging a button,
+are collected until the next checkpoint(). Undoing a group replays its
+operations backwards on the same node objects, so nothing has to be copied
+or reloaded.
+"""
+
+from contextlib import contextmanager
+
+
+def _index_of(children, node, index):
+    if index < len(children) and children[index] is node:
+        return index
+    return next(position for position, child in enumerate(children) if child is node)
+
+
+def _replay(steps):
+    """
+    Apply ("attach" | "detach", node, parent, index) steps and attribute changes in order.
+
+    The children lists are rearranged on copies and every parent gets its new
+    list in one assignment afterwards. Attaching at an index through anytree
+    means detaching and reattaching all later siblings, once per node that
+    way, which made undoing the removal of many phrases quadratic.
+    """
+    children = {}
+    for step in steps:
+        kind, node = step[0], step[1]
+        if kind == "set":
+            setattr(node, step[2], step[3])
+            continue
+        parent, index = step[2], step[3]
+        entry = children.get(id(parent))
+        if entry is None:
+            entry = children[id(parent)] = (parent, list(parent.children))
+        if kind == "attach":
+            entry[1].insert(index, node)
+        else:
+            del entry[1][_index_of(entry[1], node, index)]
+    for parent, new_children in children.values():
+        old_children = parent.children
+        if len(old_children) != len(new_children) or any(
+                old is not new for old, new in zip(old_children, new_children)):
+            parent.children = new_children
+
+
+class UndoJournal:
+    def __init__(self, max_groups=100):
+        self.max_groups = max_groups
+        self.undo_stack = []
+        self.redo_stack = []
+        self._current = None
+        self._set_operations = {}
+        self._depth = 0
+        self._paused = 0
+
+    @property
+    def recording(self):
+        return not self._paused
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_stack or self._current)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    @contextmanager
+    def paused(self):
+        """Don't record anything in this block, e.g. while nodes are loaded from a file."""
+        self._paused += 1
+        try:
+            yield
+        finally:
+            self._paused -= 1
+
+    def _add(self, operation):
+        if self._current is None:
+            self._current = []
+            self._set_operations = {}
+        self._current.append(operation)
+
+    def record_attach(self, node, parent):
+        if self.recording:
+            self._add(["attach", node, parent, len(parent.children) - 1])
+
+    def record_detach(self, node, parent, index):
+        if self.recording:
+            self._add(["detach", node, parent, index])
+
+    def record_set(self, node, attribute, old_value, new_value):
+        if not self.recording:
+            return
+        # Attribute values don't depend on the tree structure, so repeated changes of
+        # the same attribute within a group can be folded into the first one.
+        key = (id(node), attribute)
+        operation = self._set_operations.get(key) if self._current is not None else None
+        if operation is not None:
+            operation[4] = new_value
+        else:
+            operation = ["set", node, attribute, old_value, new_value]
+            self._add(operation)
+            self._set_operations[key] = operation
+
+    def _close_group(self):
+        if self._current:
+            self.undo_stack.append(self._current)
+            del self.undo_stack[:-self.max_groups]
+            self.redo_stack = []
+        self._current = None
+        self._set_operations = {}
+
+    def checkpoint(self):
+        """Close the group of edits made outside of begin()/commit() so it can be undone on its own."""
+        if self._depth == 0:
+            self._close_group()
+
+    def begin(self):
+        if self._depth == 0:
+            self._close_group()
+        self._depth += 1
+
+    def commit(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._close_group()
+
+    def rollback(self):
+        """Revert everything recorded since the outermost begin() and end the group."""
+        operations = self._current or []
+        self._current = None
+        self._set_operations = {}
+        self._depth = 0
+        self._revert(operations)
+
+    def undo(self):
+        if self._depth:
+            raise RuntimeError("Can't undo while a group is open")
+        self._close_group()
+        if not self.undo_stack:
+            return False
+        operations = self.undo_stack.pop()
+        self._revert(operations)
+        self.redo_stack.append(operations)
+        return True
+
+    def redo(self):
+        if self._depth:
+            raise RuntimeError("Can't redo while a group is open")
+        if not self.redo_stack:
+            return False
+        operations = self.redo_stack.pop()
+        with self.paused():
+            _replay([operation if operation[0] != "set" else
+                     ["set", operation[1], operation[2], operation[4]] for operation in operations])
+        self.undo_stack.append(operations)
+        return True
+
+    def _revert(self, operations):
+        undo = {"attach": "detach", "detach": "attach", "set": "set"}
+        with self.paused():
+            _replay([[undo[operation[0]]] + operation[1:4] for operation in reversed(operations)])
+
+    def clear(self):
+        self.undo_stack = []
+        self.redo_stack = []
+        self._current = None
+        self._set_operations = {}
+        self._depth = 0
@@ -0,0 +1,177 @@
+"""
+Renders the mouths of a voice into a video or an image sequence, frame by frame.
+
+Every output frame shows the mouth of the phoneme the voice plays on that
+frame (LipSyncObject.get_phoneme_at_frame), centred on a background of the
+output size. The mouth images are decoded and scaled once per phoneme, in
+parallel, and every frame after that is just the raw RGB data of its
+phoneme. The frames are written to the stdin of an ffmpeg process, so no
+intermediate files are written.
+
+ffmpeg picks the format from the output path: "mouths.mp4" writes a video,
+"mouths_%06d.png" an image sequence. An image path without a frame number
+pattern, like "mouths.png", gets one ("mouths_%06d.png"), ffmpeg would
+stop after the first frame otherwise. Paths ending in .rgb get the raw
+rgb24 frames directly, without ffmpeg.
+"""
+
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6 import QtCore, QtGui
+
+import utilities
+
+logger = logging.getLogger("video_export")
+
+RAW_SUFFIX = ".rgb"
+# Containers whose usual codecs need yuv420p and even frame sizes to play everywhere.
+VIDEO_SUFFIXES = (".mp4", ".mov", ".mkv", ".webm", ".avi")
+# Formats ffmpeg writes one file per frame for, the output path needs a frame number pattern.
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def find_ffmpeg():
+    """The ffmpeg on the PATH or the one downloaded into the app data dir, None if there is none."""
+    ffmpeg_path = utilities.which("ffmpeg")
+    if ffmpeg_path is None:
+        downloaded = utilities.get_app_data_path() / ("ffmpeg.exe" if platform.system() == "Windows" else "ffmpeg")
+        if downloaded.exists():
+            ffmpeg_path = str(downloaded)
+    return ffmpeg_path
+
+
+def mouth_size(mouth_files):
+    """The size of the largest mouth image, rounded up to even numbers for the video codecs."""
+    width = height = 0
+    for path in mouth_files.values():
+        size = QtGui.QImageReader(str(path)).size()
+        width = max(width, size.width())
+        height = max(height, size.height())
+    return width + width % 2 or 2, height + height % 2 or 2
+
+
+def _render_mouth(path, width, height, background):
+    """The rgb24 data of one mouth image scaled into a frame of width x height."""
+    frame = QtGui.QImage(width, height, QtGui.QImage.Format.Format_RGB888)
+    frame.fill(background)
+    image = QtGui.QImage(str(path))
+    if not image.isNull():
+        image = image.scaled(width, height, QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+                             QtCore.Qt.TransformationMode.SmoothTransformation)
+        painter = QtGui.QPainter(frame)
+        painter.drawImage((width - image.width()) // 2, (height - image.height()) // 2, image)
+        painter.end()
+    # Rows of a QImage are padded to 4 bytes, rawvideo expects them packed.
+    row_bytes = width * 3
+    data = frame.constBits().tobytes()
+    if frame.bytesPerLine() == row_bytes:
+        return data
+    return b"".join(data[row * frame.bytesPerLine():row * frame.bytesPerLine() + row_bytes]
+                    for row in range(height))
+
+
+def render_mouths(mouth_files, width, height, background=QtCore.Qt.GlobalColor.white, max_workers=None):
+    """The rgb24 frame of every mouth image by phoneme, rendered in parallel."""
+    phonemes = list(mouth_files)
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        frames = executor.map(lambda phoneme: _render_mouth(mouth_files[phoneme], width, height, background),
+                              phonemes)
+        return dict(zip(phonemes, frames))
+
+
+def image_sequence_path(output_path):
+    """output_path with a frame number pattern before its suffix, unless it has one already."""
+    if "%" in os.path.basename(output_path):
+        return output_path
+    root, suffix = os.path.splitext(output_path)
+    return "{}_%06d{}".format(root, suffix)
+
+
+def ffmpeg_command(ffmpeg_path, output_path, fps, width, height, sound_path=None):
+    command = [ffmpeg_path, "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "{}x{}".format(width, height),
+               "-r", "{:g}".format(fps), "-i", "-"]
+    is_video = output_path.lower().endswith(VIDEO_SUFFIXES)
+    if sound_path and is_video:
+        command += ["-i", sound_path, "-map", "0:v", "-map", "1:a", "-shortest"]
+    if is_video:
+        command += ["-pix_fmt", "yuv420p"]
+    elif output_path.lower().endswith(IMAGE_SUFFIXES):
+        output_path = image_sequence_path(output_path)
+    return command + [output_path]
+
+
+class VideoExporter:
+    """
+    Writes the frames of a voice, see export.
+
+    cancel() may be called from any thread, the export stops before the next frame.
+    """
+
+    def __init__(self, ffmpeg_path=None, max_workers=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.max_workers = max_workers
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def export(self, voice, mouth_files, output_path, fps, num_frames, size=None, sound_path=None,
+               progress_callback=None):
+        """
+        Write num_frames frames of voice to output_path and return how many were written.
+
+        mouth_files maps phonemes to their images, see image_export.mouth_files.
+        Phonemes without an image show the "rest" mouth. progress_callback is
+        called with the number of frames written, about a hundred times.
+        """
+        width, height = size if size is not None else mouth_size(mouth_files)
+        frames = render_mouths(mouth_files, width, height, max_workers=self.max_workers)
+        blank = frames.get("rest", bytes(width * height * 3))
+        if output_path.lower().endswith(RAW_SUFFIX):
+            with open(output_path, "wb") as out_file:
+                return self._write_frames(out_file, voice, frames, blank, num_frames, progress_callback)
+
+        ffmpeg_path = self.ffmpeg_path or find_ffmpeg()
+        if ffmpeg_path is None:
+            raise RuntimeError("ffmpeg was not found, it is needed to export videos and image sequences.")
+        command = ffmpeg_command(ffmpeg_path, output_path, fps, width, height, sound_path)
+        logger.info("Running {}".format(" ".join(command)))
+        with tempfile.TemporaryFile() as error_file:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=error_file)
+            try:
+                written = self._write_frames(process.stdin, voice, frames, blank, num_frames, progress_callback)
+                process.stdin.close()
+            except BrokenPipeError:
+                written = 0
+            except BaseException:
+                process.kill()
+                raise
+            finally:
+                return_code = process.wait()
+            if self.cancelled:
+                return written
+            if return_code != 0:
+                error_file.seek(0)
+                raise RuntimeError("ffmpeg failed: {}".format(error_file.read().decode(errors="replace").strip()))
+        return written
+
+    def _write_frames(self, out_file, voice, frames, blank, num_frames, progress_callback):
+        step = max(1, num_frames // 100)
+        for frame in range(num_frames):
+            if self.cancelled:
+                return frame
+            out_file.write(frames.get(voice.get_phoneme_at_frame(frame), blank))
+            if progress_callback is not None and ((frame + 1) % step == 0 or frame + 1 == num_frames):
+                progress_callback(frame + 1)
+        return num_frames
@@ -0,0 +1,158 @@
+"""
+On-disk cache of waveform envelopes, so reopening a project doesn't scan its sound again.
+
+The finest level of an EnvelopePyramid is stored as an .npz file in the app
+data dir, named after the SHA-1 of the sound file, its sample rate and the
+fps the envelope was built for. Hashing a large sound still means reading
+it, so the hash of every path is remembered together with the size and
+mtime it was computed for and only recomputed when those change.
+
+The cache is kept below a total size by deleting the least recently used
+envelopes; loading an envelope refreshes its mtime. Saving the hash index
+drops the paths whose sound or envelopes are gone.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+import utilities
+from waveform_envelope import EnvelopePyramid
+
+logger = logging.getLogger("waveform_cache")
+
+FORMAT_VERSION = 1
+CACHE_SUFFIX = ".npz"
+HASH_INDEX_NAME = "hashes.json"
+MAX_CACHE_BYTES = 256 << 20
+
+
+def get_cache_dir():
+    return Path(utilities.get_app_data_path()) / "waveform_cache"
+
+
+def _sound_path(sound):
+    # SoundPlayerSDF knows its path as soundfile_path, the other players as soundfile.
+    path = getattr(sound, "soundfile_path", None)
+    if path is None:
+        path = getattr(sound, "soundfile", None)
+    return path if isinstance(path, (str, os.PathLike)) else None
+
+
+class WaveformCache:
+    def __init__(self, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else get_cache_dir()
+        self.max_bytes = max_bytes
+        self._hashes = None
+
+    def _hash_index_path(self):
+        return self.cache_dir / HASH_INDEX_NAME
+
+    def _load_hashes(self):
+        if self._hashes is None:
+            try:
+                with self._hash_index_path().open(encoding="utf-8") as in_file:
+                    self._hashes = json.load(in_file)
+            except (OSError, ValueError):
+                self._hashes = {}
+        return self._hashes
+
+    def _prune_hashes(self, keep):
+        """Forget the paths that no longer exist or have no envelope in the cache, except keep."""
+        cached = {cache_path.name.split("_", 1)[0] for cache_path in self.cache_dir.glob("*" + CACHE_SUFFIX)}
+        for path, known in list(self._hashes.items()):
+            if path != keep and (known[2] not in cached or not os.path.exists(path)):
+                del self._hashes[path]
+
+    def _save_hashes(self, keep=None):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._prune_hashes(keep)
+        temp_path = self._hash_index_path().with_name("{}.{}.tmp".format(HASH_INDEX_NAME, os.getpid()))
+        with temp_path.open("w", encoding="utf-8") as out_file:
+            json.dump(self._hashes, out_file)
+        os.replace(temp_path, self._hash_index_path())
+
+    def file_hash(self, path):
+        """SHA-1 of the file at path, only read again if its size or mtime changed."""
+        path = str(Path(path).resolve())
+        stat = os.stat(path)
+        hashes = self._load_hashes()
+        known = hashes.get(path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = hashlib.sha1()
+        with open(path, "rb") as in_file:
+            for block in iter(lambda: in_file.read(1 << 20), b""):
+                digest.update(block)
+        hashes[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        try:
+            # The envelope of a newly hashed path is usually stored right after.
+            self._save_hashes(keep=path)
+        except OSError as e:
+            logger.warning("Unable to save the waveform cache index: {}".format(e))
+        return hashes[path][2]
+
+    def get_cache_path(self, sound, fps):
+        """The cache file for the envelope of sound at fps, None if the sound has no file to hash."""
+        path = _sound_path(sound)
+        if path is None:
+            return None
+        samplerate = getattr(sound, "samplerate", 0)
+        return self.cache_dir / "{}_{}_{:g}{}".format(self.file_hash(path), int(samplerate), fps, CACHE_SUFFIX)
+
+    def load(self, sound, fps):
+        """Return the cached EnvelopePyramid of sound at fps, None if there is none."""
+        try:
+            cache_path = self.get_cache_path(sound, fps)
+            if cache_path is None or not cache_path.exists():
+                return None
+            with np.load(cache_path) as data:
+                if int(data["version"]) != FORMAT_VERSION:
+                    return None
+                envelope = EnvelopePyramid(sound, fps, data["sum_squares"], data["counts"],
+                                           data["minimum"], data["maximum"])
+            os.utime(cache_path)
+            return envelope
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Unable to load the cached waveform of {}: {}".format(_sound_path(sound), e))
+            return None
+
+    def store(self, envelope):
+        """Write the finest level of envelope to the cache and evict old envelopes."""
+        try:
+            cache_path = self.get_cache_path(envelope.sound, envelope.fps)
+            if cache_path is None:
+                return
+            sum_squares, counts, minimum, maximum = envelope.levels[0]
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # np.savez adds .npz to names without it, so the temp file keeps the suffix.
+            temp_path = cache_path.with_name("{}.{}.tmp{}".format(cache_path.stem, os.getpid(), CACHE_SUFFIX))
+            np.savez(temp_path, version=FORMAT_VERSION, sum_squares=sum_squares, counts=counts,
+                     minimum=minimum, maximum=maximum)
+            os.replace(temp_path, cache_path)
+            self.evict()
+        except OSError as e:
+            logger.warning("Unable to cache the waveform of {}: {}".format(_sound_path(envelope.sound), e))
+
+    def evict(self):
+        """Delete the least recently used envelopes until the cache fits into max_bytes."""
+        entries = []
+        for cache_path in self.cache_dir.glob("*" + CACHE_SUFFIX):
+            try:
+                stat = cache_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, cache_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, cache_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                cache_path.unlink()
+                total -= size
+            except OSError:
+                pass
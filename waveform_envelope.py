@@ -0,0 +1,108 @@
+"""
+Multi-resolution amplitude envelope of a sound, used by WaveformView.
+
+The waveform shows one RMS value per display sample, and a display sample
+is 1 / (fps * samples_per_frame) seconds long. EnvelopePyramid computes the
+finest zoom level once, streaming through the sound in vectorised chunks,
+and every coarser zoom level by merging pairs of windows of the level
+below. Each level keeps the sum of squares, the sample count and the
+min/max of every window, so any zoom level is a slice away.
+"""
+
+import numpy as np
+
+# Display samples per frame at the finest zoom level of WaveformView.
+MAX_SAMPLES_PER_FRAME = 16
+# Number of audio frames read from the sound at a time while building.
+CHUNK_FRAMES = 1 << 20
+
+
+def num_display_samples(duration, samples_per_sec):
+    """The number of display samples WaveformView shows for a sound."""
+    return max(1, int(duration / (1.0 / samples_per_sec)) + 1)
+
+
+class EnvelopePyramid:
+    def __init__(self, sound, fps, sum_squares, counts, minimum, maximum):
+        self.sound = sound
+        self.fps = fps
+        self.duration = sound.Duration()
+        self.levels = [(sum_squares, counts, minimum, maximum)]
+        while len(self.levels[-1][0]) > 1 and len(self.levels) <= int(np.log2(MAX_SAMPLES_PER_FRAME)):
+            sum_squares, counts, minimum, maximum = self.levels[-1]
+            self.levels.append((sum_squares.reshape(-1, 2).sum(axis=1), counts.reshape(-1, 2).sum(axis=1),
+                                minimum.reshape(-1, 2).min(axis=1), maximum.reshape(-1, 2).max(axis=1)))
+
+    @classmethod
+    def from_sound(cls, sound, fps, progress_callback=None):
+        duration = sound.Duration()
+        levels = int(np.log2(MAX_SAMPLES_PER_FRAME))
+        base_count = num_display_samples(duration, fps * MAX_SAMPLES_PER_FRAME)
+        # Round up so every level halves evenly.
+        base_count = -(-base_count // (1 << levels)) * (1 << levels)
+        if hasattr(sound, "get_samples"):
+            return cls(sound, fps, *cls._scan_samples(sound, fps, base_count, progress_callback))
+        return cls(sound, fps, *cls._scan_rms(sound, fps, base_count, progress_callback))
+
+    @staticmethod
+    def _scan_samples(sound, fps, base_count, progress_callback):
+        frames = sound.length
+        duration = sound.Duration()
+        # The same window boundaries as SoundPlayer.get_rms_amplitude.
+        frames_per_window = (frames / duration) / (fps * MAX_SAMPLES_PER_FRAME)
+        bounds = np.minimum((np.arange(base_count + 1) * frames_per_window).astype(np.int64), frames)
+        sum_squares = np.zeros(base_count, dtype=np.float64)
+        counts = np.zeros(base_count, dtype=np.int64)
+        minimum = np.zeros(base_count, dtype=np.float32)
+        maximum = np.zeros(base_count, dtype=np.float32)
+        step = max(1, int(CHUNK_FRAMES / max(frames_per_window, 1)))
+        for first in range(0, base_count, step):
+            last = min(first + step, base_count)
+            start, stop = bounds[first], bounds[last]
+            if start >= stop:
+                break
+            samples = np.asarray(sound.get_samples(int(start), int(stop)), dtype=np.float32)
+            if samples.ndim == 1:
+                samples = samples[:, np.newaxis]
+            channels = samples.shape[1]
+            frame_squares = np.square(samples, dtype=np.float64).sum(axis=1)
+            window_lengths = np.diff(bounds[first:last + 1])
+            # reduceat needs indices inside the chunk, empty windows are masked out below.
+            offsets = np.minimum(bounds[first:last] - start, len(samples) - 1)
+            filled = window_lengths > 0
+            sum_squares[first:last] = np.where(filled, np.add.reduceat(frame_squares, offsets), 0)
+            counts[first:last] = window_lengths * channels
+            minimum[first:last] = np.where(filled, np.minimum.reduceat(samples.min(axis=1), offsets), 0)
+            maximum[first:last] = np.where(filled, np.maximum.reduceat(samples.max(axis=1), offsets), 0)
+            if progress_callback is not None:
+                progress_callback(stop / frames * duration)
+        return sum_squares, counts, minimum, maximum
+
+    @staticmethod
+    def _scan_rms(sound, fps, base_count, progress_callback):
+        """For sound players without sample access, ask for every window's RMS instead."""
+        sample_dur = 1.0 / (fps * MAX_SAMPLES_PER_FRAME)
+        rms = np.array([sound.get_rms_amplitude(i * sample_dur, sample_dur) for i in range(base_count)],
+                       dtype=np.float64)
+        if progress_callback is not None:
+            progress_callback(sound.Duration())
+        return np.square(rms), np.ones(base_count, dtype=np.int64), -rms.astype(np.float32), rms.astype(np.float32)
+
+    def _level(self, samples_per_frame):
+        level = int(round(np.log2(MAX_SAMPLES_PER_FRAME / samples_per_frame)))
+        if not 0 <= level < len(self.levels):
+            raise ValueError("No envelope level for {} samples per frame".format(samples_per_frame))
+        count = num_display_samples(self.duration, self.fps * samples_per_frame)
+        return [values[:count] for values in self.levels[level]]
+
+    def rms(self, samples_per_frame):
+        """RMS per display sample, windows past the end of the sound are silent."""
+        sum_squares, counts, _, _ = self._level(samples_per_frame)
+        rms = np.zeros(len(counts), dtype=np.float64)
+        filled = counts > 0
+        rms[filled] = np.sqrt(sum_squares[filled] / counts[filled])
+        return rms
+
+    def min_max(self, samples_per_frame):
+        _, _, minimum, maximum = self._level(samples_per_frame)
+        return minimum, maximum